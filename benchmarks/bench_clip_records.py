@@ -0,0 +1,123 @@
+# benchmarks/bench_clip_records.py
+"""
+Compare l'empreinte mémoire et le temps de filtrage/tri d'un grand ensemble de candidats
+synthétiques : dictionnaires (ancien format), ClipRecord (__slots__) et ClipBatch (colonnes NumPy).
+
+Usage : python benchmarks/bench_clip_records.py [nombre_de_clips]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from clip_record import ClipBatch, ClipRecord  # noqa: E402
+
+LANGUAGE = "fr"
+MIN_DURATION, MAX_DURATION = 15, 180
+
+
+def synthetic_helix_clips(count, seed=42):
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    for i in range(count):
+        yield {
+            "id": f"SyntheticClip{i:08d}-{rnd.getrandbits(32):08x}",
+            "url": f"https://clips.twitch.tv/SyntheticClip{i:08d}",
+            "embed_url": f"https://clips.twitch.tv/embed?clip=SyntheticClip{i:08d}",
+            "thumbnail_url": f"https://clips-media-assets2.twitch.tv/{i:08d}-preview-480x272.jpg",
+            "title": f"Moment incroyable numéro {i}",
+            "view_count": rnd.randint(0, 200000),
+            "broadcaster_id": str(rnd.randint(1, 500)),
+            "broadcaster_name": f"streamer{rnd.randint(1, 500)}",
+            "game_id": str(rnd.randint(1, 50)),
+            "game_name": f"Jeu {rnd.randint(1, 50)}",
+            "created_at": (now - timedelta(seconds=rnd.randint(0, 86400))).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "duration": round(rnd.uniform(5, 60), 1),
+            "language": rnd.choice(["fr", "fr", "en", "es"]),
+        }
+
+
+def legacy_dict(clip):
+    """Reproduit le dictionnaire à 12 clés construit historiquement par fetch_clips."""
+    return {
+        "id": clip.get("id"),
+        "url": clip.get("url"),
+        "embed_url": clip.get("embed_url"),
+        "thumbnail_url": clip.get("thumbnail_url"),
+        "title": clip.get("title"),
+        "viewer_count": clip.get("view_count", 0),
+        "broadcaster_id": clip.get("broadcaster_id"),
+        "broadcaster_name": clip.get("broadcaster_name"),
+        "game_name": clip.get("game_name"),
+        "created_at": clip.get("created_at"),
+        "duration": float(clip.get("duration", 0.0)),
+        "language": clip.get("language")
+    }
+
+
+def measure_memory(build):
+    """Mémoire allouée par les conteneurs construits par build() (les chaînes sources sont partagées)."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return result, allocated
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def python_filter_sort(clips):
+    eligible = [clip for clip in clips
+                if clip.get('language') == LANGUAGE and MIN_DURATION <= clip.get('duration', 0.0) <= MAX_DURATION]
+    eligible.sort(key=lambda clip: (-clip.get('viewer_count', 0), clip['id']))
+    return eligible
+
+
+def batch_filter_sort(batch):
+    mask = batch.eligible_mask(LANGUAGE, MIN_DURATION, MAX_DURATION)
+    order = batch.order_by_views()
+    return batch.select(order[mask[order]])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    raw = list(synthetic_helix_clips(count))
+    print(f"Jeu synthétique : {count} clips")
+
+    dicts, dict_bytes = measure_memory(lambda: [legacy_dict(clip) for clip in raw])
+    records, record_bytes = measure_memory(lambda: [ClipRecord.from_helix(clip) for clip in raw])
+    batch, batch_bytes = measure_memory(lambda: ClipBatch(records))
+
+    print("\n--- Mémoire des conteneurs ---")
+    print(f"dict (12 clés)      : {dict_bytes / 1e6:8.2f} Mo ({dict_bytes / count:6.0f} o/clip)")
+    print(f"ClipRecord (slots)  : {record_bytes / 1e6:8.2f} Mo ({record_bytes / count:6.0f} o/clip)"
+          f"  -> {100 * (1 - record_bytes / dict_bytes):.0f}% économisés")
+    print(f"ClipBatch (colonnes): {batch_bytes / 1e6:8.2f} Mo en plus des enregistrements")
+
+    assert [c['id'] for c in python_filter_sort(dicts)] == [c['id'] for c in batch_filter_sort(batch)]
+
+    print("\n--- Filtrage langue/durée + tri par vues (meilleur de 5) ---")
+    dict_time = best_of(lambda: python_filter_sort(dicts))
+    record_time = best_of(lambda: python_filter_sort(records))
+    batch_time = best_of(lambda: batch_filter_sort(batch))
+    build_time = best_of(lambda: ClipBatch(records), repeat=3)
+    print(f"dict               : {dict_time * 1000:8.1f} ms")
+    print(f"ClipRecord         : {record_time * 1000:8.1f} ms")
+    print(f"ClipBatch          : {batch_time * 1000:8.1f} ms (+ {build_time * 1000:.1f} ms de construction des colonnes)")
+
+
+if __name__ == "__main__":
+    main()
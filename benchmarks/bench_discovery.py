@@ -0,0 +1,118 @@
+# benchmarks/bench_discovery.py
+"""
+Mesure la découverte de clips (get_eligible_short_clips) contre le serveur Helix local
+de substitution (helix_standin.py), sans identifiants Twitch ni accès réseau.
+
+Pour chaque taille de liste de sources et chaque nombre de workers : temps total,
+nombre de requêtes reçues par le serveur, 429 renvoyés et candidats obtenus par seconde.
+Le catalogue, l'historique des vues et le cache de jeton sont isolés dans un dossier temporaire.
+
+Usage :
+    python benchmarks/bench_discovery.py --sources 10,50,200 --workers 1,8 --latency-ms 40
+    python benchmarks/bench_discovery.py --fixture data/helix_fixture.json   # rejeu d'un enregistrement
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+sys.path.append(os.path.dirname(__file__))
+
+os.environ.setdefault("TWITCH_CLIENT_ID", "standin")
+os.environ.setdefault("TWITCH_CLIENT_SECRET", "standin")
+
+import get_top_clips  # noqa: E402
+from clip_catalog import ClipCatalog  # noqa: E402
+from helix_standin import HelixStandin, StandinConfig  # noqa: E402
+from rate_limiter import TokenBucketRateLimiter  # noqa: E402
+from view_velocity import ViewSnapshotStore  # noqa: E402
+
+
+def point_to_standin(standin, work_dir):
+    """Redirige get_top_clips vers le serveur local et remet à zéro son état partagé."""
+    get_top_clips.TWITCH_AUTH_URL = standin.auth_url
+    get_top_clips.TWITCH_API_URL = f"{standin.helix_base_url}/clips"
+    get_top_clips.TWITCH_USERS_URL = f"{standin.helix_base_url}/users"
+    get_top_clips.TWITCH_TOKEN_CACHE_FILE = os.path.join(work_dir, 'twitch_app_token.json')
+    get_top_clips.HELIX_RATE_LIMITER = TokenBucketRateLimiter(
+        capacity=get_top_clips.HELIX_RATE_LIMIT_CAPACITY,
+        refill_period=get_top_clips.HELIX_RATE_LIMIT_PERIOD_SECONDS,
+        safety_margin=get_top_clips.HELIX_RATE_LIMIT_SAFETY_MARGIN
+    )
+    get_top_clips._http_session = None
+
+
+def run_discovery(standin, work_dir, num_sources, workers, passes):
+    """Exécute `passes` découvertes successives (froide, puis incrémentales) ; retourne une mesure par passe."""
+    point_to_standin(standin, work_dir)
+    # Sources synthétiques : num_sources streamers, en plus des jeux configurés
+    get_top_clips.BROADCASTER_LOGINS = [f"standin_streamer_{i}" for i in range(num_sources)]
+    catalog = ClipCatalog(os.path.join(work_dir, f"catalog_{num_sources}_{workers}.sqlite3"))
+    snapshot_store = ViewSnapshotStore(os.path.join(work_dir, f"snapshots_{num_sources}_{workers}.npz"))
+
+    results = []
+    try:
+        for _ in range(passes):
+            standin.reset_stats()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                token = get_top_clips.get_twitch_access_token()
+                clips = get_top_clips.get_eligible_short_clips(
+                    token, days_ago=1, max_workers=workers, catalog=catalog, snapshot_store=snapshot_store
+                )
+            elapsed = time.perf_counter() - start
+            stats = standin.stats()
+            results.append({
+                "elapsed": elapsed,
+                "requests": stats["requests"],
+                "throttled": stats["throttled"],
+                "clips_served": stats["clips_served"],
+                "candidates": len(clips)
+            })
+    finally:
+        catalog.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la découverte de clips contre un serveur Helix local.")
+    parser.add_argument("--sources", default="10,50,200", help="nombres de streamers synthétiques (séparés par des virgules)")
+    parser.add_argument("--workers", default="1,8", help="nombres de workers de découverte (séparés par des virgules)")
+    parser.add_argument("--passes", type=int, default=2, help="découvertes successives (1 froide + incrémentales)")
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--clips-per-source", type=int, default=300)
+    parser.add_argument("--rate-limit", type=int, default=800, help="points par minute côté serveur (0 = illimité)")
+    parser.add_argument("--force-429-every", type=int, default=0)
+    parser.add_argument("--fixture", help="rejoue un enregistrement de helix_standin.py --record-upstream")
+    args = parser.parse_args()
+
+    config = StandinConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, clips_per_source=args.clips_per_source,
+        rate_limit_per_minute=args.rate_limit, force_429_every=args.force_429_every, fixture_path=args.fixture
+    )
+    standin = HelixStandin(config).start()
+    print(f"Serveur Helix local : {standin.base_url} (latence {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"{args.clips_per_source} clips/source, {len(get_top_clips.GAME_IDS)} jeux configurés)")
+    print(f"{'streamers':>9} {'workers':>7} {'passe':>6} {'temps (s)':>9} {'requêtes':>8} {'429':>4} "
+          f"{'clips reçus':>11} {'candidats':>9} {'cand./s':>8}")
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_discovery_") as work_dir:
+            for num_sources in (int(value) for value in args.sources.split(",")):
+                for workers in (int(value) for value in args.workers.split(",")):
+                    for i, result in enumerate(run_discovery(standin, work_dir, num_sources, workers, args.passes)):
+                        label = "froide" if i == 0 else f"incr.{i}"
+                        print(f"{num_sources:>9} {workers:>7} {label:>6} {result['elapsed']:>9.2f} {result['requests']:>8} "
+                              f"{result['throttled']:>4} {result['clips_served']:>11} {result['candidates']:>9} "
+                              f"{result['candidates'] / result['elapsed']:>8.0f}")
+    finally:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
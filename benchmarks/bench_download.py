@@ -0,0 +1,92 @@
+# benchmarks/bench_download.py
+"""
+Mesure le coût fixe par clip des deux moteurs de download_clip.download_twitch_clip :
+"subprocess" (un `python -m yt_dlp` par clip) et "inprocess" (instance YoutubeDL réutilisée).
+
+Les « clips » sont des fichiers MP4 factices servis par un serveur HTTP local (extracteur
+générique de yt-dlp) : le réseau est quasi instantané, la différence mesurée est donc le
+surcoût propre au moteur (démarrage de l'interpréteur, import de yt-dlp, initialisation).
+
+Usage : python benchmarks/bench_download.py [nombre_de_clips] [taille_en_Mo]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import download_clip  # noqa: E402
+
+
+def start_clip_server(payload):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _headers(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+
+        def do_HEAD(self):
+            self._headers()
+
+        def do_GET(self):
+            self._headers()
+            try:
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # yt-dlp interrompt la première requête après avoir identifié le format
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(engine, base_url, count, work_dir):
+    timings = []
+    for i in range(count):
+        output_path = os.path.join(work_dir, f"{engine}_{i}.mp4")
+        start = time.perf_counter()
+        result = download_clip.download_twitch_clip(f"{base_url}/clip_{engine}_{i}.mp4", output_path,
+                                                    verbose=False, engine=engine)
+        timings.append(time.perf_counter() - start)
+        if result is None:
+            raise RuntimeError(f"Échec du téléchargement ({engine}, clip {i})")
+        os.remove(output_path)
+    return timings
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    size_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    if download_clip.yt_dlp is None:
+        print("yt-dlp n'est pas importable : installez-le (pip install yt-dlp).")
+        sys.exit(1)
+
+    server = start_clip_server(os.urandom(int(size_mb * 1e6)))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"{count} clips factices de {size_mb:.1f} Mo servis en local")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_download_") as work_dir:
+        for engine in ("subprocess", "inprocess"):
+            results[engine] = run(engine, base_url, count, work_dir)
+    server.shutdown()
+
+    print(f"\n{'moteur':<11} {'1er clip':>9} {'suivants (moy.)':>16} {'total':>8}")
+    for engine, timings in results.items():
+        steady = timings[1:] or timings
+        print(f"{engine:<11} {timings[0]:>8.3f}s {sum(steady) / len(steady):>15.3f}s {sum(timings):>7.2f}s")
+    sub, inproc = results["subprocess"], results["inprocess"]
+    saved = sum(sub) / len(sub) - sum(inproc[1:] or inproc) / len(inproc[1:] or inproc)
+    print(f"\nSurcoût évité par clip (moteur réutilisé) : {saved * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_parallel.py
+"""
+Débit de rendu (clips/heure) de parallel_render.render_clips : un rendu à la fois avec tout
+le budget CPU en threads, contre la répartition automatique entre plusieurs processus.
+
+Usage : python benchmarks/bench_parallel.py [nombre_de_clips] [durée_en_s] [budget_cpu] [processus]
+
+Le budget CPU vaut par défaut le nombre de cœurs de la machine (RENDER_CPU_BUDGET) et le
+nombre de processus est choisi par parallel_render.split_cpu_budget (0).
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import parallel_render  # noqa: E402
+import process_video  # noqa: E402
+from bench_render import TITLES, make_clip  # noqa: E402
+
+
+def run(workers, clips, cpu_budget, work_dir):
+    jobs = [({"id": f"bench_{i}", "title": TITLES[i % len(TITLES)], "broadcaster_name": "Streamer"},
+             clip_path, os.path.join(work_dir, f"out_{workers}_{i}.mp4"))
+            for i, clip_path in enumerate(clips)]
+    render_params = {"render_backend": process_video.RENDER_BACKEND}
+    start = time.perf_counter()
+    results = parallel_render.render_clips(jobs, render_params, cpu_budget=cpu_budget, workers=workers)
+    elapsed = time.perf_counter() - start
+    if not all(results.values()):
+        raise RuntimeError(f"Échec d'au moins un rendu ({workers} processus)")
+    return len(jobs) * 3600 / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    cpu_budget = int(sys.argv[3]) if len(sys.argv) > 3 else parallel_render.RENDER_CPU_BUDGET
+    max_workers = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+
+    with tempfile.TemporaryDirectory(prefix="bench_parallel_") as work_dir:
+        clips = []
+        for i in range(count):
+            clips.append(os.path.join(work_dir, f"clip_{i}.mp4"))
+            make_clip(clips[-1], duration, 60)
+        sequential = run(1, clips, cpu_budget, work_dir)
+        workers, threads = parallel_render.split_cpu_budget(count, cpu_budget, max_workers)
+        parallel = run(workers, clips, cpu_budget, work_dir)
+
+    print(f"\n{count} clips de {duration:.0f}s, budget de {cpu_budget} CPU")
+    print(f"séquentiel (1 × {cpu_budget} threads) : {sequential:7.0f} clips/heure")
+    print(f"parallèle ({workers} × {threads} threads)  : {parallel:7.0f} clips/heure (x{parallel / sequential:.2f})")
+
+
+if __name__ == "__main__":
+    main()
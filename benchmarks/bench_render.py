@@ -0,0 +1,87 @@
+# benchmarks/bench_render.py
+"""
+Compare les moteurs de rendu de process_video.trim_video_for_short ("moviepy" et "ffmpeg")
+sur les mêmes clips : temps de rendu et images produites par seconde.
+
+Les clips sont générés localement par ffmpeg (mire testsrc2 1920x1080 avec son), à la
+définition et à la cadence des clips Twitch ; les assets réels (fond, polices, séquence de
+fin) sont utilisés. Les textes sont rastérisés par Pillow (text_overlay) pour les deux moteurs.
+
+Usage : python benchmarks/bench_render.py [nombre_de_clips] [durée_en_s] [fps] [moteurs...]
+
+Mesure de référence (2 clips de 6s à 60 img/s + séquence de fin, 1 cœur, x264 "medium") :
+    moteur    temps total  par clip   img/s
+    moviepy        744.0s    372.0s     1.2
+    ffmpeg         122.2s     61.1s     7.1
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import ffmpeg_render  # noqa: E402
+import process_video  # noqa: E402
+
+TITLES = [
+    "Il réussit l'impossible en fin de partie",
+    "Le clutch le plus fou de l'année : 1v5 sans une seule erreur, tout le chat devient fou",
+    "Fou rire en live",
+]
+
+
+def make_clip(path, duration, fps):
+    command = [ffmpeg_render.FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y",
+               "-f", "lavfi", "-i", f"testsrc2=s=1920x1080:r={fps}:d={duration}",
+               "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+               "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-shortest", path]
+    subprocess.run(command, check=True)
+
+
+def run(backend, clips, work_dir):
+    results = []
+    for i, clip_path in enumerate(clips):
+        output_path = os.path.join(work_dir, f"{backend}_{i}.mp4")
+        clip_data = {"title": TITLES[i % len(TITLES)], "broadcaster_name": "Streamer"}
+        start = time.perf_counter()
+        rendered = process_video.trim_video_for_short(clip_path, output_path, clip_data=clip_data,
+                                                      render_backend=backend)
+        elapsed = time.perf_counter() - start
+        info = ffmpeg_render.probe_media(rendered) if rendered else None
+        if info is None:
+            raise RuntimeError(f"Échec du rendu ({backend}, clip {i})")
+        results.append((elapsed, int(round(info["duration"] * info["fps"]))))
+        os.remove(output_path)
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    fps = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+    backends = sys.argv[4:] or ["moviepy", "ffmpeg"]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_render_") as work_dir:
+        clips = []
+        for i in range(count):
+            clips.append(os.path.join(work_dir, f"clip_{i}.mp4"))
+            make_clip(clips[-1], duration, fps)
+        print(f"{count} clips de {duration:.0f}s en 1920x1080 à {fps} img/s")
+        for backend in backends:
+            results[backend] = run(backend, clips, work_dir)
+
+    print(f"\n{'moteur':<8} {'temps total':>12} {'par clip':>9} {'img/s':>7}")
+    for backend, timings in results.items():
+        total = sum(elapsed for elapsed, _ in timings)
+        frames = sum(frame_count for _, frame_count in timings)
+        print(f"{backend:<8} {total:>11.1f}s {total / len(timings):>8.1f}s {frames / total:>7.1f}")
+    if "moviepy" in results and "ffmpeg" in results:
+        speedup = sum(t for t, _ in results["moviepy"]) / sum(t for t, _ in results["ffmpeg"])
+        print(f"\nRendu ffmpeg {speedup:.1f}x plus rapide que MoviePy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+# benchmarks/helix_standin.py
+"""
+Serveur local de substitution à l'API Twitch (id.twitch.tv + api.twitch.tv/helix), pour
+mesurer et tester la découverte de clips sans identifiants Twitch.
+
+Points d'accès servis :
+- POST /oauth2/token          : jeton d'application factice,
+- GET  /helix/clips           : clips synthétiques (ou enregistrés), fenêtre started_at/ended_at,
+                                tri par vues décroissantes, pagination par curseur,
+- GET  /helix/users           : résolution login -> ID,
+- GET  /_stats, POST /_reset  : compteurs de requêtes du serveur.
+
+Comportements configurables : latence (+ gigue), nombre de clips par source, budget de débit
+(en-têtes Ratelimit-* et réponses 429), 429 forcé toutes les N requêtes.
+
+Modes :
+- synthétique (par défaut) : données déterministes générées à partir de l'identifiant de la source,
+- rejeu : --fixture fichier.json (produit par le mode enregistrement),
+- enregistrement : --record-upstream https://api.twitch.tv/helix --fixture fichier.json
+  relaie les requêtes vers Twitch et enregistre les clips/utilisateurs reçus.
+
+Usage :
+    python benchmarks/helix_standin.py --port 8787 --latency-ms 40
+    TWITCH_AUTH_URL=http://127.0.0.1:8787/oauth2/token \\
+    TWITCH_HELIX_BASE_URL=http://127.0.0.1:8787/helix \\
+    TWITCH_CLIENT_ID=standin TWITCH_CLIENT_SECRET=standin python scripts/get_top_clips.py
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+HELIX_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+SOURCE_PARAMS = ("broadcaster_id", "game_id", "id")
+
+
+class StandinConfig:
+    """Paramètres du serveur de substitution."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, clips_per_source=300, window_days=2,
+                 rate_limit_per_minute=800, force_429_every=0, overlap_ratio=0.1,
+                 languages=(("fr", 0.7), ("en", 0.3)), seed=0, fixture_path=None, record_upstream=None,
+                 record_auth_url="https://id.twitch.tv/oauth2/token"):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.clips_per_source = clips_per_source
+        self.window_days = window_days
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.force_429_every = force_429_every
+        self.overlap_ratio = overlap_ratio
+        self.languages = languages
+        self.seed = seed
+        self.fixture_path = fixture_path
+        self.record_upstream = record_upstream.rstrip("/") if record_upstream else None
+        self.record_auth_url = record_auth_url
+
+
+class _ServerRateLimit:
+    """Budget de points côté serveur, rempli en continu comme celui de Twitch."""
+
+    def __init__(self, limit_per_minute):
+        self.limit = limit_per_minute
+        self.tokens = float(limit_per_minute)
+        self.last = time.time()
+        self.lock = threading.Lock()
+
+    def consume(self):
+        """Retourne (accepté, restant, reset_epoch)."""
+        with self.lock:
+            now = time.time()
+            rate = self.limit / 60.0
+            self.tokens = min(float(self.limit), self.tokens + (now - self.last) * rate)
+            self.last = now
+            accepted = self.tokens >= 1
+            if accepted:
+                self.tokens -= 1
+            reset = int(math.ceil(now + (self.limit - self.tokens) / rate))
+            return accepted, int(self.tokens), reset
+
+
+class HelixStandin:
+    """Serveur HTTP de substitution, démarré dans un thread (start/stop) ou en avant-plan (serve_forever)."""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or StandinConfig()
+        self._anchor = datetime.now(timezone.utc).replace(microsecond=0)
+        self._source_cache = {}
+        self._cache_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._request_index = 0
+        self._rate_limit = _ServerRateLimit(self.config.rate_limit_per_minute) if self.config.rate_limit_per_minute else None
+        self.fixture = {"clips": {}, "users": {}}
+        if self.config.fixture_path and os.path.exists(self.config.fixture_path) and not self.config.record_upstream:
+            with open(self.config.fixture_path, 'r', encoding='utf-8') as f:
+                self.fixture = json.load(f)
+        self.reset_stats()
+        handler = type("HelixStandinHandler", (_Handler,), {"standin": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    # --- Cycle de vie ---
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def auth_url(self):
+        return f"{self.base_url}/oauth2/token"
+
+    @property
+    def helix_base_url(self):
+        return f"{self.base_url}/helix"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="helix-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.save_fixture()
+
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+            self.save_fixture()
+
+    # --- Statistiques ---
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {"requests": 0, "by_path": {}, "throttled": 0, "clips_served": 0}
+
+    def stats(self):
+        with self._stats_lock:
+            return json.loads(json.dumps(self._stats))
+
+    def _count(self, path, throttled=False, clips=0):
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["by_path"][path] = self._stats["by_path"].get(path, 0) + 1
+            self._stats["throttled"] += int(throttled)
+            self._stats["clips_served"] += clips
+            self._request_index += 1
+            return self._request_index
+
+    # --- Données synthétiques ---
+
+    def _synthetic_clip(self, clip_id, rnd, source_type, source_id):
+        created = self._anchor - timedelta(seconds=rnd.uniform(0, self.config.window_days * 86400))
+        languages, weights = zip(*self.config.languages)
+        broadcaster_id = source_id if source_type == "broadcaster_id" else str(rnd.randint(10_000, 99_999))
+        game_id = source_id if source_type == "game_id" else str(rnd.choice([509670, 21779, 32982, 512965]))
+        return {
+            "id": clip_id,
+            "url": f"https://clips.twitch.tv/{clip_id}",
+            "embed_url": f"https://clips.twitch.tv/embed?clip={clip_id}",
+            "broadcaster_id": broadcaster_id,
+            "broadcaster_name": f"Streamer{broadcaster_id}",
+            "creator_id": str(rnd.randint(1, 10 ** 8)),
+            "creator_name": "viewer",
+            "video_id": "",
+            "game_id": game_id,
+            "language": rnd.choices(languages, weights)[0],
+            "title": f"Clip synthétique {clip_id}",
+            "view_count": int(rnd.lognormvariate(5, 1.6)),
+            "created_at": created.strftime(HELIX_DATE_FORMAT),
+            "thumbnail_url": f"https://clips-media-assets2.twitch.tv/{clip_id}-preview-480x272.jpg",
+            "duration": round(rnd.uniform(5, 60), 1),
+            "vod_offset": None,
+            "is_featured": False
+        }
+
+    def _source_clips(self, source_type, source_id):
+        """Clips d'une source, triés par vues décroissantes (générés une seule fois)."""
+        key = f"{source_type}:{source_id}"
+        with self._cache_lock:
+            if key in self._source_cache:
+                return self._source_cache[key]
+        if key in self.fixture.get("clips", {}):
+            clips = list(self.fixture["clips"][key])
+        elif self.fixture.get("clips"):
+            clips = []  # mode rejeu : source non enregistrée
+        else:
+            rnd = random.Random(f"{self.config.seed}:{key}")
+            clips = []
+            for i in range(self.config.clips_per_source):
+                if rnd.random() < self.config.overlap_ratio:
+                    # Clip partagé entre plusieurs sources : données dérivées de son seul identifiant
+                    clip_id = f"SharedClip{rnd.randrange(self.config.clips_per_source * 4)}"
+                    clips.append(self._synthetic_clip(clip_id, random.Random(f"{self.config.seed}:{clip_id}"), "shared", None))
+                else:
+                    clip_id = f"Clip{zlib.crc32(key.encode()):08x}{i:05d}"
+                    clips.append(self._synthetic_clip(clip_id, rnd, source_type, source_id))
+            clips = list({clip["id"]: clip for clip in clips}.values())
+        clips.sort(key=lambda clip: (-clip.get("view_count", 0), clip["id"]))
+        with self._cache_lock:
+            self._source_cache[key] = clips
+        return clips
+
+    def synthetic_user(self, login):
+        user_id = str(zlib.crc32(login.encode()) % 900_000_000 + 100_000_000)
+        return {"id": user_id, "login": login, "display_name": login, "type": "", "broadcaster_type": "partner"}
+
+    # --- Enregistrement ---
+
+    def record_clips(self, source_key, items):
+        with self._cache_lock:
+            stored = {clip["id"]: clip for clip in self.fixture["clips"].get(source_key, [])}
+            for clip in items:
+                stored[clip["id"]] = clip
+            self.fixture["clips"][source_key] = list(stored.values())
+
+    def record_users(self, users):
+        with self._cache_lock:
+            for user in users:
+                self.fixture["users"][user["login"].lower()] = user
+
+    def save_fixture(self):
+        if not (self.config.record_upstream and self.config.fixture_path):
+            return
+        with self._cache_lock:
+            with open(self.config.fixture_path, 'w', encoding='utf-8') as f:
+                json.dump(self.fixture, f, ensure_ascii=False)
+        print(f"💾 Fixture enregistrée : {self.config.fixture_path}")
+
+
+def _encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["o"])
+    except (ValueError, KeyError, TypeError):
+        return 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    standin = None  # injecté par HelixStandin
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_latency(self):
+        config = self.standin.config
+        delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        path = urlparse(self.path).path
+        if path == "/_reset":
+            self.standin.reset_stats()
+            return self._send_json(200, {"ok": True})
+        if path != "/oauth2/token":
+            return self._send_json(404, {"error": "Not Found", "status": 404})
+        self.standin._count(path)
+        self._simulate_latency()
+        if self.standin.config.record_upstream:
+            response = requests.post(self.standin.config.record_auth_url, data=parse_qs(body.decode()))
+            return self._send_json(response.status_code, response.json())
+        return self._send_json(200, {"access_token": "standin-app-token", "expires_in": 5_000_000, "token_type": "bearer"})
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        if parsed.path == "/_stats":
+            return self._send_json(200, self.standin.stats())
+        if parsed.path not in ("/helix/clips", "/helix/users"):
+            return self._send_json(404, {"error": "Not Found", "status": 404})
+
+        self._simulate_latency()
+        config = self.standin.config
+        headers = {}
+        accepted, remaining, reset = True, 0, int(time.time())
+        if self.standin._rate_limit is not None:
+            accepted, remaining, reset = self.standin._rate_limit.consume()
+            headers = {"Ratelimit-Limit": self.standin._rate_limit.limit, "Ratelimit-Remaining": remaining, "Ratelimit-Reset": reset}
+
+        with self.standin._stats_lock:
+            next_index = self.standin._request_index + 1
+        forced = config.force_429_every and next_index % config.force_429_every == 0
+        if not accepted or forced:
+            self.standin._count(parsed.path, throttled=True)
+            headers.update({"Ratelimit-Remaining": 0, "Ratelimit-Reset": max(reset, int(time.time()) + 1)})
+            return self._send_json(429, {"error": "Too Many Requests", "status": 429, "message": "standin rate limit"}, headers)
+
+        if config.record_upstream:
+            return self._proxy_and_record(parsed, query, headers)
+        if parsed.path == "/helix/users":
+            return self._serve_users(query, headers)
+        return self._serve_clips(query, headers)
+
+    def _serve_users(self, query, headers):
+        logins = [login.lower() for login in query.get("login", [])][:100]
+        users = []
+        for login in logins:
+            recorded = self.standin.fixture.get("users", {})
+            if recorded:
+                if login in recorded:
+                    users.append(recorded[login])
+            else:
+                users.append(self.standin.synthetic_user(login))
+        self.standin._count("/helix/users")
+        return self._send_json(200, {"data": users}, headers)
+
+    def _serve_clips(self, query, headers):
+        source = next(((name, query[name][0]) for name in SOURCE_PARAMS if name in query), None)
+        if source is None:
+            self.standin._count("/helix/clips")
+            return self._send_json(400, {"error": "Bad Request", "status": 400,
+                                         "message": "Missing required parameter"}, headers)
+        first = max(1, min(int(query.get("first", ["20"])[0]), 100))
+        started_at = query.get("started_at", [None])[0]
+        ended_at = query.get("ended_at", [None])[0]
+        offset = _decode_cursor(query["after"][0]) if "after" in query else 0
+
+        clips = self.standin._source_clips(*source)
+        if started_at or ended_at:
+            clips = [clip for clip in clips
+                     if (not started_at or clip["created_at"] >= started_at)
+                     and (not ended_at or clip["created_at"] <= ended_at)]
+        page = clips[offset:offset + first]
+        pagination = {"cursor": _encode_cursor(offset + first)} if offset + first < len(clips) else {}
+        self.standin._count("/helix/clips", clips=len(page))
+        return self._send_json(200, {"data": page, "pagination": pagination}, headers)
+
+    def _proxy_and_record(self, parsed, query, headers):
+        upstream = self.standin.config.record_upstream + parsed.path[len("/helix"):]
+        forwarded = {name: self.headers[name] for name in ("Client-ID", "Authorization") if self.headers.get(name)}
+        response = requests.get(upstream, params=query, headers=forwarded)
+        payload = response.json()
+        if response.ok and parsed.path == "/helix/clips":
+            source = next(((name, query[name][0]) for name in SOURCE_PARAMS if name in query), None)
+            if source:
+                self.standin.record_clips(f"{source[0]}:{source[1]}", payload.get("data", []))
+        elif response.ok:
+            self.standin.record_users(payload.get("data", []))
+        self.standin._count(parsed.path, clips=len(payload.get("data", [])) if parsed.path == "/helix/clips" else 0)
+        upstream_headers = {name: response.headers[name] for name in ("Ratelimit-Limit", "Ratelimit-Remaining", "Ratelimit-Reset")
+                            if name in response.headers}
+        return self._send_json(response.status_code, payload, upstream_headers or headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur local de substitution à l'API Twitch Helix.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--clips-per-source", type=int, default=300)
+    parser.add_argument("--rate-limit", type=int, default=800, help="points par minute (0 = illimité)")
+    parser.add_argument("--force-429-every", type=int, default=0, help="renvoie un 429 toutes les N requêtes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixture", help="fichier JSON de clips/utilisateurs enregistrés (rejeu ou enregistrement)")
+    parser.add_argument("--record-upstream", help="URL Helix réelle à relayer et enregistrer dans --fixture")
+    args = parser.parse_args()
+
+    config = StandinConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, clips_per_source=args.clips_per_source,
+        rate_limit_per_minute=args.rate_limit, force_429_every=args.force_429_every, seed=args.seed,
+        fixture_path=args.fixture, record_upstream=args.record_upstream
+    )
+    standin = HelixStandin(config, host=args.host, port=args.port)
+    print(f"🧪 Serveur Helix de substitution sur {standin.base_url}")
+    print(f"   TWITCH_AUTH_URL={standin.auth_url}")
+    print(f"   TWITCH_HELIX_BASE_URL={standin.helix_base_url}")
+    standin.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,23 @@
 
 import sys
 import os
-import json
-from datetime import datetime, date
+import shutil
+from datetime import datetime, timedelta, timezone
 
 # Ajouter le répertoire 'scripts' au PYTHONPATH pour importer les modules
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
 
 import get_top_clips
+import clip_catalog
+import clip_dedup
+import clip_prefetcher
+import published_history
+import render_cache
+import source_cache
 import download_clip
 import process_video
+import parallel_render
+import prepared_assets
 import generate_metadata
 import upload_youtube
 
@@ -19,9 +27,8 @@ import upload_youtube
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
-PUBLISHED_HISTORY_FILE = os.path.join(DATA_DIR, 'published_shorts_history.json')
-# Fichiers temporaires pour le clip
-RAW_CLIP_PATH = os.path.join(DATA_DIR, 'temp_raw_clip.mp4')
+# Copie du dernier Short rendu, collectée comme artefact par GitHub Actions
+# (les clips bruts et rendus sont conservés par clip dans data/raw_clips et data/render_cache)
 PROCESSED_CLIP_PATH = os.path.join(DATA_DIR, 'temp_processed_short.mp4')
 
 # --- CONSTANTE DE CONFIGURATION CLÉ ---
@@ -31,75 +38,16 @@ PROCESSED_CLIP_PATH = os.path.join(DATA_DIR, 'temp_processed_short.mp4')
 NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH = 3
 # ----------------------------------------
 
-# --- Fonctions utilitaires pour l'historique ---
-def load_published_history():
-    """Charge l'historique des clips publiés."""
-    if not os.path.exists(PUBLISHED_HISTORY_FILE):
-        return {}
-    try:
-        with open(PUBLISHED_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        print("⚠️ Fichier d'historique des publications corrompu. Création d'un nouveau.")
-        return {}
-    except Exception as e:
-        print(f"❌ Erreur inattendue lors du chargement de l'historique : {e}")
-        return {}
-
-def save_published_history(history_data):
-    """Sauvegarde l'historique des clips publiés."""
-    try:
-        with open(PUBLISHED_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history_data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"❌ Erreur inattendue lors de la sauvegarde de l'historique : {e}")
-
-
-def get_today_published_ids(history_data):
-    """Retourne les IDs des clips publiés aujourd'hui."""
-    today_str = date.today().isoformat()
-    # history_data est un dict { "YYYY-MM-DD": [ {clip_id: ..., youtube_id: ...}, ... ] }
-    # Retourne seulement les 'twitch_clip_id' pour la date d'aujourd'hui
-    return [item["twitch_clip_id"] for item in history_data.get(today_str, [])]
-
-def add_to_history(history_data, clip_id, youtube_id):
-    """Ajoute un clip à l'historique pour la date d'aujourd'hui."""
-    today_str = date.today().isoformat()
-    if today_str not in history_data:
-        history_data[today_str] = []
-        
-    # Vérifier si l'ID Twitch est déjà dans la liste d'aujourd'hui pour éviter les doublons accidentels
-    # (bien que la logique de sélection devrait déjà filtrer cela)
-    if not any(item["twitch_clip_id"] == clip_id for item in history_data[today_str]):
-        history_data[today_str].append({
-            "twitch_clip_id": clip_id, 
-            "youtube_short_id": youtube_id, 
-            "timestamp": datetime.now().isoformat()
-        })
-    
-    # OPTIONNEL: Nettoyer l'historique des anciennes entrées (ex: plus de 7 jours)
-    # C'est une bonne pratique pour éviter que le fichier ne devienne trop gros.
-    # Décommentez le bloc ci-dessous si vous voulez cette fonctionnalité.
-    # old_dates = []
-    # for d in history_data:
-    #     try:
-    #         if (datetime.now().date() - datetime.fromisoformat(d).date()).days > 7:
-    #             old_dates.append(d)
-    #     except ValueError: # Gérer les dates mal formatées si nécessaire
-    #         print(f"⚠️ Date mal formatée dans l'historique : {d}. Ignorée.")
-    # for d in old_dates:
-    #     del history_data[d]
-    # if old_dates:
-    #     print(f"Historique nettoyé. {len(old_dates)} anciennes entrées supprimées.")
-
-
 def main():
     print("🚀 Début du workflow de publication de Short YouTube...")
 
-    # 1. Charger l'historique des clips publiés
-    history = load_published_history()
-    today_published_ids = get_today_published_ids(history)
-    print(f"Clips déjà publiés aujourd'hui (selon l'historique) : {len(today_published_ids)} IDs.")
+    # Identifiants Twitch manquants : erreur de configuration, le workflow doit échouer
+    if not get_top_clips.check_twitch_credentials():
+        sys.exit(1)
+
+    # 1. Charger l'historique des clips publiés (journal en ajout seul, index de tous les IDs publiés)
+    history = published_history.PublishedHistory()
+    print(f"Clips déjà publiés (selon l'historique) : {len(history)} IDs, dont {history.count_published_on()} aujourd'hui.")
 
     # Garder une trace des clips que nous avons ATTEMPTÉ de publier DANS CETTE EXÉCUTION
     # pour éviter de retenter le même si la première tentative échoue et la boucle continue.
@@ -112,132 +60,263 @@ def main():
         return # Quitter la fonction main sans sys.exit(1) pour éviter un échec "fatal" du workflow.
 
     # 3. Récupérer TOUS les clips éligibles et triés
-    # On passe les IDs déjà publiés AUJOURD'HUI pour qu'ils soient filtrés dès la source.
-    eligible_clips_list = get_top_clips.get_eligible_short_clips(
-        access_token=twitch_token,
-        num_clips_per_source=50, # Augmenter pour avoir plus de candidats
-        days_ago=1, # Chercher les clips du dernier jour
-        already_published_clip_ids=today_published_ids # Passer l'historique des clips publiés CE JOUR
-    )
-
-    if not eligible_clips_list:
-        print("🤷‍♂️ Aucun nouveau clip adapté trouvé pour la publication aujourd'hui. Fin du script.")
-        # Sortie normale si aucun clip à traiter
-        return 
-
-    # --- Boucle de traitement et d'upload pour le nombre de clips souhaité ---
-    clips_published_count = 0
-    for selected_clip in eligible_clips_list:
-        if clips_published_count >= NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH:
-            print(f"✅ Objectif de {NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH} clip(s) atteint pour cette exécution.")
-            break # Sortir de la boucle si on a publié le nombre désiré
-
-        # Vérifier si ce clip a déjà été tenté OU PUBLIÉ (par une exécution précédente) dans cette journée
-        if selected_clip['id'] in clips_attempted_in_this_run or selected_clip['id'] in today_published_ids:
-            print(f"ℹ️ Clip '{selected_clip['id']}' déjà tenté dans cette exécution ou déjà publié aujourd'hui. Passage au suivant.")
-            continue # Passe au prochain clip éligible
-
-        # Marquer le clip comme tenté pour cette exécution pour éviter les re-tentatives immédiates
-        clips_attempted_in_this_run.append(selected_clip['id'])
-        print(f"\n✨ Tentative de publication du clip : '{selected_clip['title']}' par '{selected_clip['broadcaster_name']}' (ID: {selected_clip['id']})...")
-
-        # 4. Télécharger le clip
-        downloaded_file = download_clip.download_twitch_clip(selected_clip['url'], RAW_CLIP_PATH)
-        if not downloaded_file:
-            print(f"❌ Échec du téléchargement du clip '{selected_clip['id']}'. Passage au suivant.")
-            # Nettoyage spécifique si le téléchargement a laissé des traces
-            if os.path.exists(RAW_CLIP_PATH): os.remove(RAW_CLIP_PATH)
-            continue # Passe au prochain clip éligible
-
-        # 5. Traiter/couper la vidéo
-        print("🎬 Traitement de la vidéo pour le format Short (découpage si nécessaire)...")
-        current_processed_file = PROCESSED_CLIP_PATH # Assurez-vous d'écraser le précédent pour l'artefact final
-
-        processed_file_path_returned = process_video.trim_video_for_short(
-            input_path=downloaded_file,
-            output_path=current_processed_file,
-            max_duration_seconds=get_top_clips.MAX_VIDEO_DURATION_SECONDS,
-            clip_data=selected_clip,
-            enable_webcam_crop=False
+    # La découverte alimente le catalogue local (SQLite) ; la sélection est une requête indexée
+    # sur ce catalogue (top N non publiés, durée éligible, langue, dernières 24h).
+    # On passe l'historique lui-même (test d'appartenance, sans copie) pour que les clips déjà publiés
+    # soient filtrés dès la source.
+    # Catalogue fermé en sortie de bloc, y compris sur les sorties anticipées et en cas d'exception
+    with clip_catalog.ClipCatalog() as catalog:
+        eligible_clips_list = get_top_clips.get_eligible_short_clips(
+            access_token=twitch_token,
+            num_clips_per_source=get_top_clips.HELIX_MAX_PAGE_SIZE, # Taille des pages Helix (les sources sont paginées)
+            days_ago=1, # Chercher les clips du dernier jour
+            already_published_clip_ids=history, # Passer l'historique de tous les clips publiés
+            catalog=catalog
         )
-        
-        # Vérifications après traitement
-        if not processed_file_path_returned or not os.path.exists(processed_file_path_returned) or os.path.getsize(processed_file_path_returned) == 0:
-            print(f"❌ Échec du traitement vidéo pour le clip '{selected_clip['id']}'. Le fichier traité est manquant ou vide.")
-            print("Tentative d'utiliser le fichier brut pour l'upload si possible (peut être trop long).")
-            final_video_for_upload = downloaded_file # Utilise le fichier brut comme fallback
-            if not os.path.exists(final_video_for_upload) or os.path.getsize(final_video_for_upload) == 0:
-                print(f"❌ Le fichier brut pour le clip '{selected_clip['id']}' est aussi vide ou introuvable. Impossible de continuer pour ce clip.")
-                # Nettoyage des temporaires avant de passer au suivant
-                if os.path.exists(RAW_CLIP_PATH): os.remove(RAW_CLIP_PATH)
-                if os.path.exists(current_processed_file): os.remove(current_processed_file) 
-                continue # Passe au prochain clip éligible
-            else:
-                print(f"Utilisation du fichier brut pour l'upload du clip '{selected_clip['id']}'.")
-        else:
-            print(f"✅ Fichier traité trouvé et non vide : {processed_file_path_returned} (taille : {os.path.getsize(processed_file_path_returned)} octets).")
-            final_video_for_upload = processed_file_path_returned # Utilise le fichier traité
-
-        # 6. Générer les métadonnées YouTube
-        youtube_metadata = generate_metadata.generate_youtube_metadata(selected_clip)
-        print("\n--- Informations sur le Short (pour débogage) ---")
-        print(f"Titre: {youtube_metadata.get('title')}")
-        print(f"Description: {youtube_metadata.get('description')}")
-        print(f"Tags: {', '.join(youtube_metadata.get('tags', []))}")
-        print(f"Chemin de la vidéo finale pour upload: {final_video_for_upload}")
-        print("-------------------------------------------------\n")
-
-        # 7. Authentifier et Uploader sur YouTube
-        youtube_service = None
-        try:
-            youtube_service = upload_youtube.get_authenticated_service()
-        except Exception as e:
-            print(f"❌ Erreur lors de l'authentification YouTube : {e}")
-            print("ℹ️ L'upload YouTube pour ce clip sera ignoré. Le script continuera pour le prochain clip/l'artefact.")
-
-        youtube_video_id = None
-        if youtube_service:
-            print("📤 Démarrage de l'upload YouTube...")
-            try:
-                youtube_video_id = upload_youtube.upload_youtube_short(youtube_service, final_video_for_upload, youtube_metadata)
-                
-                if youtube_video_id:
-                    print(f"🎉 Short YouTube publié avec succès ! ID: {youtube_video_id}")
-                    # 8. Mettre à jour l'historique des publications seulement si l'upload YouTube réussit
+
+        # Clips d'une exécution précédente interrompue (téléchargés ou rendus, pas encore publiés) :
+        # repris en priorité, à partir de la dernière étape terminée.
+        resume_since = (datetime.now(timezone.utc) - timedelta(seconds=render_cache.RENDER_CACHE_MAX_AGE_SECONDS)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        resumable_clips = [clip for clip in catalog.resumable_clips(resume_since) if clip['id'] not in history]
+        if resumable_clips:
+            print(f"♻️ {len(resumable_clips)} clip(s) d'une exécution précédente à reprendre.")
+        eligible_ids = {clip['id'] for clip in eligible_clips_list}
+        eligible_clips_list = [clip for clip in resumable_clips if clip['id'] not in eligible_ids] + eligible_clips_list
+
+        if not eligible_clips_list:
+            print("🤷‍♂️ Aucun nouveau clip adapté trouvé pour la publication aujourd'hui. Fin du script.")
+            # Sortie normale si aucun clip à traiter
+            return 
+
+        # Rendus adressés par clip + empreinte du template et des assets (voir render_cache.render_key)
+        renders = render_cache.RenderCache()
+        render_params = {
+            "max_duration_seconds": get_top_clips.MAX_VIDEO_DURATION_SECONDS,
+            "enable_webcam_crop": False,
+            "render_backend": process_video.RENDER_BACKEND
+        }
+
+        def needs_download(clip):
+            """Vrai si le clip n'est ni publié, ni déjà téléchargé, ni déjà rendu."""
+            return (clip['id'] not in history
+                    and not os.path.exists(render_cache.raw_clip_path(clip['id']))
+                    and not renders.lookup(clip['id'], render_cache.render_key(clip, **render_params)))
+
+        # Plus petite définition source suffisante pour la taille d'affichage du clip dans le Short
+        download_options = {"display_width": process_video.source_display_width(render_params["enable_webcam_crop"])}
+
+        # Téléchargement en arrière-plan des prochains candidats pendant le rendu et l'upload du clip en cours.
+        # En sortie de bloc (objectif atteint, candidats épuisés ou exception), les préchargements restants
+        # sont annulés : ni le thread de préchargement ni yt-dlp ne survivent à la boucle.
+        with clip_prefetcher.ClipPrefetcher(eligible_clips_list, should_prefetch=needs_download,
+                                            download_options=download_options) as prefetcher:
+
+            def prepare_clip(selected_clip):
+                """
+                Étape 4 : rendu déjà en cache, ou clip source téléchargé (ou préchargé) et vérifié.
+                Retourne (rendu en cache, clip source) ; (None, None) si le clip est abandonné.
+                """
+                clip_id = selected_clip['id']
+                # Attend la fin du préchargement de ce clip s'il est en cours ; fait avancer les préchargements
+                prefetched_file = prefetcher.claim(selected_clip)
+
+                # Chaque exécution qui traite le clip compte une tentative ; au-delà du maximum, il est abandonné
+                state = catalog.start_attempt(clip_id)
+                if state['attempts'] > clip_catalog.PIPELINE_MAX_ATTEMPTS:
+                    print(f"⛔ Clip '{clip_id}' abandonné après {state['attempts'] - 1} tentative(s) "
+                          f"(dernière erreur : {state['last_error'] or 'inconnue'}). Passage au suivant.")
+                    catalog.set_pipeline_stage(clip_id, "failed")
+                    return None, None
+                if state['attempts'] > 1:
+                    print(f"ℹ️ Reprise du clip '{clip_id}' à l'étape '{state['stage']}' (tentative {state['attempts']}).")
+
+                cached_render = renders.lookup(clip_id, render_cache.render_key(selected_clip, **render_params))
+                if cached_render:
+                    print(f"♻️ Rendu déjà en cache pour ce clip ({os.path.basename(cached_render)}). Téléchargement et traitement ignorés.")
+                    return cached_render, None
+
+                # Télécharger le clip (sauf s'il a été préchargé ou s'il est déjà dans le cache des clips sources)
+                if prefetched_file:
+                    print(f"⏬ Clip préchargé en arrière-plan : {prefetched_file}")
+                    downloaded_file = prefetched_file
+                else:
+                    downloaded_file = download_clip.download_twitch_clip(selected_clip['url'], render_cache.raw_clip_path(clip_id),
+                                                                       clip_id=clip_id, **download_options)
+                    if not downloaded_file:
+                        print(f"❌ Échec du téléchargement du clip '{clip_id}'. Passage au suivant.")
+                        catalog.record_pipeline_error(clip_id, "échec du téléchargement")
+                        return None, None
+                catalog.set_pipeline_stage(clip_id, "downloaded", raw_path=downloaded_file)
+
+                # Quasi-doublon d'un clip déjà publié, détecté sur quelques images de la vidéo (optionnel)
+                if clip_dedup.DEDUP_FRAME_SAMPLES > 0:
+                    frame_hashes = clip_dedup.hash_video_frames(downloaded_file, selected_clip.get('duration'))
+                    catalog.set_clip_hashes({clip_id: frame_hashes}, "frame")
+                    duplicate_of = clip_dedup.find_published_frame_duplicate(selected_clip, frame_hashes, catalog)
+                    if duplicate_of:
+                        print(f"🔁 Le clip '{clip_id}' montre le même moment que le clip déjà publié '{duplicate_of}'. Passage au suivant.")
+                        # Étape finale : le clip ne sera plus ni repris ni sélectionné
+                        catalog.set_pipeline_stage(clip_id, "skipped", last_error=f"quasi-doublon du clip publié '{duplicate_of}'")
+                        source_cache.get_source_cache().discard(clip_id)
+                        return None, None
+                return None, downloaded_file
+
+            def finish_render(selected_clip, downloaded_file, processed_file_path_returned):
+                """
+                Vérifie le rendu d'un clip et le publie dans le cache des rendus. Retourne la vidéo à
+                uploader (le clip brut si le rendu a échoué), ou None si le clip est abandonné.
+                """
+                clip_id = selected_clip['id']
+                render_key = render_cache.render_key(selected_clip, **render_params)
+                current_processed_file = renders.temp_path_for(clip_id, render_key)
+
+                # Vérifications après traitement
+                if not processed_file_path_returned or not os.path.exists(processed_file_path_returned) or os.path.getsize(processed_file_path_returned) == 0:
+                    print(f"❌ Échec du traitement vidéo pour le clip '{clip_id}'. Le fichier traité est manquant ou vide.")
+                    catalog.record_pipeline_error(clip_id, "échec du rendu")
+                    print("Tentative d'utiliser le fichier brut pour l'upload si possible (peut être trop long).")
+                    if os.path.exists(current_processed_file): os.remove(current_processed_file)
+                    final_video_for_upload = downloaded_file # Utilise le fichier brut comme fallback
+                    if not os.path.exists(final_video_for_upload) or os.path.getsize(final_video_for_upload) == 0:
+                        print(f"❌ Le fichier brut pour le clip '{clip_id}' est aussi vide ou introuvable. Impossible de continuer pour ce clip.")
+                        # Nettoyage des temporaires avant de passer au suivant
+                        source_cache.get_source_cache().discard(clip_id)
+                        return None
+                    print(f"Utilisation du fichier brut pour l'upload du clip '{clip_id}'.")
+                    return final_video_for_upload
+
+                final_video_for_upload = renders.store(processed_file_path_returned, clip_id, render_key)
+                catalog.set_pipeline_stage(clip_id, "rendered", render_path=final_video_for_upload, render_key=render_key)
+                print(f"✅ Fichier traité trouvé et non vide : {final_video_for_upload} (taille : {os.path.getsize(final_video_for_upload)} octets).")
+                return final_video_for_upload
+
+            def publish_clip(selected_clip, final_video_for_upload):
+                """Étapes 6 à 9 : métadonnées, upload YouTube et historique. Retourne True si le Short est publié."""
+                clip_id = selected_clip['id']
+                # Copie collectée comme artefact par GitHub Actions
+                shutil.copyfile(final_video_for_upload, PROCESSED_CLIP_PATH)
+
+                # 6. Générer les métadonnées YouTube
+                youtube_metadata = generate_metadata.generate_youtube_metadata(selected_clip)
+                print("\n--- Informations sur le Short (pour débogage) ---")
+                print(f"Titre: {youtube_metadata.get('title')}")
+                print(f"Description: {youtube_metadata.get('description')}")
+                print(f"Tags: {', '.join(youtube_metadata.get('tags', []))}")
+                print(f"Chemin de la vidéo finale pour upload: {final_video_for_upload}")
+                print("-------------------------------------------------\n")
+
+                # 7. Authentifier et Uploader sur YouTube
+                youtube_service = None
+                try:
+                    youtube_service = upload_youtube.get_authenticated_service()
+                except Exception as e:
+                    print(f"❌ Erreur lors de l'authentification YouTube : {e}")
+                    print("ℹ️ L'upload YouTube pour ce clip sera ignoré. Le script continuera pour le prochain clip/l'artefact.")
+
+                youtube_video_id = None
+                published = False
+                if youtube_service:
+                    print("📤 Démarrage de l'upload YouTube...")
                     try:
-                        add_to_history(history, selected_clip['id'], youtube_video_id)
-                        save_published_history(history)
-                        # Recharger today_published_ids pour que la prochaine itération de la boucle
-                        # ou une exécution future dans la même journée la voie comme publiée.
-                        today_published_ids = get_today_published_ids(history) 
-                        print(f"✅ Clip '{selected_clip['id']}' ajouté à l'historique des publications.")
-                        clips_published_count += 1 # Incrémente le compteur seulement si upload réussi
+                        youtube_video_id = upload_youtube.upload_youtube_short(youtube_service, final_video_for_upload, youtube_metadata)
+
+                        if youtube_video_id:
+                            print(f"🎉 Short YouTube publié avec succès ! ID: {youtube_video_id}")
+                            # 8. Mettre à jour l'historique des publications seulement si l'upload YouTube réussit
+                            try:
+                                # Ajout d'une ligne au journal : la prochaine itération de la boucle
+                                # et les exécutions futures verront le clip comme publié.
+                                history.add(clip_id, youtube_video_id)
+                                catalog.mark_published(clip_id, youtube_video_id)
+                                catalog.set_pipeline_stage(clip_id, "uploaded", youtube_id=youtube_video_id)
+                                print(f"✅ Clip '{selected_clip['id']}' ajouté à l'historique des publications.")
+                                published = True # Compté seulement si upload réussi
+                            except Exception as e:
+                                print(f"❌ Erreur lors de l'ajout/sauvegarde à l'historique après un upload réel: {e}")
+                        else:
+                            print("❌ L'upload YouTube a échoué ou n'a pas retourné d'ID. Le Short n'a pas été publié sur YouTube.")
+                            print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
+                            catalog.record_pipeline_error(clip_id, "échec de l'upload YouTube")
                     except Exception as e:
-                        print(f"❌ Erreur lors de l'ajout/sauvegarde à l'historique après un upload réel: {e}")
+                        print(f"❌ Une erreur inattendue est survenue pendant l'upload YouTube : {e}")
+                        print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
+                        catalog.record_pipeline_error(clip_id, f"erreur pendant l'upload YouTube : {e}")
                 else:
-                    print("❌ L'upload YouTube a échoué ou n'a pas retourné d'ID. Le Short n'a pas été publié sur YouTube.")
+                    print("❌ Service YouTube non authentifié. L'upload YouTube pour ce clip est ignoré.")
                     print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
-            except Exception as e:
-                print(f"❌ Une erreur inattendue est survenue pendant l'upload YouTube : {e}")
-                print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
-        else:
-            print("❌ Service YouTube non authentifié. L'upload YouTube pour ce clip est ignoré.")
-            print("ℹ️ Le script continuera pour le prochain clip/l'artefact.")
-
-        # 9. Nettoyage des fichiers temporaires (uniquement le brut)
-        print("🧹 Nettoyage des fichiers temporaires pour ce clip...")
-        if os.path.exists(RAW_CLIP_PATH):
-            os.remove(RAW_CLIP_PATH)
-            print(f"  - Supprimé: {RAW_CLIP_PATH}")
-        # Le PROCESSED_CLIP_PATH est laissé pour être collecté comme artefact par GitHub Actions.
-        # Il sera écrasé lors de la prochaine itération ou du prochain run.
-
-    # Résumé de l'exécution
-    if clips_published_count == 0 and NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH > 0:
-        print("\n🤷‍♂️ Aucune vidéo n'a pu être publiée avec succès lors de cette exécution.")
-    elif clips_published_count > 0:
-        print(f"\n🎉 {clips_published_count} Short(s) publié(s) avec succès lors de cette exécution.")
-    
+
+                # 9. Nettoyage : le rendu n'est supprimé qu'une fois le Short publié (conservé pour la
+                # prochaine exécution si l'upload a échoué). Le clip brut reste dans le cache des clips
+                # sources (LRU borné) pour un éventuel nouveau rendu.
+                if youtube_video_id:
+                    print("🧹 Nettoyage des fichiers temporaires pour ce clip...")
+                    renders.discard(clip_id)
+                # Le PROCESSED_CLIP_PATH est laissé pour être collecté comme artefact par GitHub Actions.
+                # Il sera écrasé lors de la prochaine itération ou du prochain run.
+                return published
+
+            # --- Boucle de traitement et d'upload pour le nombre de clips souhaité ---
+            # Les clips sont traités par lots : autant de clips que de Shorts restant à publier sont
+            # préparés, rendus ensemble (en parallèle selon le budget CPU, voir parallel_render), puis uploadés.
+            clips_published_count = 0
+            candidates = iter(eligible_clips_list)
+            while clips_published_count < NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH:
+                batch = [] # (clip, rendu en cache, clip source)
+                for selected_clip in candidates:
+                    clip_id = selected_clip['id']
+                    # Vérifier si ce clip a déjà été tenté dans cette exécution OU PUBLIÉ (par une exécution précédente)
+                    if clip_id in clips_attempted_in_this_run or clip_id in history:
+                        print(f"ℹ️ Clip '{clip_id}' déjà tenté dans cette exécution ou déjà publié. Passage au suivant.")
+                        continue # Passe au prochain clip éligible
+
+                    # Marquer le clip comme tenté pour cette exécution pour éviter les re-tentatives immédiates
+                    clips_attempted_in_this_run.append(clip_id)
+                    print(f"\n✨ Préparation du clip : '{selected_clip['title']}' par '{selected_clip['broadcaster_name']}' (ID: {clip_id})...")
+                    cached_render, downloaded_file = prepare_clip(selected_clip)
+                    if cached_render or downloaded_file:
+                        batch.append((selected_clip, cached_render, downloaded_file))
+                    else:
+                        # Clip abandonné : son clip source (téléchargé ou préchargé) redevient évinçable
+                        source_cache.get_source_cache().unpin(clip_id)
+                    if len(batch) >= NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH - clips_published_count:
+                        break
+                if not batch:
+                    break # Candidats épuisés
+
+                # 5. Traiter/couper les vidéos du lot, chacune dans un fichier de travail publié dans le cache une fois complet
+                jobs = [(selected_clip, downloaded_file,
+                         renders.temp_path_for(selected_clip['id'], render_cache.render_key(selected_clip, **render_params)))
+                        for selected_clip, cached_render, downloaded_file in batch if not cached_render]
+                rendered_files = {}
+                if jobs:
+                    print("🎬 Traitement des vidéos pour le format Short (découpage si nécessaire)...")
+                    rendered_files = parallel_render.render_clips(jobs, render_params)
+
+                for selected_clip, cached_render, downloaded_file in batch:
+                    print(f"\n✨ Tentative de publication du clip : '{selected_clip['title']}' par '{selected_clip['broadcaster_name']}' (ID: {selected_clip['id']})...")
+                    final_video_for_upload = cached_render or finish_render(selected_clip, downloaded_file,
+                                                                            rendered_files.get(selected_clip['id']))
+                    if final_video_for_upload and publish_clip(selected_clip, final_video_for_upload):
+                        clips_published_count += 1
+                    # Rendu et upload terminés (le clip brut peut servir d'upload de secours) : il redevient évinçable
+                    source_cache.get_source_cache().unpin(selected_clip['id'])
+
+            if clips_published_count >= NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH:
+                print(f"✅ Objectif de {NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH} clip(s) atteint pour cette exécution.")
+
+        # Résumé de l'exécution
+        if clips_published_count == 0 and NUMBER_OF_CLIPS_TO_ATTEMPT_TO_PUBLISH > 0:
+            print("\n🤷‍♂️ Aucune vidéo n'a pu être publiée avec succès lors de cette exécution.")
+        elif clips_published_count > 0:
+            print(f"\n🎉 {clips_published_count} Short(s) publié(s) avec succès lors de cette exécution.")
+
+        history.compact()
+        pruned_files = render_cache.prune()
+        if pruned_files:
+            print(f"🧹 {pruned_files} rendu(s) abandonné(s) supprimé(s).")
+        pruned_files = render_cache.prune((prepared_assets.PREPARED_ASSETS_DIR,), prepared_assets.PREPARED_ASSETS_MAX_AGE_SECONDS)
+        if pruned_files:
+            print(f"🧹 {pruned_files} asset(s) préparé(s) inutilisé(s) supprimé(s).")
     print("✅ Workflow terminé.")
 
 if __name__ == "__main__":
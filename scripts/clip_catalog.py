@@ -0,0 +1,469 @@
+# scripts/clip_catalog.py
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from clip_record import ClipRecord
+
+# Catalogue local des clips découverts, partagé par toutes les étapes du pipeline.
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+CATALOG_DB_FILE = os.path.join(DATA_DIR, 'clip_catalog.sqlite3')
+
+# Les clips non publiés plus vieux que ce délai sont purgés du catalogue.
+CATALOG_RETENTION_DAYS = 30
+
+# Étapes du traitement d'un clip, dans l'ordre (table clip_pipeline).
+PIPELINE_STAGES = ("discovered", "downloaded", "rendered", "uploaded")
+# Étapes finales sans publication : clip écarté (quasi-doublon d'un clip publié) ou abandonné
+# après PIPELINE_MAX_ATTEMPTS tentatives. Ces clips ne sont plus ni repris ni sélectionnés.
+PIPELINE_TERMINAL_STAGES = ("skipped", "failed")
+# Nombre maximal de tentatives (exécutions qui ont essayé de traiter le clip) avant abandon
+PIPELINE_MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", "3"))
+
+# Colonnes de la table clips, dans l'ordre des champs de ClipRecord.
+# "viewer_count" (clé historique du pipeline) est stocké dans la colonne view_count.
+CLIP_COLUMNS = (
+    "id", "url", "embed_url", "thumbnail_url", "title", "view_count", "broadcaster_id",
+    "broadcaster_name", "game_id", "game_name", "created_at", "duration", "language",
+    "video_id", "vod_offset"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    id TEXT PRIMARY KEY,
+    url TEXT,
+    embed_url TEXT,
+    thumbnail_url TEXT,
+    title TEXT,
+    view_count INTEGER NOT NULL DEFAULT 0,
+    broadcaster_id TEXT,
+    broadcaster_name TEXT,
+    game_id TEXT,
+    game_name TEXT,
+    created_at TEXT,
+    duration REAL NOT NULL DEFAULT 0,
+    language TEXT,
+    video_id TEXT,
+    vod_offset INTEGER,
+    first_seen_at TEXT NOT NULL,
+    last_seen_at TEXT NOT NULL,
+    published_at TEXT,
+    youtube_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_clips_broadcaster ON clips (broadcaster_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_clips_game ON clips (game_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_clips_created_at ON clips (created_at);
+CREATE INDEX IF NOT EXISTS idx_clips_view_count ON clips (view_count DESC);
+CREATE INDEX IF NOT EXISTS idx_clips_selection ON clips (language, published_at, view_count DESC);
+
+CREATE TABLE IF NOT EXISTS broadcaster_logins (
+    login TEXT PRIMARY KEY,
+    broadcaster_id TEXT,
+    display_name TEXT,
+    resolved_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS clip_pipeline (
+    clip_id TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    raw_path TEXT,
+    render_path TEXT,
+    render_key TEXT,
+    youtube_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clip_pipeline_stage ON clip_pipeline (stage, updated_at);
+
+CREATE TABLE IF NOT EXISTS clip_hashes (
+    clip_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    phash INTEGER NOT NULL,
+    PRIMARY KEY (clip_id, kind, position)
+);
+
+CREATE TABLE IF NOT EXISTS thumbnail_checks (
+    clip_id TEXT PRIMARY KEY,
+    verdict TEXT NOT NULL,
+    mean_luma REAL,
+    contrast REAL,
+    letterbox REAL,
+    detail REAL
+);
+
+CREATE TABLE IF NOT EXISTS source_state (
+    source_key TEXT PRIMARY KEY,
+    high_water_mark TEXT NOT NULL,
+    last_full_refresh TEXT NOT NULL
+);
+"""
+
+
+def _to_sqlite_int(value):
+    """Empreinte 64 bits non signée -> entier SQLite (64 bits signé)."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _from_sqlite_int(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+# Colonnes ajoutées à des tables existantes, créées au besoin sur un ancien catalogue
+_ADDED_COLUMNS = {
+    "clips": (("video_id", "TEXT"), ("vod_offset", "INTEGER")),
+    "clip_pipeline": (("attempts", "INTEGER NOT NULL DEFAULT 0"), ("last_error", "TEXT")),
+}
+
+
+def _utc_now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class ClipCatalog:
+    """
+    Catalogue SQLite des clips Twitch découverts.
+
+    - La découverte y insère/met à jour chaque clip vu (upsert_clips).
+    - La sélection devient une requête indexée (select_eligible_clips).
+    - L'état incrémental des sources (high-water marks) y est aussi conservé,
+      ainsi que le cache de résolution login -> ID des diffuseurs.
+    - L'avancement de chaque clip sélectionné (PIPELINE_STAGES) y est enregistré, pour
+      reprendre une exécution interrompue à la dernière étape terminée.
+    - Les empreintes perceptuelles des miniatures (et d'images extraites) y sont conservées
+      pour la détection des quasi-doublons (clip_dedup), ainsi que le verdict du pré-filtrage
+      des miniatures (thumbnail_prescreen).
+
+    Une seule connexion est partagée par les threads de découverte, protégée par un verrou.
+    """
+
+    def __init__(self, db_path=CATALOG_DB_FILE):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            for table, columns in _ADDED_COLUMNS.items():
+                existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for column, definition in columns:
+                    if column not in existing:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Clips ---
+
+    def upsert_clips(self, clips):
+        """Insère ou met à jour des clips (titre, compteur de vues...) ; retourne le nombre de lignes traitées."""
+        now = _utc_now_iso()
+        rows = [
+            tuple(clip.get("viewer_count", 0) if column == "view_count" else clip.get(column) for column in CLIP_COLUMNS)
+            + (now, now)
+            for clip in clips
+        ]
+        if not rows:
+            return 0
+        placeholders = ", ".join("?" for _ in range(len(CLIP_COLUMNS) + 2))
+        # Les compteurs de vues ne font que croître : on garde le plus élevé, quel que soit
+        # l'ordre d'arrivée des pages des différentes sources.
+        updates = ", ".join(
+            "view_count = MAX(view_count, excluded.view_count)" if column == "view_count"
+            else f"{column} = excluded.{column}"
+            for column in CLIP_COLUMNS if column != "id"
+        )
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO clips ({', '.join(CLIP_COLUMNS)}, first_seen_at, last_seen_at) VALUES ({placeholders}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}, last_seen_at = excluded.last_seen_at",
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def select_eligible_clips(self, limit, language, min_duration, max_duration, created_after, exclude_ids=()):
+        """
+        Retourne les `limit` clips non publiés (published_at) les plus vus, dans la langue et la
+        plage de durée demandées, créés après `created_after` (ISO 8601), hors `exclude_ids` et
+        hors clips écartés ou abandonnés (PIPELINE_TERMINAL_STAGES).
+        exclude_ids ne doit contenir que quelques IDs (ceux de l'exécution en cours) : les clips
+        publiés sont exclus par la colonne published_at, pas par l'historique complet.
+        """
+        exclude_ids = list(dict.fromkeys(exclude_ids))
+        excluded = f"AND id NOT IN ({', '.join('?' for _ in exclude_ids)}) " if exclude_ids else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(CLIP_COLUMNS)} FROM clips "
+                "WHERE language = ? AND published_at IS NULL AND created_at >= ? AND duration BETWEEN ? AND ? "
+                f"AND id NOT IN (SELECT clip_id FROM clip_pipeline WHERE stage IN ({', '.join('?' for _ in PIPELINE_TERMINAL_STAGES)})) "
+                f"{excluded}ORDER BY view_count DESC, id LIMIT ?",
+                [language, created_after, min_duration, max_duration, *PIPELINE_TERMINAL_STAGES] + exclude_ids + [limit]
+            ).fetchall()
+        return [self._row_to_clip(row) for row in rows]
+
+    def get_clip(self, clip_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(CLIP_COLUMNS)} FROM clips WHERE id = ?", (clip_id,)
+            ).fetchone()
+        return self._row_to_clip(row) if row else None
+
+    def mark_published(self, clip_id, youtube_id, published_at=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE clips SET published_at = ?, youtube_id = ? WHERE id = ?",
+                (published_at or _utc_now_iso(), youtube_id, clip_id)
+            )
+            self._conn.commit()
+
+    def prune(self, older_than_iso):
+        """
+        Supprime les clips non publiés créés avant `older_than_iso`, avec leurs lignes dépendantes
+        (étape du pipeline, empreintes, verdicts de miniature) dans la même transaction ; retourne
+        le nombre de clips supprimés.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM clips WHERE published_at IS NULL AND created_at < ?", (older_than_iso,)
+            )
+            self._conn.execute("DELETE FROM clip_pipeline WHERE clip_id NOT IN (SELECT id FROM clips)")
+            self._conn.execute("DELETE FROM clip_hashes WHERE clip_id NOT IN (SELECT id FROM clips)")
+            self._conn.execute("DELETE FROM thumbnail_checks WHERE clip_id NOT IN (SELECT id FROM clips)")
+            self._conn.commit()
+        return cursor.rowcount
+
+    def count_clips(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+
+    @staticmethod
+    def _row_to_clip(row):
+        clip = ClipRecord(**{column: row[column] for column in CLIP_COLUMNS if column != "view_count"})
+        clip.viewer_count = row["view_count"]
+        return clip
+
+    # --- Empreintes perceptuelles ---
+
+    def get_clip_hashes(self, clip_ids, kind):
+        """Retourne {clip_id: empreinte} (kind "thumbnail") ou {clip_id: [empreintes]} (autres kinds)."""
+        clip_ids = list(clip_ids)
+        result = {}
+        with self._lock:
+            for i in range(0, len(clip_ids), 500):
+                chunk = clip_ids[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT clip_id, phash FROM clip_hashes "
+                    f"WHERE kind = ? AND clip_id IN ({', '.join('?' for _ in chunk)}) ORDER BY clip_id, position",
+                    [kind] + chunk
+                ).fetchall()
+                for row in rows:
+                    result.setdefault(row["clip_id"], []).append(_from_sqlite_int(row["phash"]))
+        if kind == "thumbnail":
+            return {clip_id: values[0] for clip_id, values in result.items()}
+        return result
+
+    def set_clip_hashes(self, hashes, kind):
+        """Enregistre {clip_id: empreinte ou liste d'empreintes} ; remplace les empreintes existantes."""
+        rows = []
+        for clip_id, values in hashes.items():
+            values = values if isinstance(values, (list, tuple)) else [values]
+            rows.extend((clip_id, kind, position, _to_sqlite_int(value)) for position, value in enumerate(values))
+        with self._lock:
+            self._conn.executemany("DELETE FROM clip_hashes WHERE clip_id = ? AND kind = ?", [(clip_id, kind) for clip_id in hashes])
+            self._conn.executemany("INSERT INTO clip_hashes (clip_id, kind, position, phash) VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def published_clip_hashes(self, kind):
+        """
+        Empreintes des clips publiés : liste de ({"id", "broadcaster_id", "created_at", "video_id",
+        "vod_offset", "published"}, empreinte).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.id, c.broadcaster_id, c.created_at, c.video_id, c.vod_offset, h.phash FROM clip_hashes h "
+                "JOIN clips c ON c.id = h.clip_id WHERE h.kind = ? AND c.published_at IS NOT NULL",
+                (kind,)
+            ).fetchall()
+        return [
+            ({"id": row["id"], "broadcaster_id": row["broadcaster_id"], "created_at": row["created_at"],
+              "video_id": row["video_id"], "vod_offset": row["vod_offset"], "published": True},
+             _from_sqlite_int(row["phash"]))
+            for row in rows
+        ]
+
+    # --- Pré-filtrage des miniatures ---
+
+    def get_thumbnail_checks(self, clip_ids):
+        """Retourne {clip_id: {"verdict", "mean_luma", "contrast", "letterbox", "detail"}}."""
+        clip_ids = list(clip_ids)
+        result = {}
+        with self._lock:
+            for i in range(0, len(clip_ids), 500):
+                chunk = clip_ids[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT clip_id, verdict, mean_luma, contrast, letterbox, detail FROM thumbnail_checks "
+                    f"WHERE clip_id IN ({', '.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                for row in rows:
+                    result[row["clip_id"]] = {key: row[key] for key in ("verdict", "mean_luma", "contrast", "letterbox", "detail")}
+        return result
+
+    def set_thumbnail_checks(self, rows):
+        """Enregistre des verdicts (clip_id, verdict, mean_luma, contrast, letterbox, detail)."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO thumbnail_checks (clip_id, verdict, mean_luma, contrast, letterbox, detail) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    # --- État incrémental des sources ---
+
+    def get_source_states(self):
+        """Retourne {source_key: {"high_water_mark": ..., "last_full_refresh": ...}}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT source_key, high_water_mark, last_full_refresh FROM source_state").fetchall()
+        return {
+            row["source_key"]: {"high_water_mark": row["high_water_mark"], "last_full_refresh": row["last_full_refresh"]}
+            for row in rows
+        }
+
+    def set_source_state(self, source_key, high_water_mark, last_full_refresh):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO source_state (source_key, high_water_mark, last_full_refresh) VALUES (?, ?, ?) "
+                "ON CONFLICT(source_key) DO UPDATE SET high_water_mark = excluded.high_water_mark, "
+                "last_full_refresh = excluded.last_full_refresh",
+                (source_key, high_water_mark, last_full_refresh)
+            )
+            self._conn.commit()
+
+    # --- Cache de résolution des logins ---
+
+    def get_broadcaster_logins(self, logins):
+        """Retourne {login: {"broadcaster_id", "display_name", "resolved_at"}} pour les logins en cache."""
+        logins = list(logins)
+        result = {}
+        with self._lock:
+            for i in range(0, len(logins), 500):
+                chunk = logins[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT login, broadcaster_id, display_name, resolved_at FROM broadcaster_logins "
+                    f"WHERE login IN ({', '.join('?' for _ in chunk)})", chunk
+                ).fetchall()
+                for row in rows:
+                    result[row["login"]] = {
+                        "broadcaster_id": row["broadcaster_id"],
+                        "display_name": row["display_name"],
+                        "resolved_at": row["resolved_at"]
+                    }
+        return result
+
+    def set_broadcaster_logins(self, rows, resolved_at):
+        """Enregistre des résolutions (login, broadcaster_id ou None si introuvable, display_name)."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO broadcaster_logins (login, broadcaster_id, display_name, resolved_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(login) DO UPDATE SET broadcaster_id = excluded.broadcaster_id, "
+                "display_name = excluded.display_name, resolved_at = excluded.resolved_at",
+                [(login, b_id, name, resolved_at) for login, b_id, name in rows]
+            )
+            self._conn.commit()
+
+    # --- Avancement du traitement des clips ---
+
+    def get_pipeline_state(self, clip_id):
+        """
+        Retourne l'état du clip ({"stage", "raw_path", "render_path", "render_key", "youtube_id",
+        "attempts", "last_error", "updated_at"}) ou None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stage, raw_path, render_path, render_key, youtube_id, attempts, last_error, updated_at "
+                "FROM clip_pipeline WHERE clip_id = ?",
+                (clip_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def start_attempt(self, clip_id):
+        """
+        Compte une nouvelle tentative de traitement du clip (étape "discovered" s'il est inconnu)
+        et retourne son état à jour (voir get_pipeline_state).
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO clip_pipeline (clip_id, stage, attempts, updated_at) VALUES (?, 'discovered', 1, ?) "
+                "ON CONFLICT(clip_id) DO UPDATE SET attempts = attempts + 1",
+                (clip_id, _utc_now_iso())
+            )
+            self._conn.commit()
+        return self.get_pipeline_state(clip_id)
+
+    def set_pipeline_stage(self, clip_id, stage, **fields):
+        """
+        Enregistre l'étape atteinte par un clip. Les champs passés (raw_path, render_path,
+        render_key, youtube_id, last_error) sont mis à jour ; les autres conservent leur valeur.
+        updated_at n'avance que si l'étape progresse (ou devient finale) : un clip qui échoue
+        toujours à la même étape sort de la fenêtre de reprise (resumable_clips).
+        """
+        if stage not in PIPELINE_STAGES + PIPELINE_TERMINAL_STAGES:
+            raise ValueError(f"Étape inconnue : {stage}")
+        columns = ("raw_path", "render_path", "render_key", "youtube_id", "last_error")
+        unknown = set(fields) - set(columns)
+        if unknown:
+            raise ValueError(f"Champs inconnus : {', '.join(sorted(unknown))}")
+        values = [fields.get(column) for column in columns]
+        updates = "".join(f", {column} = excluded.{column}" for column in columns if column in fields)
+        # Rang de l'étape : les étapes finales sont au-delà de toutes les autres
+        rank = "CASE {} " + " ".join(
+            f"WHEN '{name}' THEN {i}" for i, name in enumerate(PIPELINE_STAGES + PIPELINE_TERMINAL_STAGES)
+        ) + " END"
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO clip_pipeline (clip_id, stage, raw_path, render_path, render_key, youtube_id, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(clip_id) DO UPDATE SET stage = excluded.stage, "
+                f"updated_at = CASE WHEN {rank.format('excluded.stage')} > {rank.format('clip_pipeline.stage')} "
+                f"THEN excluded.updated_at ELSE clip_pipeline.updated_at END{updates}",
+                [clip_id, stage] + values + [_utc_now_iso()]
+            )
+            self._conn.commit()
+
+    def record_pipeline_error(self, clip_id, error):
+        """Enregistre la dernière erreur du clip, sans changer son étape ni updated_at."""
+        with self._lock:
+            self._conn.execute("UPDATE clip_pipeline SET last_error = ? WHERE clip_id = ?", (error, clip_id))
+            self._conn.commit()
+
+    def resumable_clips(self, since_iso, max_attempts=PIPELINE_MAX_ATTEMPTS):
+        """
+        Clips téléchargés ou rendus mais pas encore publiés, dont l'étape a progressé depuis
+        `since_iso` et qui ont encore droit à une tentative (ni écartés, ni abandonnés) ; les
+        plus avancés d'abord (rendus, puis téléchargés).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join('c.' + column for column in CLIP_COLUMNS)} FROM clip_pipeline p "
+                "JOIN clips c ON c.id = p.clip_id "
+                "WHERE p.stage IN ('downloaded', 'rendered') AND p.updated_at >= ? AND p.attempts < ? "
+                "AND c.published_at IS NULL "
+                "ORDER BY p.stage = 'rendered' DESC, p.updated_at",
+                (since_iso, max_attempts)
+            ).fetchall()
+        return [self._row_to_clip(row) for row in rows]
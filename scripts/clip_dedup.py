@@ -0,0 +1,284 @@
+# scripts/clip_dedup.py
+import io
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+from PIL import Image
+
+# Un même moment est souvent clippé plusieurs fois (IDs différents, débuts légèrement décalés).
+# Deux clips sont considérés comme des quasi-doublons si leurs empreintes perceptuelles sont très
+# proches et qu'ils montrent le même moment du même streamer (voir is_same_moment) : positions
+# dans la même VOD à moins de DEDUP_MAX_VOD_OFFSET_GAP_SECONDS d'écart, ou à défaut de VOD, dates
+# de création à moins de DEDUP_MAX_CREATED_GAP_SECONDS. Les scènes statiques (discussion face
+# caméra, interface de jeu fixe) donnent des miniatures proches toute la journée : seule cette
+# proximité dans le temps distingue deux clips différents.
+DEDUP_MAX_HAMMING_DISTANCE = 6  # sur 64 bits
+DEDUP_MAX_VOD_OFFSET_GAP_SECONDS = 90
+DEDUP_MAX_CREATED_GAP_SECONDS = 10 * 60
+# Active le filtrage des quasi-doublons sur les miniatures ("0" pour désactiver)
+DEDUP_NEAR_DUPLICATES = os.getenv("DEDUP_NEAR_DUPLICATES", "1") != "0"
+# Seuls les meilleurs candidats sont dédoublonnés (miniatures téléchargées, quelques Ko chacune)
+DEDUP_MAX_CANDIDATES = 100
+DEDUP_THUMBNAIL_WORKERS = 8
+DEDUP_THUMBNAIL_TIMEOUT_SECONDS = 10
+# Empreintes optionnelles d'images extraites de la vidéo téléchargée (0 = désactivé)
+DEDUP_FRAME_SAMPLES = int(os.getenv("DEDUP_FRAME_SAMPLES", "0"))
+# Nombre minimal d'images proches d'un clip publié pour conclure à un doublon
+DEDUP_MIN_FRAME_MATCHES = 2
+
+_DCT_SIZE = 32
+_HASH_SIZE = 8
+
+
+def _dct_matrix(n):
+    """Matrice de la DCT-II orthonormée de taille n."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def phash_pixels(pixels):
+    """
+    pHash 64 bits d'un lot d'images en niveaux de gris 32x32 (tableau (N, 32, 32)) :
+    DCT 2D, coefficients basse fréquence 8x8, seuillés à leur médiane (hors composante continue).
+    Retourne une liste d'entiers.
+    """
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, _DCT_SIZE, _DCT_SIZE)
+    coeffs = _DCT @ pixels @ _DCT.T
+    low = coeffs[:, :_HASH_SIZE, :_HASH_SIZE].reshape(len(pixels), -1)
+    bits = low > np.median(low[:, 1:], axis=1, keepdims=True)
+    packed = np.packbits(bits, axis=1)
+    return [int.from_bytes(row.tobytes(), 'big') for row in packed]
+
+
+def image_pixels(image):
+    """Réduit une image PIL en niveaux de gris 32x32 (tableau float32)."""
+    return np.asarray(image.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS), dtype=np.float32)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHash:
+    """
+    Index multiple sur des empreintes de 64 bits pour la distance de Hamming : chaque empreinte
+    est découpée en max_distance + 1 tranches de bits, chacune indexée dans sa propre table.
+    Deux empreintes à distance <= max_distance diffèrent sur au plus max_distance bits, donc
+    (principe des tiroirs) ont au moins une tranche identique : une recherche n'examine que les
+    empreintes qui partagent une tranche avec celle demandée, au lieu de tout l'index.
+    `examined` compte les empreintes comparées depuis la création de l'index.
+    """
+
+    def __init__(self, max_distance, bits=64):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        widths = [bits // chunks + (1 if i < bits % chunks else 0) for i in range(chunks)]
+        self._chunks = []  # (décalage, masque) de chaque tranche
+        shift = bits
+        for width in widths:
+            shift -= width
+            self._chunks.append((shift, (1 << width) - 1))
+        self._tables = [{} for _ in self._chunks]  # tranche -> [indices des entrées]
+        self._entries = []  # (empreinte, item)
+        self.examined = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, value, item):
+        position = len(self._entries)
+        self._entries.append((value, item))
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((value >> shift) & mask, []).append(position)
+
+    def search(self, value, max_distance=None):
+        """Retourne [(distance, item)] pour toutes les empreintes à distance <= max_distance (<= celle de l'index)."""
+        if max_distance is None:
+            max_distance = self.max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(f"distance {max_distance} supérieure à celle de l'index ({self.max_distance})")
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            candidates.update(table.get((value >> shift) & mask, ()))
+        self.examined += len(candidates)
+        matches = []
+        for position in sorted(candidates):
+            other, item = self._entries[position]
+            distance = hamming_distance(value, other)
+            if distance <= max_distance:
+                matches.append((distance, item))
+        return matches
+
+
+def _created_ts(clip):
+    try:
+        return datetime.strptime(clip.get("created_at") or "", '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def is_same_moment(clip, other, max_vod_offset_gap_seconds=DEDUP_MAX_VOD_OFFSET_GAP_SECONDS,
+                   max_created_gap_seconds=DEDUP_MAX_CREATED_GAP_SECONDS):
+    """
+    Garde-fou contre les faux positifs : même streamer, et même moment du live. Si les deux clips
+    ont une position dans une VOD, ils doivent venir de la même VOD à moins de
+    max_vod_offset_gap_seconds d'écart ; sinon leurs dates de création doivent être à moins de
+    max_created_gap_seconds. Sans l'une ni l'autre information, les clips sont jugés différents.
+    """
+    if clip.get("broadcaster_id") and other.get("broadcaster_id") and clip.get("broadcaster_id") != other.get("broadcaster_id"):
+        return False
+    if clip.get("video_id") and other.get("video_id") \
+            and clip.get("vod_offset") is not None and other.get("vod_offset") is not None:
+        return (clip.get("video_id") == other.get("video_id")
+                and abs(clip.get("vod_offset") - other.get("vod_offset")) <= max_vod_offset_gap_seconds)
+    clip_ts, other_ts = _created_ts(clip), _created_ts(other)
+    return clip_ts is not None and other_ts is not None and abs(clip_ts - other_ts) <= max_created_gap_seconds
+
+
+class NearDuplicateIndex:
+    """Index des empreintes déjà retenues (clips publiés, candidats conservés)."""
+
+    def __init__(self, max_distance=DEDUP_MAX_HAMMING_DISTANCE):
+        self.max_distance = max_distance
+        self._hashes = MultiIndexHash(max_distance)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, clip, value):
+        self._hashes.add(value, clip)
+
+    def matches(self, clip, value):
+        """Clips indexés proches de `clip` (empreinte et garde-fou is_same_moment), hors lui-même."""
+        return [
+            other for _, other in self._hashes.search(value, self.max_distance)
+            if other.get("id") != clip.get("id") and is_same_moment(clip, other)
+        ]
+
+
+def fetch_thumbnail_image(clip, session=None):
+    """Télécharge la miniature d'un clip (quelques Ko) ; retourne une image PIL chargée, ou None."""
+    url = clip.get("thumbnail_url")
+    if not url:
+        return None
+    try:
+        response = (session or requests).get(url, timeout=DEDUP_THUMBNAIL_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        image = Image.open(io.BytesIO(response.content))
+        image.load()
+        return image
+    except (requests.exceptions.RequestException, OSError) as e:
+        print(f"⚠️ Miniature illisible pour le clip '{clip.get('id')}' : {e}")
+        return None
+
+
+def fetch_thumbnail_hash(clip, session=None):
+    """Télécharge la miniature d'un clip et retourne son pHash (None en cas d'échec)."""
+    image = fetch_thumbnail_image(clip, session)
+    if image is None:
+        return None
+    return phash_pixels(image_pixels(image))[0]
+
+
+def thumbnail_hashes(clips, catalog, session=None, max_workers=DEDUP_THUMBNAIL_WORKERS):
+    """
+    Retourne {clip_id: pHash} des miniatures. Les empreintes déjà calculées sont lues dans le
+    catalogue ; les autres sont calculées en parallèle puis enregistrées.
+    """
+    hashes = catalog.get_clip_hashes([clip["id"] for clip in clips], "thumbnail")
+    missing = [clip for clip in clips if clip["id"] not in hashes]
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail") as executor:
+            computed = list(executor.map(lambda clip: fetch_thumbnail_hash(clip, session), missing))
+        new_hashes = {clip["id"]: value for clip, value in zip(missing, computed) if value is not None}
+        catalog.set_clip_hashes(new_hashes, "thumbnail")
+        hashes.update(new_hashes)
+    return hashes
+
+
+def filter_near_duplicates(clips, catalog, session=None, max_candidates=DEDUP_MAX_CANDIDATES):
+    """
+    Retire des `max_candidates` premiers clips (déjà triés par priorité) ceux dont la miniature
+    est quasi identique à celle d'un clip publié ou d'un candidat mieux classé.
+    Les clips au-delà de max_candidates sont conservés tels quels.
+    """
+    head, tail = clips[:max_candidates], clips[max_candidates:]
+    if not head:
+        return clips
+    hashes = thumbnail_hashes(head, catalog, session=session)
+
+    index = NearDuplicateIndex()
+    for published, value in catalog.published_clip_hashes("thumbnail"):
+        index.add(published, value)
+
+    kept = []
+    duplicates = 0
+    for clip in head:
+        value = hashes.get(clip["id"])
+        if value is None:
+            kept.append(clip)
+            continue
+        matches = index.matches(clip, value)
+        if matches:
+            duplicates += 1
+            origin = "déjà publié" if matches[0].get("published") else "mieux classé"
+            print(f"  🔁 Quasi-doublon ignoré : '{clip.get('title')}' ({clip['id']}) ~ {matches[0]['id']} ({origin}).")
+            continue
+        index.add(clip, value)
+        kept.append(clip)
+    if duplicates:
+        print(f"🔁 {duplicates} quasi-doublon(s) retiré(s) parmi les {len(head)} meilleurs candidats.")
+    return kept + tail
+
+
+def hash_video_frames(video_path, duration, samples=DEDUP_FRAME_SAMPLES, ffmpeg_binary="ffmpeg"):
+    """
+    pHash de `samples` images réparties dans la vidéo (extraites et réduites en 32x32 par ffmpeg).
+    Retourne une liste d'entiers (vide en cas d'erreur).
+    """
+    if samples <= 0 or not duration:
+        return []
+    frames = []
+    frame_size = _DCT_SIZE * _DCT_SIZE
+    for i in range(samples):
+        timestamp = duration * (i + 0.5) / samples
+        command = [
+            ffmpeg_binary, "-v", "error", "-ss", f"{timestamp:.2f}", "-i", video_path, "-frames:v", "1",
+            "-vf", f"scale={_DCT_SIZE}:{_DCT_SIZE}:flags=area,format=gray", "-f", "rawvideo", "-"
+        ]
+        try:
+            output = subprocess.run(command, capture_output=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️ Extraction d'image impossible ({video_path} à {timestamp:.1f}s) : {e}")
+            continue
+        if len(output) >= frame_size:
+            frames.append(np.frombuffer(output[:frame_size], dtype=np.uint8).reshape(_DCT_SIZE, _DCT_SIZE))
+    return phash_pixels(np.stack(frames)) if frames else []
+
+
+def find_published_frame_duplicate(clip, frame_hashes, catalog, min_matches=DEDUP_MIN_FRAME_MATCHES):
+    """
+    Compare les images échantillonnées d'un clip téléchargé à celles des clips publiés.
+    Retourne l'ID du clip publié correspondant, ou None.
+    """
+    if not frame_hashes:
+        return None
+    index = NearDuplicateIndex()
+    for published, value in catalog.published_clip_hashes("frame"):
+        index.add(published, value)
+    match_counts = {}
+    for value in frame_hashes:
+        for published_id in {other["id"] for other in index.matches(clip, value)}:
+            match_counts[published_id] = match_counts.get(published_id, 0) + 1
+    best = max(match_counts.items(), key=lambda item: item[1], default=None)
+    return best[0] if best and best[1] >= min(min_matches, len(frame_hashes)) else None
@@ -0,0 +1,154 @@
+# scripts/clip_prefetcher.py
+import os
+import threading
+
+import download_clip
+from render_cache import raw_clip_path
+from source_cache import get_source_cache
+
+# Nombre de clips téléchargés à l'avance pendant le rendu/l'upload du clip en cours (0 = désactivé)
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "2"))
+# Espace disque maximal occupé par les clips préchargés et pas encore pris par la boucle principale
+PREFETCH_MAX_BYTES = int(os.getenv("PREFETCH_MAX_BYTES", str(1024 ** 3)))
+
+
+class ClipPrefetcher:
+    """
+    Télécharge en arrière-plan (un thread, un téléchargement à la fois) les prochains candidats
+    de la liste pendant que la boucle principale rend ou uploade le clip en cours.
+
+    - La boucle principale appelle claim(clip) au début du traitement de chaque clip : les
+      préchargements avancent toujours au plus `depth` clips devant elle.
+    - Les téléchargements vont directement dans render_cache.raw_clip_path(clip_id), l'emplacement
+      où la boucle principale cherche un clip déjà téléchargé.
+    - Disque borné : pas de nouveau préchargement tant que les fichiers préchargés non réclamés
+      dépassent max_bytes.
+    - Les clips préchargés restent épinglés dans le cache des clips sources (pas d'éviction) jusqu'à
+      ce que la boucle principale les ait rendus (elle les libère alors avec unpin).
+    - cancel() interrompt le téléchargement en cours (objectif de publication atteint) ; les clips
+      déjà préchargés mais inutilisés restent dans le cache des clips sources (taille bornée, LRU),
+      où ils redeviennent évinçables.
+    """
+
+    def __init__(self, clips, should_prefetch, depth=PREFETCH_DEPTH, max_bytes=PREFETCH_MAX_BYTES, download_options=None):
+        self._clips = list(clips)
+        self._download_options = download_options or {}  # arguments supplémentaires de download_twitch_clip
+        self._index = {clip["id"]: i for i, clip in enumerate(self._clips)}
+        self._should_prefetch = should_prefetch
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self._cond = threading.Condition()
+        self._cancel_event = threading.Event()
+        self._position = 0  # index du premier clip pas encore pris par la boucle principale
+        self._status = {}   # clip_id -> "skipped" | "downloading" | "done" | "failed"
+        self._paths = {}
+        self._claimed = set()
+        self._thread = None
+        self.stats = {"prefetched": 0, "used": 0, "cancelled": 0}
+
+    def start(self):
+        if self.depth > 0 and self._clips:
+            self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        # Aussi en cas d'exception : le thread de préchargement et yt-dlp ne doivent pas survivre à la boucle
+        self.cancel()
+
+    def _unclaimed_bytes(self):
+        total = 0
+        for clip_id, path in self._paths.items():
+            if clip_id not in self._claimed and os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+    def _next_target(self):
+        """Prochain clip à précharger (appelé sous verrou), ou None s'il faut attendre."""
+        ahead = 0
+        for clip in self._clips[self._position:]:
+            if ahead >= self.depth:
+                return None
+            clip_id = clip["id"]
+            status = self._status.get(clip_id)
+            if clip_id in self._claimed or status in ("skipped", "failed"):
+                continue
+            if status in ("downloading", "done"):
+                ahead += 1
+                continue
+            if not self._should_prefetch(clip):
+                self._status[clip_id] = "skipped"
+                continue
+            if self._unclaimed_bytes() >= self.max_bytes:
+                return None
+            return clip
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                clip = self._next_target()
+                while clip is None and not self._cancel_event.is_set():
+                    self._cond.wait()
+                    clip = self._next_target()
+                if self._cancel_event.is_set():
+                    return
+                self._status[clip["id"]] = "downloading"
+
+            print(f"⏬ Préchargement en arrière-plan du clip '{clip['id']}'...")
+            path = download_clip.download_twitch_clip(
+                clip["url"], raw_clip_path(clip["id"]), cancel_event=self._cancel_event, verbose=False,
+                clip_id=clip["id"], **self._download_options
+            )
+
+            with self._cond:
+                if path and os.path.exists(path) and not self._cancel_event.is_set():
+                    self._status[clip["id"]] = "done"
+                    self._paths[clip["id"]] = path
+                    self.stats["prefetched"] += 1
+                else:
+                    self._status[clip["id"]] = "failed"
+                    if path:
+                        get_source_cache().unpin(clip["id"])
+                    if self._cancel_event.is_set():
+                        self.stats["cancelled"] += 1
+                        download_clip.remove_partial_download(raw_clip_path(clip["id"]))
+                self._cond.notify_all()
+
+    def claim(self, clip):
+        """
+        Indique que la boucle principale commence le traitement de `clip`. Si ce clip est en cours
+        de préchargement, attend la fin du téléchargement. Retourne le chemin du fichier préchargé,
+        ou None si le clip n'a pas été préchargé (la boucle principale le télécharge elle-même).
+        """
+        clip_id = clip["id"]
+        with self._cond:
+            self._claimed.add(clip_id)
+            if clip_id in self._index:
+                self._position = max(self._position, self._index[clip_id] + 1)
+            self._cond.notify_all()
+            while self._status.get(clip_id) == "downloading" and not self._cancel_event.is_set():
+                self._cond.wait()
+            if self._status.get(clip_id) == "done":
+                self.stats["used"] += 1
+                return self._paths[clip_id]
+            return None
+
+    def cancel(self):
+        """Arrête les préchargements (les clips préchargés non réclamés restent dans le cache des clips sources)."""
+        with self._cond:
+            self._cancel_event.set()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        unclaimed = [clip_id for clip_id in self._paths if clip_id not in self._claimed]
+        if unclaimed:
+            cache = get_source_cache()
+            for clip_id in unclaimed:
+                cache.unpin(clip_id)
+        if self.stats["prefetched"] or self.stats["cancelled"]:
+            print(f"⏬ Préchargement : {self.stats['used']}/{self.stats['prefetched']} clip(s) préchargé(s) utilisé(s), "
+                  f"{self.stats['cancelled']} téléchargement(s) annulé(s).")
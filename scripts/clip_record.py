@@ -0,0 +1,189 @@
+# scripts/clip_record.py
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Champs d'un clip, dans l'ordre historique du dictionnaire construit par fetch_clips.
+# "viewer_count" contient le view_count de l'API Helix. video_id et vod_offset (position du
+# clip dans la VOD, en secondes) sont None quand la VOD n'est pas disponible.
+CLIP_FIELDS = (
+    "id", "url", "embed_url", "thumbnail_url", "title", "viewer_count", "broadcaster_id",
+    "broadcaster_name", "game_id", "game_name", "created_at", "duration", "language",
+    "video_id", "vod_offset"
+)
+_FIELD_SET = frozenset(CLIP_FIELDS)
+
+
+def parse_created_at(value):
+    """Convertit un created_at Helix ('2024-01-01T12:00:00Z') en timestamp epoch (0 si invalide)."""
+    try:
+        return int(datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_created_at_array(values):
+    """Version vectorisée de parse_created_at pour une séquence de created_at (0 si invalide)."""
+    cleaned = [value[:-1] if isinstance(value, str) and value.endswith('Z') else 'NaT' for value in values]
+    try:
+        parsed = np.array(cleaned, dtype='datetime64[s]')
+    except ValueError:
+        return np.fromiter((parse_created_at(value) for value in values), dtype=np.int64, count=len(values))
+    timestamps = parsed.astype(np.int64)
+    timestamps[np.isnat(parsed)] = 0
+    return timestamps
+
+
+class ClipRecord:
+    """
+    Représentation compacte d'un clip (__slots__, pas de __dict__ par instance).
+
+    Garde la compatibilité avec l'ancien dictionnaire de clip : clip['id'], clip.get('title', ...),
+    'id' in clip, clip.items()... fonctionnent comme avant. Les clés supplémentaires éventuellement
+    ajoutées par une étape du pipeline sont rangées dans un petit dictionnaire annexe, créé à la demande.
+    """
+
+    __slots__ = CLIP_FIELDS + ("_extra",)
+
+    def __init__(self, id=None, url=None, embed_url=None, thumbnail_url=None, title=None, viewer_count=0,
+                 broadcaster_id=None, broadcaster_name=None, game_id=None, game_name=None, created_at=None,
+                 duration=0.0, language=None, video_id=None, vod_offset=None):
+        self.id = id
+        self.url = url
+        self.embed_url = embed_url
+        self.thumbnail_url = thumbnail_url
+        self.title = title
+        self.viewer_count = viewer_count
+        self.broadcaster_id = broadcaster_id
+        self.broadcaster_name = broadcaster_name
+        self.game_id = game_id
+        self.game_name = game_name
+        self.created_at = created_at
+        self.duration = duration
+        self.language = language
+        self.video_id = video_id
+        self.vod_offset = vod_offset
+        self._extra = None
+
+    @classmethod
+    def from_helix(cls, clip):
+        """Construit un enregistrement à partir d'un élément 'data' de /helix/clips."""
+        return cls(
+            id=clip.get("id"),
+            url=clip.get("url"),
+            embed_url=clip.get("embed_url"),
+            thumbnail_url=clip.get("thumbnail_url"),
+            title=clip.get("title"),
+            viewer_count=clip.get("view_count", 0),
+            broadcaster_id=clip.get("broadcaster_id"),
+            broadcaster_name=clip.get("broadcaster_name"),
+            game_id=clip.get("game_id"),
+            game_name=clip.get("game_name"),
+            created_at=clip.get("created_at"),
+            duration=float(clip.get("duration", 0.0)),
+            language=clip.get("language"),
+            video_id=clip.get("video_id") or None,
+            vod_offset=clip.get("vod_offset")
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Construit un enregistrement à partir d'un dictionnaire de clip (clés de CLIP_FIELDS)."""
+        record = cls(**{field: data[field] for field in CLIP_FIELDS if field in data})
+        for key, value in data.items():
+            if key not in _FIELD_SET:
+                record[key] = value
+        return record
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in CLIP_FIELDS}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    # --- Compatibilité dictionnaire ---
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        return key in _FIELD_SET or (self._extra is not None and key in self._extra)
+
+    def keys(self):
+        return list(CLIP_FIELDS) + (list(self._extra) if self._extra else [])
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(CLIP_FIELDS) + (len(self._extra) if self._extra else 0)
+
+    def __eq__(self, other):
+        if isinstance(other, (ClipRecord, dict)):
+            return self.to_dict() == (other.to_dict() if isinstance(other, ClipRecord) else other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ClipRecord(id={self.id!r}, title={self.title!r}, viewer_count={self.viewer_count!r})"
+
+
+class ClipBatch:
+    """
+    Vue en colonnes NumPy d'une liste de clips, pour les opérations en masse
+    (filtrage langue/durée/historique, tris) sans parcourir les objets en Python.
+    """
+
+    def __init__(self, clips):
+        self.clips = list(clips)
+        n = len(self.clips)
+        self.ids = np.array([clip["id"] for clip in self.clips]) if n else np.empty(0, dtype=str)
+        self.views = np.fromiter((clip.get("viewer_count", 0) or 0 for clip in self.clips), dtype=np.int64, count=n)
+        self.durations = np.fromiter((clip.get("duration", 0.0) or 0.0 for clip in self.clips), dtype=np.float64, count=n)
+        self.created_ts = parse_created_at_array([clip.get("created_at") for clip in self.clips])
+        self.languages = np.array([clip.get("language") or "" for clip in self.clips]) if n else np.empty(0, dtype=str)
+
+    def __len__(self):
+        return len(self.clips)
+
+    def eligible_mask(self, language, min_duration, max_duration, exclude_ids=()):
+        """Masque booléen des clips dans la langue et la plage de durée demandées, hors exclude_ids."""
+        mask = (self.languages == language) & (self.durations >= min_duration) & (self.durations <= max_duration)
+        if len(exclude_ids) and len(self.ids):
+            mask &= ~np.isin(self.ids, np.array(list(exclude_ids)))
+        return mask
+
+    def select(self, mask_or_indices):
+        """Retourne la liste des clips sélectionnés par un masque ou un tableau d'indices."""
+        indices = np.flatnonzero(mask_or_indices) if getattr(mask_or_indices, "dtype", None) == bool else mask_or_indices
+        return [self.clips[i] for i in indices]
+
+    def order_by_views(self):
+        """Indices triés par vues décroissantes, puis id (même ordre que le catalogue)."""
+        return np.lexsort((self.ids, -self.views))
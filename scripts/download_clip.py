@@ -1,9 +1,247 @@
 # scripts/download_clip.py
+import glob
+import math
 import subprocess
 import sys
 import os
+import threading
+import time
 
-def download_twitch_clip(clip_url, output_path):
+from source_cache import get_source_cache
+
+try:
+    import yt_dlp
+    from yt_dlp.utils import DownloadCancelled, DownloadError
+except ImportError: # yt-dlp non importable : seul le moteur "subprocess" est disponible
+    yt_dlp = None
+
+# Moteur de téléchargement : "inprocess" (API yt_dlp.YoutubeDL, une instance réutilisée par thread)
+# ou "subprocess" (un processus `python -m yt_dlp` par clip, comportement historique).
+DOWNLOAD_ENGINE = os.getenv("DOWNLOAD_ENGINE", "inprocess")
+# Fragments téléchargés en parallèle pour les formats fragmentés (HLS/DASH)
+DOWNLOAD_CONCURRENT_FRAGMENTS = int(os.getenv("DOWNLOAD_CONCURRENT_FRAGMENTS", "4"))
+# Meilleure qualité vidéo disponible, en MP4 (moteur "subprocess", et repli du moteur "inprocess"
+# quand les formats proposés ne permettent pas de choisir une définition, voir select_rendition)
+DOWNLOAD_FORMAT = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
+# Agrandissement toléré entre la définition téléchargée et sa taille d'affichage dans le Short :
+# 1.0 = jamais moins de pixels que ceux affichés, 1.5 = une source 1.5 fois plus petite est acceptée
+DOWNLOAD_MAX_UPSCALE = float(os.getenv("DOWNLOAD_MAX_UPSCALE", "1.0"))
+# Intervalle minimal entre deux lignes de progression affichées (moteur "inprocess")
+DOWNLOAD_PROGRESS_INTERVAL_SECONDS = 2.0
+
+def remove_partial_download(output_path):
+    """Supprime le fichier de sortie et les fichiers intermédiaires de yt-dlp (.part, formats avant fusion)."""
+    root = os.path.splitext(output_path)[0]
+    for path in glob.glob(glob.escape(root) + ".*"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _format_width(fmt):
+    # Les formats des clips Twitch n'indiquent que la hauteur et le ratio d'image
+    return fmt.get("width") or fmt["height"] * (fmt.get("aspect_ratio") or 16 / 9)
+
+def _rendition_rank(fmt):
+    return (_format_width(fmt), fmt.get("fps") or 0, fmt.get("tbr") or 0)
+
+def _rendition_label(fmt):
+    return f"{fmt['height']}p{round(fmt['fps']) if fmt.get('fps') else ''}"
+
+def select_rendition(formats, display_width, max_upscale=DOWNLOAD_MAX_UPSCALE):
+    """
+    Choisit la définition à télécharger parmi les formats MP4 vidéo+audio en paysage de hauteur connue :
+    la plus légère dont la largeur suffit à l'affichage (largeur x max_upscale >= display_width),
+    à la même cadence que la meilleure. Sans display_width (rognage de webcam), ou si aucune ne
+    suffit, la meilleure définition est retenue.
+
+    Returns:
+        tuple: (format choisi, meilleur format), ou (None, None) si aucun format ne s'y prête
+        (le sélecteur DOWNLOAD_FORMAT de yt-dlp est alors utilisé).
+    """
+    candidates = [
+        fmt for fmt in formats
+        if fmt.get("height") and fmt.get("ext") == "mp4"
+        and fmt.get("vcodec") != "none" and fmt.get("acodec") != "none"
+        and not str(fmt.get("format_id", "")).startswith("portrait") and _format_width(fmt) >= fmt["height"]
+    ]
+    if not candidates:
+        return None, None
+    best = max(candidates, key=_rendition_rank)
+    if display_width is None:
+        return best, best
+    best_fps = best.get("fps") or 0
+    sufficient = [fmt for fmt in candidates
+                  if _format_width(fmt) * max_upscale >= display_width and (fmt.get("fps") or 0) >= best_fps - 1]
+    return (min(sufficient, key=_rendition_rank) if sufficient else best), best
+
+def _report_rendition(chosen, best, output_path):
+    """Affiche les octets et le décodage économisés par rapport à la meilleure définition."""
+    pixel_ratio = (_format_width(best) * best["height"] * (best.get("fps") or 1)) / \
+                  (_format_width(chosen) * chosen["height"] * (chosen.get("fps") or 1))
+    size = os.path.getsize(output_path)
+    best_size = best.get("filesize") or best.get("filesize_approx")
+    # Sans taille annoncée, le débit est supposé proportionnel au nombre de pixels par seconde
+    saved_bytes = best_size - size if best_size else size * (pixel_ratio - 1)
+    print(f"📉 Définition {_rendition_label(chosen)} au lieu de {_rendition_label(best)} : "
+          f"~{saved_bytes / 1e6:.1f} Mo de moins à télécharger, "
+          f"~{100 * (1 - 1 / pixel_ratio):.0f}% de temps de décodage en moins (pixels par seconde).")
+
+def _terminate_on_cancel(process, cancel_event):
+    """Interrompt yt-dlp dès que cancel_event est levé (se termine avec le processus)."""
+    while process.poll() is None:
+        if cancel_event.wait(0.2):
+            process.terminate()
+            return
+
+class _InProcessEngine:
+    """
+    Instance yt_dlp.YoutubeDL réutilisée d'un clip à l'autre (extracteurs déjà chargés,
+    connexions HTTP de son gestionnaire de requêtes conservées entre les téléchargements).
+    Une instance n'est utilisée que par un seul thread à la fois (voir _get_engine).
+    """
+
+    def __init__(self):
+        self.cancel_event = None
+        self.verbose = True
+        self.display_width = None
+        self.selection = (None, None)  # (format choisi, meilleur format) du dernier téléchargement
+        self._last_report = 0.0
+        self.ydl = yt_dlp.YoutubeDL({
+            "format": self._select_format,
+            "outtmpl": "%(id)s.%(ext)s",
+            "quiet": True,
+            "no_warnings": True,
+            "noprogress": True,
+            "noplaylist": True,
+            "overwrites": True,
+            "concurrent_fragment_downloads": DOWNLOAD_CONCURRENT_FRAGMENTS,
+            "progress_hooks": [self._progress_hook],
+        })
+        self._default_selector = self.ydl.build_format_selector(DOWNLOAD_FORMAT)
+
+    def _select_format(self, ctx):
+        # Sélecteur appelé par yt-dlp avec les formats disponibles du clip
+        self.selection = select_rendition(ctx["formats"], self.display_width)
+        if self.selection[0] is None:
+            yield from self._default_selector(ctx)
+        else:
+            yield self.selection[0]
+
+    def _progress_hook(self, progress):
+        # Appelé par yt-dlp (éventuellement depuis ses threads de fragments)
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise DownloadCancelled("Téléchargement annulé")
+        if not self.verbose:
+            return
+        now = time.monotonic()
+        if progress.get("status") == "downloading" and now - self._last_report >= DOWNLOAD_PROGRESS_INTERVAL_SECONDS:
+            self._last_report = now
+            downloaded = progress.get("downloaded_bytes") or 0
+            total = progress.get("total_bytes") or progress.get("total_bytes_estimate")
+            speed = progress.get("speed")
+            percent = f"{100 * downloaded / total:5.1f}%" if total else "  ?  "
+            speed_text = f"{speed / 1e6:.1f} Mo/s" if speed else "? Mo/s"
+            print(f"  ⬇️ {percent} - {downloaded / 1e6:.1f} Mo à {speed_text}")
+        elif progress.get("status") == "finished":
+            print(f"  ⬇️ 100.0% - {(progress.get('total_bytes') or progress.get('downloaded_bytes') or 0) / 1e6:.1f} Mo "
+                  f"en {progress.get('elapsed') or 0:.1f}s")
+
+    def download(self, clip_url, output_path, cancel_event, verbose, display_width):
+        self.cancel_event = cancel_event
+        self.verbose = verbose
+        self.display_width = display_width
+        self.selection = (None, None)
+        self._last_report = 0.0
+        self.ydl.params["outtmpl"]["default"] = output_path
+        return self.ydl.download([clip_url])
+
+_engines = threading.local()
+
+def _get_engine():
+    """Moteur yt-dlp du thread courant (boucle principale, thread de préchargement...), créé à la première utilisation."""
+    engine = getattr(_engines, "engine", None)
+    if engine is None:
+        engine = _engines.engine = _InProcessEngine()
+    return engine
+
+def _download_in_process(clip_url, output_path, cancel_event, verbose, display_width):
+    """
+    Retourne (chemin du fichier ou None, largeur de la définition téléchargée si elle est
+    inférieure à la meilleure disponible, sinon None).
+    """
+    engine = _get_engine()
+    try:
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled("Téléchargement annulé")
+        try:
+            retcode = engine.download(clip_url, output_path, cancel_event, verbose, display_width)
+        except DownloadError as e:
+            chosen, best = engine.selection
+            if chosen is best:
+                raise
+            # Repli : nouvel essai avec la meilleure définition
+            print(f"⚠️ Échec du téléchargement en {_rendition_label(chosen)} ({e}). Nouvel essai en {_rendition_label(best)}.")
+            remove_partial_download(output_path)
+            retcode = engine.download(clip_url, output_path, cancel_event, verbose, None)
+    except DownloadCancelled:
+        print(f"⏹️ Téléchargement annulé : {clip_url}")
+        remove_partial_download(output_path)
+        return None, None
+    except DownloadError as e:
+        print(f"❌ Erreur lors du téléchargement du clip : {e}")
+        remove_partial_download(output_path)
+        return None, None
+
+    if retcode == 0 and os.path.exists(output_path):
+        print(f"✅ Clip téléchargé avec succès vers : {output_path}")
+        chosen, best = engine.selection
+        if chosen is not best:
+            _report_rendition(chosen, best, output_path)
+            return output_path, int(_format_width(chosen))
+        return output_path, None
+    print(f"❌ Erreur lors du téléchargement du clip. Code de retour : {retcode}")
+    return None, None
+
+def _download_subprocess(clip_url, output_path, cancel_event, verbose):
+    # Commande yt-dlp pour télécharger la meilleure qualité vidéo disponible
+    # La durée max de youtube-dl est 1h, donc ça coupe automatiquement la vidéo à 1h
+    command = [
+        sys.executable, "-m", "yt_dlp",
+        "-f", DOWNLOAD_FORMAT,
+        "--concurrent-fragments", str(DOWNLOAD_CONCURRENT_FRAGMENTS),
+        "--output", output_path,
+        clip_url
+    ]
+
+    # Exécute la commande en temps réel pour voir la progression
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if cancel_event is not None:
+        threading.Thread(target=_terminate_on_cancel, args=(process, cancel_event), daemon=True).start()
+    output_tail = []
+    for line in process.stdout:
+        if verbose:
+            print(line, end='') # Affiche la sortie de yt-dlp en temps réel
+        else:
+            output_tail = (output_tail + [line])[-5:]
+
+    process.wait() # Attend que le processus se termine
+
+    if cancel_event is not None and cancel_event.is_set():
+        print(f"⏹️ Téléchargement annulé : {clip_url}")
+        remove_partial_download(output_path)
+        return None
+    if process.returncode == 0:
+        print(f"✅ Clip téléchargé avec succès vers : {output_path}")
+        return output_path
+    else:
+        print(f"❌ Erreur lors du téléchargement du clip. Code de retour : {process.returncode}")
+        if output_tail:
+            print(''.join(output_tail), end='')
+        return None
+
+def download_twitch_clip(clip_url, output_path, cancel_event=None, verbose=True, engine=None, clip_id=None,
+                         display_width=None):
     """
     Télécharge un clip Twitch en utilisant yt-dlp.
     Le clip est enregistré au format MP4.
@@ -11,39 +249,49 @@ def download_twitch_clip(clip_url, output_path):
     Args:
         clip_url (str): L'URL complète du clip Twitch (ex: https://www.twitch.tv/CLIP_ID).
         output_path (str): Le chemin complet où le fichier vidéo doit être sauvegardé.
+        cancel_event (threading.Event, optionnel): Interrompt le téléchargement quand il est levé
+            (les fichiers partiels sont supprimés).
+        verbose (bool): Affiche la progression du téléchargement (désactivé pour les préchargements).
+        engine (str, optionnel): "inprocess" ou "subprocess" (par défaut DOWNLOAD_ENGINE).
+        clip_id (str, optionnel): ID du clip ; le cache des clips sources (source_cache) est alors
+            consulté avant tout accès réseau, et le clip téléchargé y est ajouté après validation.
+            Le clip retourné reste épinglé dans le cache (non évincé) jusqu'à ce que l'appelant
+            appelle get_source_cache().unpin(clip_id).
+        display_width (int, optionnel): Largeur d'affichage de l'image source dans le Short
+            (process_video.source_display_width). Le moteur "inprocess" télécharge alors la plus
+            petite définition suffisante (voir select_rendition) ; sans elle, la meilleure.
 
     Returns:
         str: Le chemin du fichier téléchargé si le téléchargement est réussi, sinon None.
     """
-    print(f"📥 Téléchargement du clip Twitch depuis : {clip_url}")
-    print(f"Destination : {output_path}")
+    if engine is None:
+        engine = DOWNLOAD_ENGINE
+    cache = get_source_cache() if clip_id else None
+    # Un clip en cache téléchargé dans une définition réduite doit suffire à l'affichage demandé
+    min_width = math.inf if display_width is None else display_width / DOWNLOAD_MAX_UPSCALE
+    if cache is not None and cache.lookup(clip_id, min_width=min_width, pin=True):
+        print(f"♻️ Clip source trouvé dans le cache : {clip_id}")
+        return cache.copy_to(clip_id, output_path)
+
+    if verbose:
+        print(f"📥 Téléchargement du clip Twitch depuis : {clip_url}")
+        print(f"Destination : {output_path}")
 
     # Assurez-vous que le répertoire de destination existe
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     try:
-        # Commande yt-dlp pour télécharger la meilleure qualité vidéo disponible
-        # La durée max de youtube-dl est 1h, donc ça coupe automatiquement la vidéo à 1h
-        command = [
-            sys.executable, "-m", "yt_dlp",
-            "-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
-            "--output", output_path,
-            clip_url
-        ]
-        
-        # Exécute la commande en temps réel pour voir la progression
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        for line in process.stdout:
-            print(line, end='') # Affiche la sortie de yt-dlp en temps réel
-
-        process.wait() # Attend que le processus se termine
-
-        if process.returncode == 0:
-            print(f"✅ Clip téléchargé avec succès vers : {output_path}")
-            return output_path
+        reduced_width = None
+        if engine == "inprocess" and yt_dlp is not None:
+            downloaded, reduced_width = _download_in_process(clip_url, output_path, cancel_event, verbose, display_width)
         else:
-            print(f"❌ Erreur lors du téléchargement du clip. Code de retour : {process.returncode}")
-            return None
+            downloaded = _download_subprocess(clip_url, output_path, cancel_event, verbose)
+        if downloaded and cache is not None:
+            # Validation (ffprobe) et ajout au cache ; le fichier est servi depuis le cache
+            if cache.add(clip_id, downloaded, reduced_width=reduced_width, pin=True) is None:
+                return None
+            return cache.copy_to(clip_id, output_path)
+        return downloaded
     except FileNotFoundError:
         print("❌ Erreur : yt-dlp n'est pas trouvé. Assurez-vous qu'il est installé (pip install yt-dlp).")
         return None
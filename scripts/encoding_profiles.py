@@ -0,0 +1,154 @@
+# scripts/encoding_profiles.py
+import functools
+import json
+import os
+import subprocess
+import time
+from fractions import Fraction
+
+# Profils d'encodage x264 du rendu, du meilleur (le plus lent) au plus rapide :
+# preset x264, crf (qualité constante), max_bitrate (plafond de débit en kbit/s) et
+# keyframe_seconds (intervalle entre deux images clés ; None : valeur par défaut de x264). "balanced",
+# le profil par défaut, reprend les réglages par défaut de x264 du rendu d'origine. Les threads de l'encodeur ne dépendent
+# pas du profil : ils viennent du budget CPU du rendu (parallel_render.split_cpu_budget).
+ENCODING_PROFILES = {
+    "quality": {"preset": "slow", "crf": 18, "max_bitrate": 12000, "keyframe_seconds": 2},
+    "balanced": {"preset": "medium", "crf": 23, "max_bitrate": None, "keyframe_seconds": None},
+    "fast": {"preset": "veryfast", "crf": 23, "max_bitrate": 8000, "keyframe_seconds": 2},
+    "draft": {"preset": "ultrafast", "crf": 26, "max_bitrate": 6000, "keyframe_seconds": 2},
+}
+DEFAULT_PROFILE = "balanced"
+# Profil du rendu : un nom de ENCODING_PROFILES, ou "auto" (voir select_profile)
+ENCODING_PROFILE = os.getenv("ENCODING_PROFILE", DEFAULT_PROFILE)
+# Mode "auto" : durée maximale souhaitée du rendu d'un clip, en secondes
+RENDER_DEADLINE_SECONDS = float(os.getenv("RENDER_DEADLINE_SECONDS", "300"))
+# Mode "auto" : durée de l'extrait rendu pour mesurer la vitesse d'un profil
+CALIBRATION_SECONDS = float(os.getenv("CALIBRATION_SECONDS", "2"))
+# Part de l'échéance utilisable par l'estimation (marge pour la séquence de fin, l'écriture...)
+DEADLINE_SAFETY_MARGIN = 0.8
+
+# Calibrations (images/s, images de l'extrait) conservées entre les exécutions et partagées par les
+# processus de rendu : chaque processus "spawn" repart d'un module vierge et recalibrerait sinon
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+CALIBRATION_FILE = os.path.join(DATA_DIR, 'encoding_calibrations.json')
+
+# Calibrations par clé (voir _calibration_key), chargées depuis CALIBRATION_FILE au premier besoin
+_calibrations = None
+
+
+def video_args(name, frame_rate):
+    """
+    Paramètres x264 du profil hors preset et threads : crf, plafond de débit et intervalle entre
+    images clés, ces deux derniers seulement s'ils sont fixés par le profil (frame_rate : nombre
+    ou fraction ffmpeg, ex. "30000/1001").
+    """
+    profile = ENCODING_PROFILES[name]
+    args = ["-crf", str(profile["crf"])]
+    if profile["max_bitrate"]:
+        args += ["-maxrate", f"{profile['max_bitrate']}k", "-bufsize", f"{2 * profile['max_bitrate']}k"]
+    if profile["keyframe_seconds"]:
+        keyframe_interval = max(1, round(float(Fraction(str(frame_rate))) * profile["keyframe_seconds"]))
+        args += ["-g", str(keyframe_interval)]
+    return args
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_version(binary):
+    """Première ligne de `binary -version` (une version d'ffmpeg ou de x264 différente change les vitesses)."""
+    try:
+        result = subprocess.run([binary, "-version"], capture_output=True, text=True)
+    except OSError:
+        return ""
+    return (result.stdout.splitlines() or [""])[0]
+
+
+def _calibration_key(calibration_key, profile):
+    # Mesures valables pour une machine donnée : nombre de CPU inclus dans la clé
+    return json.dumps([os.cpu_count(), calibration_key, profile], default=str)
+
+
+def _load_calibrations(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {key: tuple(value) for key, value in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, TypeError) as e:
+        print(f"⚠️ Calibrations d'encodage illisibles ({e}). Elles seront refaites.")
+        return {}
+
+
+def _save_calibration(key, value, path):
+    """Ajoute une mesure au fichier (relu juste avant : d'autres processus de rendu ont pu y écrire)."""
+    calibrations = _load_calibrations(path)
+    calibrations[key] = value
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(calibrations, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Impossible de sauvegarder les calibrations d'encodage : {e}")
+
+
+def _calibration(calibration_key, profile, encode_sample, path):
+    """(images/s, images de l'extrait) du profil : mesure conservée, sinon calibration puis sauvegarde."""
+    global _calibrations
+    if _calibrations is None:
+        _calibrations = _load_calibrations(path)
+    key = _calibration_key(calibration_key, profile)
+    if key not in _calibrations:
+        sample_start = time.perf_counter()
+        frames = encode_sample(profile)
+        value = (frames / (time.perf_counter() - sample_start) if frames else 0.0, frames)
+        _calibrations[key] = value
+        if frames:
+            _save_calibration(key, value, path)
+    return _calibrations[key]
+
+
+def select_profile(name, total_frames, encode_sample, calibration_key=None, deadline=RENDER_DEADLINE_SECONDS,
+                   calibration_file=CALIBRATION_FILE):
+    """
+    Profil d'encodage d'un rendu de `total_frames` images.
+
+    Avec un nom de profil (par défaut ENCODING_PROFILE), ce profil est utilisé tel quel. En mode
+    "auto", les profils sont calibrés du plus rapide au plus lent : encode_sample(profil) rend un
+    extrait de CALIBRATION_SECONDS avec ce profil et retourne le nombre d'images produites (0 en
+    cas d'échec). Le profil retenu est le meilleur dont le rendu estimé tient dans ce qui reste de
+    l'échéance une fois la calibration faite ; le plus rapide si aucun n'y tient. Les mesures sont
+    conservées dans calibration_file pour les rendus suivants (de tous les processus et des
+    exécutions suivantes) de même calibration_key (version d'ffmpeg, moteur, définition, cadence,
+    threads...) sur une machine au même nombre de CPU. Une calibration en échec n'est pas enregistrée.
+    """
+    name = name or ENCODING_PROFILE
+    if name != "auto":
+        if name not in ENCODING_PROFILES:
+            print(f"⚠️ Profil d'encodage inconnu '{name}'. Utilisation du profil '{DEFAULT_PROFILE}'.")
+            return DEFAULT_PROFILE
+        return name
+
+    candidates = list(reversed(ENCODING_PROFILES)) # Du plus rapide au plus lent
+    chosen = candidates[0]
+    start = time.perf_counter()
+    for i, candidate in enumerate(candidates):
+        fps, sample_frames = _calibration(calibration_key, candidate, encode_sample, calibration_file)
+        if not fps:
+            print(f"⚠️ Échec de la calibration du profil '{candidate}'.")
+            break
+        estimate = total_frames / fps
+        remaining = deadline - (time.perf_counter() - start)
+        print(f"⏱️ Calibration '{candidate}' : {fps:.1f} img/s, rendu estimé à {estimate:.0f}s "
+              f"({remaining:.0f}s restantes sur l'échéance de {deadline:.0f}s)")
+        if estimate > remaining * DEADLINE_SAFETY_MARGIN:
+            break
+        chosen = candidate
+        # Le profil suivant est plus lent : inutile de le calibrer si, après sa calibration (au moins
+        # aussi longue que celle-ci), même un rendu à la vitesse de ce profil ne tiendrait plus
+        if i + 1 < len(candidates) and _calibration_key(calibration_key, candidates[i + 1]) not in _calibrations \
+                and estimate > (remaining - sample_frames / fps) * DEADLINE_SAFETY_MARGIN:
+            break
+    print(f"🎛️ Profil d'encodage choisi : '{chosen}' ({ENCODING_PROFILES[chosen]['preset']}, "
+          f"crf {ENCODING_PROFILES[chosen]['crf']})")
+    return chosen
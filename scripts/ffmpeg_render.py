@@ -0,0 +1,276 @@
+# scripts/ffmpeg_render.py
+import os
+import subprocess
+import tempfile
+import time
+
+import encoding_profiles
+import prepared_assets
+import text_overlay
+from prepared_assets import (
+    AUDIO_CHANNELS, AUDIO_SAMPLE_RATE, FFMPEG_BINARY, audio_encoder_args, channel_layout, video_encoder_args
+)
+from process_video import END_CLIP_DURATION, END_SHORT_VIDEO_PATH, SHORT_HEIGHT, SHORT_WIDTH, main_video_layout
+from source_cache import probe_media
+
+
+def _video_box(source):
+    """Rectangle (x0, y0, x1, y1) occupé par la vidéo principale dans le Short (voir main_video_layout)."""
+    _, (width, height), (x, y) = main_video_layout(source["width"], source["height"])
+    return x, y, x + width, y + height
+
+
+# Fréquences d'échantillonnage acceptées par l'encodeur AAC de ffmpeg (séquence de fin au format du clip)
+AAC_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000)
+
+
+def audio_reencode_reason(source):
+    """
+    Raison pour laquelle l'audio du clip (probe_media) doit être réencodé, ou None s'il peut être
+    copié tel quel : AAC-LC mono ou stéréo, comme la séquence de fin préparée à son format.
+    """
+    audio = source.get("audio")
+    if audio is None:
+        return "pas de piste audio, silence ajouté"
+    if audio["codec"] != "aac" or audio["profile"] not in ("LC", None):
+        return f"codec {audio['codec']}" + (f" ({audio['profile']})" if audio["profile"] else "")
+    if audio["channels"] not in (1, 2):
+        return f"{audio['channels']} canaux"
+    if audio["sample_rate"] not in AAC_SAMPLE_RATES:
+        return f"fréquence d'échantillonnage {audio['sample_rate']}"
+    return None
+
+
+def _audio_chain(label, duration, has_audio, input_index):
+    """Audio normalisé (stéréo, AUDIO_SAMPLE_RATE) d'une entrée, ou silence si elle n'en a pas."""
+    if has_audio:
+        return (f"[{input_index}:a]aresample={AUDIO_SAMPLE_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo,"
+                f"asetpts=PTS-STARTPTS[{label}]")
+    return f"anullsrc=r={AUDIO_SAMPLE_RATE}:cl=stereo,atrim=duration={duration:.3f}[{label}]"
+
+
+def build_command(input_path, output_path, source, duration, clip_data, scratch_dir, background_path=None,
+                  end_asset_path=None, profile=encoding_profiles.DEFAULT_PROFILE, threads=None, copy_audio=False):
+    """
+    Compile la mise en page de trim_video_for_short en une commande ffmpeg à un seul graphe
+    filter_complex : fond, vidéo principale agrandie et centrée, puis textes et icône Twitch.
+
+    Les textes sont rastérisés une seule fois par Pillow (text_overlay.static_layers) : ce qui est
+    hors de la vidéo est déjà composé dans l'image de fond, seul le reste est superposé à chaque image.
+    background_path : image de fond déjà à la taille du Short (prepared_assets), ou None pour un fond noir.
+    end_asset_path : séquence de fin brute à redimensionner et concaténer dans le graphe ; None quand
+    la séquence de fin préparée est ajoutée ensuite par copie de flux (prepared_assets.concat_copy).
+    profile : profil d'encodage (encoding_profiles) ; threads : threads du graphe de filtres et de
+    l'encodeur (None : choix de ffmpeg).
+    copy_audio : copie la piste audio du clip sans réencodage (voir audio_reencode_reason) ; sans
+    effet avec end_asset_path, dont la concaténation dans le graphe impose de réencoder l'audio.
+    Retourne (commande, durée de la séquence de fin ajoutée dans le graphe).
+    """
+    frame_rate = source["frame_rate"]
+    if not background_path:
+        print("⚠️ Image de fond introuvable. Utilisation d'un fond noir.")
+    background, top_layer = text_overlay.static_layers(
+        background_path, clip_data.get('title', 'Titre du clip'),
+        clip_data.get('broadcaster_name', 'Nom du streamer'), _video_box(source))
+    background_with_text = os.path.join(scratch_dir, "background.png")
+    background.save(background_with_text, compress_level=1)
+
+    # Fond avec les textes : image décodée une seule fois puis répétée à la cadence du clip
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+               "-t", f"{duration:.3f}", "-i", input_path, "-i", background_with_text]
+    filters = [f"[1:v]setsar=1,loop=loop=-1:size=1,fps={frame_rate}[bg]"]
+    next_input = 2
+
+    # Vidéo principale agrandie et centrée : seule la partie visible de la source est redimensionnée
+    (crop_x, crop_y, crop_width, crop_height), (width, height), (x, y) = main_video_layout(
+        source["width"], source["height"])
+    filters.append(f"[0:v]setpts=PTS-STARTPTS,crop={crop_width}:{crop_height}:{crop_x}:{crop_y},"
+                   f"scale={width}:{height},setsar=1,fps={frame_rate}[main]")
+    overlays = [f"[bg][main]overlay=x={x}:y={y}:shortest=1"]
+
+    # Partie des textes qui chevauche la vidéo, superposée au-dessus de celle-ci
+    if top_layer is not None:
+        layer, (layer_x, layer_y) = top_layer
+        layer_path = os.path.join(scratch_dir, "text_layer.png")
+        layer.save(layer_path, compress_level=1)
+        command += ["-i", layer_path]
+        filters.append(",".join(overlays) + "[composed]")
+        overlays = [f"[composed][{next_input}:v]overlay=x={layer_x}:y={layer_y}"]
+        next_input += 1
+    filters.append(",".join(overlays) + ",format=yuv420p[mainv]")
+    # Audio du clip copié tel quel (coupé à `duration` par l'option -t de l'entrée), ou normalisé et réencodé
+    copy_audio = copy_audio and source["has_audio"] and not end_asset_path
+    if not copy_audio:
+        filters.append(_audio_chain("maina", duration, source["has_audio"], 0))
+
+    # Repli : séquence de fin brute, redimensionnée et concaténée dans le même graphe
+    end_duration = 0.0
+    end_clip = probe_media(end_asset_path) if end_asset_path and os.path.exists(end_asset_path) else None
+    if end_clip is not None:
+        end_duration = min(end_clip["duration"] or END_CLIP_DURATION, END_CLIP_DURATION)
+        command += ["-t", f"{end_duration:.3f}", "-i", end_asset_path]
+        filters.append(f"[{next_input}:v]setpts=PTS-STARTPTS,scale={SHORT_WIDTH}:{SHORT_HEIGHT},setsar=1,"
+                       f"fps={frame_rate},format=yuv420p[endv]")
+        filters.append(_audio_chain("enda", end_duration, end_clip["has_audio"], next_input))
+        filters.append("[mainv][maina][endv][enda]concat=n=2:v=1:a=1[outv][outa]")
+        print("✅ Séquence de fin ajoutée au graphe de rendu.")
+    else:
+        filters.append("[mainv]null[outv]")
+        if not copy_audio:
+            filters.append("[maina]anull[outa]")
+
+    if threads:
+        command += ["-filter_complex_threads", str(threads), "-threads", str(threads)]
+    command += [
+        "-filter_complex", ";".join(filters),
+        "-map", "[outv]", "-map", "0:a:0" if copy_audio else "[outa]"
+    ] + video_encoder_args(profile, frame_rate)
+    command += ["-c:a", "copy"] if copy_audio else audio_encoder_args()
+    command += ["-movflags", "+faststart", output_path]
+    return command, end_duration
+
+
+def _run_ffmpeg(command):
+    """Retourne (code de retour, fin de la sortie d'erreur) ; code None si ffmpeg est introuvable."""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        print(f"❌ Erreur : '{FFMPEG_BINARY}' est introuvable. Assurez-vous que ffmpeg est installé et dans le PATH.")
+        return None, ""
+    return result.returncode, result.stderr.strip()[-1000:]
+
+
+def _select_profile(encoding_profile, input_path, source, duration, clip_data, scratch_dir, background_path, threads,
+                    copy_audio):
+    """Profil d'encodage du rendu ; en mode "auto", calibré en rendant le début du clip avec le même graphe."""
+    sample_duration = min(duration, encoding_profiles.CALIBRATION_SECONDS)
+
+    def encode_sample(profile):
+        sample_path = os.path.join(scratch_dir, f"calibration_{profile}.mp4")
+        command, _ = build_command(input_path, sample_path, source, sample_duration, clip_data, scratch_dir,
+                                   background_path=background_path, profile=profile,
+                                   threads=threads, copy_audio=copy_audio)
+        returncode, _ = _run_ffmpeg(command)
+        if os.path.exists(sample_path):
+            os.remove(sample_path)
+        return int(sample_duration * source["fps"]) if returncode == 0 else 0
+
+    return encoding_profiles.select_profile(
+        encoding_profile, duration * source["fps"], encode_sample,
+        calibration_key=(encoding_profiles.ffmpeg_version(FFMPEG_BINARY), "ffmpeg", source["width"], source["height"],
+                         source["frame_rate"], threads))
+
+
+def render_short(input_path, output_path, max_duration_seconds=60, clip_data=None, threads=None, encoding_profile=None):
+    """
+    Rendu du Short en un seul processus ffmpeg (voir build_command), même mise en page que le
+    rendu MoviePy de trim_video_for_short. La séquence de fin préparée (prepared_assets), encodée
+    avec les mêmes paramètres et au format audio du clip, est ensuite ajoutée sans réencodage :
+    l'audio du clip est alors copié tel quel s'il le permet (voir audio_reencode_reason).
+    encoding_profile : profil d'encodage ou "auto" (par défaut encoding_profiles.ENCODING_PROFILE).
+    Retourne output_path, ou None en cas d'échec.
+    """
+    clip_data = clip_data or {}
+    source = probe_media(input_path)
+    if source is None:
+        print(f"❌ Impossible de lire le clip avec ffprobe : {input_path}")
+        return None
+    print(f"Résolution originale du clip : {source['width']}x{source['height']} à {source['fps']:.2f} img/s")
+    duration = min(source["duration"] or max_duration_seconds, max_duration_seconds)
+
+    background_path = prepared_assets.prepared_background()
+    reencode_reason = audio_reencode_reason(source)
+    audio_format = (AUDIO_SAMPLE_RATE, AUDIO_CHANNELS)
+    if reencode_reason is None:
+        audio_format = (source["audio"]["sample_rate"], source["audio"]["channels"])
+    with tempfile.TemporaryDirectory(prefix="render_") as scratch_dir:
+        try:
+            profile = _select_profile(encoding_profile, input_path, source, duration, clip_data, scratch_dir,
+                                      background_path, threads, reencode_reason is None)
+            ending = prepared_assets.prepared_ending(source["frame_rate"], profile, *audio_format)
+            if ending is None and os.path.exists(END_SHORT_VIDEO_PATH):
+                print("⚠️ Séquence de fin préparée indisponible : elle sera réencodée avec le clip.")
+                reencode_reason = reencode_reason or "séquence de fin concaténée dans le graphe"
+            elif ending is None:
+                print(f"⚠️ Fichier '{os.path.basename(END_SHORT_VIDEO_PATH)}' non trouvé dans le dossier 'assets'. Le Short sera créé sans séquence de fin.")
+            if reencode_reason is None:
+                print(f"🔊 Audio du clip copié sans réencodage (AAC {audio_format[0]} Hz, {channel_layout(audio_format[1])}).")
+            else:
+                print(f"🔊 Audio du clip réencodé en AAC : {reencode_reason}.")
+
+            # Avec la séquence de fin préparée, le graphe ne rend que le clip, dans un fichier intermédiaire
+            main_output = os.path.join(scratch_dir, "main.mp4") if ending else output_path
+            command, end_duration = build_command(
+                input_path, main_output, source, duration, clip_data, scratch_dir,
+                background_path=background_path, end_asset_path=None if ending else END_SHORT_VIDEO_PATH,
+                profile=profile, threads=threads,
+                copy_audio=reencode_reason is None)
+        except OSError as e:
+            print(f"❌ Erreur lors de la préparation du rendu ffmpeg : {e}")
+            return None
+        start = time.perf_counter()
+        returncode, errors = _run_ffmpeg(command)
+        if returncode == 0 and ending:
+            end_path, end_duration = ending
+            if not prepared_assets.concat_copy([main_output, end_path], output_path):
+                returncode, errors = -1, "concaténation de la séquence de fin"
+            else:
+                print("✅ Séquence de fin ajoutée sans réencodage.")
+        elapsed = time.perf_counter() - start
+
+    if returncode != 0 or not os.path.exists(output_path):
+        if returncode is not None:
+            print(f"❌ Erreur lors du rendu ffmpeg (code {returncode}) : {errors}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+    frames = int((duration + end_duration) * source["fps"])
+    print(f"✅ Clip traité et sauvegardé : {output_path} (profil '{profile}', "
+          f"{frames} images en {elapsed:.1f}s, {frames / max(elapsed, 1e-6):.1f} img/s)")
+    return output_path
+
+
+def mux_audio(video_path, output_path, input_path, duration, end_asset=None):
+    """
+    Ajoute l'audio à une vidéo rendue sans piste audio (rendu MoviePy), en une seule passe ffmpeg
+    sans réencoder la vidéo : audio du clip input_path coupé à `duration`, suivi de celui de la
+    séquence de fin end_asset = (chemin, durée) si elle a été ajoutée. Sans séquence de fin,
+    l'audio du clip est copié tel quel s'il le permet ; sinon les deux sont réencodés ensemble.
+    Retourne output_path, ou None en cas d'échec.
+    """
+    source = probe_media(input_path)
+    if source is None:
+        print(f"❌ Impossible de lire le clip avec ffprobe : {input_path}")
+        return None
+    reencode_reason = audio_reencode_reason(source)
+    if end_asset is not None and reencode_reason is None:
+        reencode_reason = "concaténation avec la séquence de fin"
+
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+               "-i", video_path, "-t", f"{duration:.3f}", "-i", input_path]
+    if reencode_reason is None:
+        command += ["-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "copy"]
+        print("🔊 Audio du clip copié sans réencodage.")
+    else:
+        filters = [_audio_chain("maina", duration, source["has_audio"], 1)]
+        if end_asset is not None:
+            end_path, end_duration = end_asset
+            end_info = probe_media(end_path)
+            command += ["-t", f"{end_duration:.3f}", "-i", end_path]
+            filters.append(_audio_chain("enda", end_duration, bool(end_info and end_info["has_audio"]), 2))
+            filters.append("[maina][enda]concat=n=2:v=0:a=1[outa]")
+        else:
+            filters.append("[maina]anull[outa]")
+        command += ["-filter_complex", ";".join(filters),
+                    "-map", "0:v:0", "-map", "[outa]", "-c:v", "copy"] + audio_encoder_args()
+        print(f"🔊 Audio du clip réencodé en AAC : {reencode_reason}.")
+    command += ["-movflags", "+faststart", output_path]
+
+    returncode, errors = _run_ffmpeg(command)
+    if returncode != 0 or not os.path.exists(output_path):
+        if returncode is not None:
+            print(f"❌ Erreur lors de l'ajout de l'audio (code {returncode}) : {errors}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+    return output_path
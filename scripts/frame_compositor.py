@@ -0,0 +1,58 @@
+# scripts/frame_compositor.py
+import numpy as np
+from moviepy.editor import VideoClip
+from PIL import Image
+
+from process_video import main_video_layout
+
+
+class ShortCompositor:
+    """
+    Composition image par image du Short pour le rendu MoviePy, dans des tampons NumPy alloués
+    une seule fois par clip :
+    - le fond (textes hors vidéo déjà appliqués, voir text_overlay.static_layers) est copié une
+      seule fois : la vidéo occupe toujours le même rectangle, le reste de l'image ne change pas ;
+    - seule la partie visible de la vidéo principale est redimensionnée (main_video_layout) ;
+    - le calque de texte qui chevauche la vidéo est mélangé avec des coefficients précalculés.
+
+    L'image retournée par make_frame est réutilisée à chaque appel : elle doit être consommée
+    avant l'appel suivant (c'est le cas lors de l'écriture par MoviePy).
+    """
+
+    def __init__(self, source_clip, background, text_layer=None, display_width=None):
+        self.source_clip = source_clip
+        self.crop_box, self.size, (x, y) = main_video_layout(source_clip.w, source_clip.h, display_width)
+        self.frame = np.array(background.convert("RGB"), dtype=np.uint8)
+        self.video_area = self.frame[y:y + self.size[1], x:x + self.size[0]]
+
+        self.layer_area = None
+        if text_layer is not None:
+            layer, (layer_x, layer_y) = text_layer
+            rgba = np.asarray(layer, dtype=np.float32) / 255
+            alpha = rgba[:, :, 3:]
+            self.layer_area = self.frame[layer_y:layer_y + layer.height, layer_x:layer_x + layer.width]
+            # +0.5 : arrondi au plus proche lors de la conversion finale en uint8
+            self.layer_premultiplied = rgba[:, :, :3] * alpha * 255 + 0.5
+            self.layer_inverse_alpha = 1 - alpha
+            self.blend = np.empty(self.layer_area.shape, dtype=np.float32)
+
+    def make_frame(self, t):
+        crop_x, crop_y, crop_width, crop_height = self.crop_box
+        source = Image.fromarray(self.source_clip.get_frame(t))
+        # Rééchantillonne uniquement la région visible (argument box de Pillow, sans copie intermédiaire)
+        scaled = source.resize(self.size, Image.LANCZOS,
+                               box=(crop_x, crop_y, crop_x + crop_width, crop_y + crop_height))
+        self.video_area[...] = np.asarray(scaled)
+
+        if self.layer_area is not None:
+            np.multiply(self.layer_area, self.layer_inverse_alpha, out=self.blend)
+            np.add(self.blend, self.layer_premultiplied, out=self.blend)
+            np.copyto(self.layer_area, self.blend, casting="unsafe")
+        return self.frame
+
+    def clip(self, duration):
+        """Clip MoviePy du Short composé, avec l'audio de la vidéo principale."""
+        composed = VideoClip(self.make_frame, duration=duration)
+        if self.source_clip.audio is not None:
+            composed = composed.set_audio(self.source_clip.audio)
+        return composed
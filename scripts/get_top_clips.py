@@ -3,18 +3,47 @@ import requests
 import os
 import json
 import sys
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
+from requests.adapters import HTTPAdapter
+
+from clip_catalog import ClipCatalog, CATALOG_RETENTION_DAYS
+from clip_dedup import DEDUP_NEAR_DUPLICATES, filter_near_duplicates
+from clip_record import ClipRecord
+from published_history import PublishedHistory
+from rate_limiter import TokenBucketRateLimiter
+from thumbnail_prescreen import PRESCREEN_THUMBNAILS, prescreen_clips
+from view_velocity import ViewSnapshotStore, rank_by_velocity
+
 # Twitch API credentials from GitHub Secrets
 CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
 CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
 
-if not CLIENT_ID or not CLIENT_SECRET:
-    print("❌ ERREUR: TWITCH_CLIENT_ID ou TWITCH_CLIENT_SECRET non définis.")
-    sys.exit(1)
+# Points d'accès Twitch. Surchargeables par variables d'environnement pour viser un serveur
+# de substitution local (voir benchmarks/helix_standin.py).
+TWITCH_AUTH_URL = os.getenv("TWITCH_AUTH_URL", "https://id.twitch.tv/oauth2/token")
+TWITCH_HELIX_BASE_URL = os.getenv("TWITCH_HELIX_BASE_URL", "https://api.twitch.tv/helix").rstrip("/")
+TWITCH_API_URL = f"{TWITCH_HELIX_BASE_URL}/clips"
+TWITCH_USERS_URL = f"{TWITCH_HELIX_BASE_URL}/users"
 
-TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
-TWITCH_API_URL = "https://api.twitch.tv/helix/clips"
+def check_twitch_credentials():
+    """Vérifie que les identifiants Twitch sont définis (à appeler par les points d'entrée)."""
+    if not CLIENT_ID or not CLIENT_SECRET:
+        print("❌ ERREUR: TWITCH_CLIENT_ID ou TWITCH_CLIENT_SECRET non définis.")
+        return False
+    return True
+
+# Répertoire de données partagé avec main.py (historique, caches...)
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+# Cache disque du jeton d'application Twitch (réutilisé entre les exécutions)
+TWITCH_TOKEN_CACHE_FILE = os.path.join(DATA_DIR, 'twitch_app_token.json')
+# Le jeton est renouvelé s'il lui reste moins de ce délai avant expiration
+TWITCH_TOKEN_REFRESH_MARGIN_SECONDS = 3600
 
 # --- PARAMÈTRES DE FILTRAGE ET DE SÉLECTION POUR LES SHORTS ---
 
@@ -57,48 +86,54 @@ GAME_IDS = [
     # Ajoutez d'autres IDs si nécessaire
 ]
 
-# Liste des IDs de streamers francophones populaires.
-BROADCASTER_IDS = [
-    "80716629",          # Inoxtag
-    "737048563",         # Anyme023"
-    "52130765",          # Squeezie (chaîne principale)
-    "22245231",          # SqueezieLive (sa chaîne secondaire pour le live)
-    "41719107",          # ZeratoR
-    "24147592",          # Gotaga
-    "134966333",         # Kameto
-    "737048563",         # AmineMaTue
-    "496105401",         # byilhann
-    "887001013",         # Nico_la
-    "60256640",          # Flamby
-    "253195796",         # helydia
-    "175560856",         # Hctuan
-    "57404419",          # Ponce
-    "38038890",          # Antoine Daniel
-    "48480373",          # MisterMV
-    "19075728",          # Sardoche
-    "54546583",          # Locklear
-    "50290500",          # Domingo
-    "57402636",          # RebeuDeter
-    "47565457",          # Joyca
-    "153066440",         # Michou
-    "41487980",          # Pauleta_Twitch (Pfut)
-    "31429949",          # LeBouseuh
-    "46296316",          # Maghla
-    "49896798",          # Chowh1
-    "49749557",          # Jiraya
-    "53696803",          # Wankil Studio (Laink et Terracid - chaîne principale)
-    "72366922",          # Laink (ID individuel, généralement couvert par Wankil Studio)
-    "129845722",         # Terracid (ID individuel, généralement couvert par Wankil Studio)
-    "51950294",          # Mynthos
-    "53140510",          # Etoiles
-    "134812328",         # LittleBigWhale
-    "180237751",         # Mister V (l'artiste/youtubeur, différent de MisterMV)
-    "55787682",          # Shaunz
-    "142436402",         # Ultia
-    "20875990",          # LCK_France (pour les clips de la ligue de LoL française)
-    # Ajoutez d'autres IDs vérifiés ici
+# Liste des streamers francophones populaires, par login Twitch (nom dans l'URL de la chaîne).
+# Les IDs numériques sont résolus automatiquement via /helix/users (par lots de 100, avec cache) :
+# plus besoin de rechercher les IDs à la main.
+BROADCASTER_LOGINS = [
+    "inoxtag",           # Inoxtag
+    "anyme023",          # Anyme023
+    "squeezie",          # Squeezie (chaîne principale)
+    "squeezielive",      # SqueezieLive (sa chaîne secondaire pour le live)
+    "zerator",           # ZeratoR
+    "gotaga",            # Gotaga
+    "kamet0",            # Kameto
+    "aminematue",        # AmineMaTue
+    "byilhann",          # byilhann
+    "nico_la",           # Nico_la
+    "flamby",            # Flamby
+    "helydia",           # helydia
+    "hctuan",            # Hctuan
+    "ponce",             # Ponce
+    "antoinedaniellive", # Antoine Daniel
+    "mistermv",          # MisterMV
+    "sardoche",          # Sardoche
+    "locklear",          # Locklear
+    "domingo",           # Domingo
+    "rebeudeter",        # RebeuDeter
+    "joyca",             # Joyca
+    "michou",            # Michou
+    "pauleta_twitch",    # Pauleta_Twitch (Pfut)
+    "lebouseuh",         # LeBouseuh
+    "maghla",            # Maghla
+    "chowh1",            # Chowh1
+    "jirayalecochon",    # Jiraya
+    "wankilstudio",      # Wankil Studio (Laink et Terracid - chaîne principale)
+    "laink",             # Laink (généralement couvert par Wankil Studio)
+    "terracid",          # Terracid (généralement couvert par Wankil Studio)
+    "mynthos",           # Mynthos
+    "etoiles",           # Etoiles
+    "littlebigwhale",    # LittleBigWhale
+    "mistervofficiel",   # Mister V (l'artiste/youtubeur, différent de MisterMV)
+    "shaunz",            # Shaunz
+    "ultia",             # Ultia
+    "lck_france",        # LCK_France (pour les clips de la ligue de LoL française)
+    # Ajoutez d'autres logins ici
 ]
 
+# IDs numériques supplémentaires (chaînes dont on ne connaît que l'ID). Fusionnés sans doublon
+# avec les IDs résolus depuis BROADCASTER_LOGINS.
+EXTRA_BROADCASTER_IDS = []
+
 # --- NOUVEAU PARAMÈTRE : Langue du clip ---
 CLIP_LANGUAGE = "fr" # Code ISO 639-1 pour le français
 
@@ -106,10 +141,192 @@ CLIP_LANGUAGE = "fr" # Code ISO 639-1 pour le français
 MIN_VIDEO_DURATION_SECONDS = 15   # Minimum 15 secondes pour un Short
 MAX_VIDEO_DURATION_SECONDS = 180  # Maximum 180 secondes (3 minutes) pour un Short
 
+# --- PARAMÈTRES DE DÉCOUVERTE CONCURRENTE ---
+# Nombre de sources (streamers/jeux) interrogées en parallèle pendant la collecte.
+# 1 = mode séquentiel (une requête après l'autre, comme avant).
+DISCOVERY_MAX_WORKERS = int(os.getenv("DISCOVERY_MAX_WORKERS", "8"))
+
+# --- PARAMÈTRES DE DÉCOUVERTE INCRÉMENTALE ---
+# La dernière fenêtre interrogée par source et les candidats déjà connus sont conservés
+# dans le catalogue SQLite (voir clip_catalog.py).
+# Recouvrement appliqué au début de chaque fenêtre incrémentale : un clip peut apparaître
+# dans l'API quelques minutes après son created_at.
+DISCOVERY_OVERLAP_SECONDS = 15 * 60
+# Au-delà de ce délai, une source est réinterrogée sur toute la fenêtre pour rafraîchir
+# les compteurs de vues des candidats déjà connus.
+DISCOVERY_FULL_REFRESH_SECONDS = 6 * 3600
+
+# --- PARAMÈTRES DE PAGINATION ET DE SÉLECTION TOP-K ---
+# Taille maximale d'une page Helix (paramètre "first").
+HELIX_MAX_PAGE_SIZE = 100
+# Nombre de pages suivies au maximum par source (garde-fou pour les très gros jeux).
+DISCOVERY_MAX_PAGES_PER_SOURCE = 10
+# Nombre de candidats éligibles conservés au total (tas borné des K meilleurs clips).
+DISCOVERY_MAX_CANDIDATES = 500
+
+# --- PARAMÈTRES DE RÉSOLUTION DES LOGINS ---
+# Nombre maximal de logins par requête /helix/users (limite de l'API)
+HELIX_USERS_BATCH_SIZE = 100
+# Durée de validité d'une résolution login -> ID dans le cache (catalogue)
+BROADCASTER_LOGIN_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# Un login introuvable n'est redemandé qu'après ce délai
+BROADCASTER_LOGIN_NEGATIVE_TTL_SECONDS = 24 * 3600
+
+# --- PARAMÈTRES DE CLASSEMENT ---
+# "views"    : vues cumulées (favorise les clips anciens), classement par défaut,
+# "velocity" : vues/heure depuis la création + accélération récente (voir view_velocity.py) ;
+#              un clip sans deux relevés de vues garde sa place du classement par vues.
+# Dans les deux cas, la découverte retient d'abord les DISCOVERY_MAX_CANDIDATES clips les plus vus.
+RANKING_MODES = ("views", "velocity")
+CLIP_RANKING_MODE = os.getenv("CLIP_RANKING_MODE", "views")
+
+# --- PARAMÈTRES DE LIMITATION DE DÉBIT (API Helix) ---
+# Budget par défaut d'un jeton d'application : 800 points par minute (recalé sur Ratelimit-Limit).
+HELIX_RATE_LIMIT_CAPACITY = 800
+HELIX_RATE_LIMIT_PERIOD_SECONDS = 60
+# Nombre de points gardés en réserve pour rester juste sous le budget annoncé par Twitch.
+HELIX_RATE_LIMIT_SAFETY_MARGIN = 10
+# Nombre de nouvelles tentatives pour une requête limitée (429) ou en erreur serveur (5xx).
+HELIX_MAX_RETRIES = 5
+HELIX_RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+# Délais maximaux (connexion, lecture) d'une requête HTTP, en secondes : une connexion bloquée
+# lève requests.Timeout et la requête est retentée au lieu de bloquer un worker indéfiniment.
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "20"))
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)
+
 # --- FIN PARAMÈTRES ---
 
-def get_twitch_access_token():
-    """Gets an application access token for Twitch API."""
+# Session HTTP partagée (keep-alive) pour toutes les requêtes Helix.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session(pool_size=DISCOVERY_MAX_WORKERS):
+    """
+    Retourne la session HTTP partagée, créée à la première utilisation.
+    Les connexions TCP/TLS vers api.twitch.tv sont réutilisées d'une requête à l'autre
+    et le pool est dimensionné pour le nombre de workers de la découverte.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+# Ordonnanceur partagé par toutes les requêtes Helix (tous threads confondus).
+HELIX_RATE_LIMITER = TokenBucketRateLimiter(
+    capacity=HELIX_RATE_LIMIT_CAPACITY,
+    refill_period=HELIX_RATE_LIMIT_PERIOD_SECONDS,
+    safety_margin=HELIX_RATE_LIMIT_SAFETY_MARGIN
+)
+
+def helix_get(url, access_token, params=None, session=None, max_retries=HELIX_MAX_RETRIES):
+    """
+    Effectue un GET sur l'API Helix en passant par l'ordonnanceur partagé.
+    Les réponses 429/5xx et les erreurs réseau sont retentées avec backoff au lieu d'être perdues.
+    Retourne la dernière réponse obtenue (l'appelant gère raise_for_status()).
+    """
+    if session is None:
+        session = get_http_session()
+    headers = {
+        "Client-ID": CLIENT_ID,
+        "Authorization": f"Bearer {access_token}"
+    }
+    attempt = 0
+    refreshed_token = False
+    while True:
+        HELIX_RATE_LIMITER.acquire()
+        try:
+            response = session.get(url, headers=headers, params=params, timeout=HTTP_TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= max_retries:
+                raise
+            delay = min(HELIX_RATE_LIMITER.backoff_max_seconds, HELIX_RATE_LIMITER.backoff_base_seconds * (2 ** attempt))
+            print(f"  ⚠️ Erreur réseau Helix ({e}). Nouvelle tentative dans {delay:.1f}s ({attempt + 1}/{max_retries}).")
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        HELIX_RATE_LIMITER.update_from_headers(response.headers)
+        if response.status_code == 401 and not refreshed_token:
+            # Jeton en cache révoqué ou expiré côté Twitch : on le renouvelle une fois
+            refreshed_token = True
+            new_token = _refresh_after_unauthorized(access_token)
+            if new_token:
+                access_token = new_token
+                headers["Authorization"] = f"Bearer {access_token}"
+                continue
+            return response
+        if response.status_code not in HELIX_RETRYABLE_STATUS_CODES or attempt >= max_retries:
+            return response
+
+        if response.status_code == 429:
+            # L'ordonnanceur bloque tous les threads jusqu'au reset annoncé par Twitch
+            delay = HELIX_RATE_LIMITER.on_throttled(response.headers, attempt)
+            print(f"  ⏳ Limite de débit Twitch atteinte (429). Reprise dans {delay:.1f}s ({attempt + 1}/{max_retries}).")
+        else:
+            delay = min(HELIX_RATE_LIMITER.backoff_max_seconds, HELIX_RATE_LIMITER.backoff_base_seconds * (2 ** attempt))
+            print(f"  ⚠️ Erreur serveur Helix ({response.status_code}). Nouvelle tentative dans {delay:.1f}s ({attempt + 1}/{max_retries}).")
+            time.sleep(delay)
+        attempt += 1
+
+def _load_cached_token():
+    """Charge le jeton mis en cache sur disque (ou None s'il est absent, illisible ou d'un autre client)."""
+    if not os.path.exists(TWITCH_TOKEN_CACHE_FILE):
+        return None
+    try:
+        with open(TWITCH_TOKEN_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Cache du jeton Twitch illisible ({e}). Il sera régénéré.")
+        return None
+    if cached.get("client_id") != CLIENT_ID or not cached.get("access_token"):
+        return None
+    return cached
+
+def _save_cached_token(token_data):
+    """Écrit le jeton dans le cache de façon atomique (fichier temporaire + rename)."""
+    try:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        tmp_path = TWITCH_TOKEN_CACHE_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(token_data, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, TWITCH_TOKEN_CACHE_FILE)
+    except OSError as e:
+        print(f"⚠️ Impossible d'écrire le cache du jeton Twitch : {e}")
+
+def invalidate_cached_twitch_token():
+    """Supprime le jeton en cache (par ex. après un 401 de l'API)."""
+    try:
+        os.remove(TWITCH_TOKEN_CACHE_FILE)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ Impossible de supprimer le cache du jeton Twitch : {e}")
+
+def get_twitch_access_token(force_refresh=False):
+    """
+    Gets an application access token for Twitch API.
+
+    Le jeton est mis en cache dans data/ avec sa date d'expiration (expires_in) et réutilisé
+    tant qu'il lui reste plus de TWITCH_TOKEN_REFRESH_MARGIN_SECONDS de validité.
+    Si le renouvellement échoue, le jeton en cache est utilisé tant qu'il n'a pas expiré.
+    Retourne None si aucun jeton valide n'est disponible.
+    """
+    if not check_twitch_credentials():
+        return None
+    now = time.time()
+    cached = _load_cached_token()
+    if cached and not force_refresh and cached.get("expires_at", 0) - now > TWITCH_TOKEN_REFRESH_MARGIN_SECONDS:
+        remaining_hours = (cached["expires_at"] - now) / 3600
+        print(f"🔑 Jeton d'accès Twitch réutilisé depuis le cache (expire dans {remaining_hours:.1f}h).")
+        return cached["access_token"]
+
     print("🔑 Récupération du jeton d'accès Twitch...")
     payload = {
         "client_id": CLIENT_ID,
@@ -117,132 +334,452 @@ def get_twitch_access_token():
         "grant_type": "client_credentials"
     }
     try:
-        response = requests.post(TWITCH_AUTH_URL, data=payload)
+        response = get_http_session().post(TWITCH_AUTH_URL, data=payload, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
         token_data = response.json()
+        expires_in = int(token_data.get("expires_in", 0))
+        _save_cached_token({
+            "client_id": CLIENT_ID,
+            "access_token": token_data["access_token"],
+            "token_type": token_data.get("token_type", "bearer"),
+            "expires_in": expires_in,
+            "obtained_at": now,
+            "expires_at": now + expires_in
+        })
         print("✅ Jeton d'accès Twitch récupéré.")
         return token_data["access_token"]
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
         print(f"❌ Erreur lors de la récupération du jeton d'accès Twitch : {e}")
-        sys.exit(1)
+        if cached and not force_refresh and cached.get("expires_at", 0) > now:
+            print("ℹ️ Utilisation du jeton en cache, encore valide.")
+            return cached["access_token"]
+        return None
 
-def fetch_clips(access_token, params, source_type, source_id):
-    """Helper function to fetch clips and handle errors."""
-    headers = {
-        "Client-ID": CLIENT_ID,
-        "Authorization": f"Bearer {access_token}"
-    }
+_token_refresh_lock = threading.Lock()
+
+def _refresh_after_unauthorized(failed_token):
+    """
+    Obtient un nouveau jeton après un 401. Un seul thread renouvelle le jeton,
+    les autres récupèrent celui qu'il vient de mettre en cache.
+    """
+    with _token_refresh_lock:
+        cached = _load_cached_token()
+        if cached and cached["access_token"] != failed_token and cached.get("expires_at", 0) > time.time():
+            return cached["access_token"]
+        print("🔑 Jeton Twitch refusé (401). Renouvellement...")
+        invalidate_cached_twitch_token()
+        return get_twitch_access_token(force_refresh=True)
+
+def _request_clips(access_token, params, source_type, source_id, session=None):
+    """
+    Interroge une page de /helix/clips et normalise les clips retournés.
+    Retourne (clips, ok, cursor) : ok vaut False si la requête a échoué (à distinguer d'une période
+    sans clip), cursor est le curseur de la page suivante (None s'il n'y en a pas).
+    """
+    response = None
     try:
-        response = requests.get(TWITCH_API_URL, headers=headers, params=params)
+        response = helix_get(TWITCH_API_URL, access_token, params=params, session=session)
         response.raise_for_status()
         clips_data = response.json()
         
         if not clips_data.get("data"):
-            print(f"  ⚠️ Aucune donnée de clip trouvée pour {source_type} {source_id} dans la période spécifiée.")
-            return []
-
-        collected_clips = []
-        for clip in clips_data.get("data", []):
-            collected_clips.append({
-                "id": clip.get("id"),
-                "url": clip.get("url"),
-                "embed_url": clip.get("embed_url"),
-                "thumbnail_url": clip.get("thumbnail_url"),
-                "title": clip.get("title"),
-                # CORRECTION ICI: Utilise "view_count" au lieu de "viewer_count"
-                "viewer_count": clip.get("view_count", 0),  # Clé correcte de l'API Twitch
-                "broadcaster_id": clip.get("broadcaster_id"),
-                "broadcaster_name": clip.get("broadcaster_name"),
-                "game_name": clip.get("game_name"),
-                "created_at": clip.get("created_at"),
-                "duration": float(clip.get("duration", 0.0)),
-                "language": clip.get("language")
-            })
-        return collected_clips
+            if not params.get("after"):
+                print(f"  ⚠️ Aucune donnée de clip trouvée pour {source_type} {source_id} dans la période spécifiée.")
+            return [], True, None
+
+        # Enregistrements compacts (__slots__) compatibles avec l'accès par clé clip['id'], clip.get(...)
+        collected_clips = [ClipRecord.from_helix(clip) for clip in clips_data.get("data", [])]
+        cursor = (clips_data.get("pagination") or {}).get("cursor")
+        return collected_clips, True, cursor or None
             
     except requests.exceptions.RequestException as e:
         print(f"❌ Erreur lors de la récupération des clips Twitch pour {source_type} {source_id} : {e}")
-        if response.content:
+        if response is not None and response.content:
             print(f"    Contenu de la réponse API Twitch: {response.content.decode()}")
-        return []
+        return [], False, None
     except json.JSONDecodeError as e:
         print(f"❌ Erreur de décodage JSON pour {source_type} {source_id}: {e}")
-        if response.content:
+        if response is not None and response.content:
             print(f"    Contenu brut de la réponse: {response.content.decode()}")
-        return []
+        return [], False, None
+
+def fetch_clips(access_token, params, source_type, source_id, session=None):
+    """Helper function to fetch clips and handle errors."""
+    clips, _, _ = _request_clips(access_token, params, source_type, source_id, session=session)
+    return clips
+
+def _format_helix_date(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-def get_eligible_short_clips(access_token, num_clips_per_source=50, days_ago=1, already_published_clip_ids=None):
+def _parse_helix_date(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+def _discovery_window_start(source_state, start_date, end_date):
     """
-    Récupère les clips populaires des chaînes spécifiées et des jeux,
-    filtre ceux déjà publiés et ceux qui ne respectent pas les contraintes de durée/langue.
-    Retourne une liste de clips éligibles, triés par popularité (vues).
+    Détermine le début de la fenêtre à demander pour une source.
+    Retourne (started_at, full_window) : fenêtre complète si la source est inconnue,
+    si son dernier passage sort de la fenêtre ou si le dernier rafraîchissement complet est trop ancien.
+    """
+    if not source_state:
+        return start_date, True
+    try:
+        high_water_mark = _parse_helix_date(source_state["high_water_mark"])
+        last_full_refresh = _parse_helix_date(source_state["last_full_refresh"])
+    except (KeyError, TypeError, ValueError):
+        return start_date, True
+    if ((end_date - last_full_refresh).total_seconds() > DISCOVERY_FULL_REFRESH_SECONDS
+            or high_water_mark <= start_date or high_water_mark > end_date):
+        return start_date, True
+    return max(start_date, high_water_mark - timedelta(seconds=DISCOVERY_OVERLAP_SECONDS)), False
+
+class TopKClips:
+    """
+    Tas borné (thread-safe) qui ne conserve que les K meilleurs clips éligibles, par nombre de vues.
+
+    Un clip vu par plusieurs sources n'est gardé qu'une fois, avec son compteur de vues le plus élevé :
+    le résultat ne dépend donc pas de l'ordre d'arrivée des pages des différentes sources.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []       # entrées [vues, id, compteur, clip, valide] ; le sommet est le moins bon clip
+        self._members = {}    # id -> entrée valide dans le tas
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(clip):
+        return (clip.get('viewer_count', 0), clip["id"])
+
+    def _drop_invalid_top(self):
+        while self._heap and not self._heap[0][-1]:
+            heapq.heappop(self._heap)
+
+    def offer(self, clip):
+        """Propose un clip ; retourne True s'il fait (pour l'instant) partie du top-K."""
+        key = self._key(clip)
+        with self._lock:
+            existing = self._members.get(clip["id"])
+            if existing is not None:
+                if key <= (existing[0], existing[1]):
+                    return False
+                existing[-1] = False
+                del self._members[clip["id"]]
+            self._drop_invalid_top()
+            if len(self._members) >= self.k and key <= (self._heap[0][0], self._heap[0][1]):
+                return False
+            entry = [key[0], key[1], next(self._counter), clip, True]
+            heapq.heappush(self._heap, entry)
+            self._members[clip["id"]] = entry
+            while len(self._members) > self.k:
+                evicted = heapq.heappop(self._heap)
+                if evicted[-1]:
+                    del self._members[evicted[1]]
+            return True
+
+    def cannot_beat(self, view_count):
+        """True si le tas est plein et qu'un clip avec ce nombre de vues ne peut plus y entrer."""
+        with self._lock:
+            self._drop_invalid_top()
+            return len(self._members) >= self.k and view_count < self._heap[0][0]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._members)
+
+    def sorted_clips(self):
+        """Clips retenus, du plus vu au moins vu (ordre déterministe)."""
+        with self._lock:
+            entries = list(self._members.values())
+        return [entry[3] for entry in sorted(entries, key=lambda e: (-e[0], e[1]))]
+
+def _drop_published(clips, catalog, published_clip_ids):
+    """
+    Retire des clips sélectionnés dans le catalogue ceux que l'historique des publications
+    connaît mais que le catalogue ne savait pas publiés (publications antérieures au catalogue),
+    et les marque publiés : ils ne sortiront plus de select_eligible_clips. Un test
+    d'appartenance par clip sélectionné, l'historique n'est jamais parcouru.
+    """
+    published = [clip for clip in clips if clip['id'] in published_clip_ids]
+    if not published:
+        return clips
+    get_entry = getattr(published_clip_ids, "get", None)
+    for clip in published:
+        entry = get_entry(clip['id']) if get_entry else None
+        catalog.mark_published(clip['id'], entry.get("youtube_short_id") if entry else None)
+    print(f"ℹ️ {len(published)} clip(s) déjà publié(s) selon l'historique marqué(s) comme tel(s) dans le catalogue.")
+    published_ids = {clip['id'] for clip in published}
+    return [clip for clip in clips if clip['id'] not in published_ids]
+
+def _is_eligible_clip(clip, seen_clip_ids):
+    """Filtre langue/durée/doublons appliqué à chaque clip collecté."""
+    return (clip["id"] not in seen_clip_ids and
+            clip.get('language') == CLIP_LANGUAGE and
+            MIN_VIDEO_DURATION_SECONDS <= clip.get('duration', 0.0) <= MAX_VIDEO_DURATION_SECONDS)
+
+def resolve_broadcaster_ids(access_token, catalog, logins=None, extra_ids=None, session=None):
+    """
+    Résout les logins configurés en IDs de diffuseurs, dans l'ordre de configuration et sans doublon.
+
+    Les résolutions sont mises en cache dans le catalogue (BROADCASTER_LOGIN_CACHE_TTL_SECONDS) ;
+    seuls les logins absents ou expirés sont demandés à /helix/users, par lots de
+    HELIX_USERS_BATCH_SIZE. Les IDs de extra_ids (EXTRA_BROADCASTER_IDS) sont ajoutés à la fin.
+    """
+    if logins is None:
+        logins = BROADCASTER_LOGINS
+    if extra_ids is None:
+        extra_ids = EXTRA_BROADCASTER_IDS
+    logins = list(dict.fromkeys(login.strip().lower() for login in logins if login and login.strip()))
+
+    now = time.time()
+    cached = catalog.get_broadcaster_logins(logins)
+    resolved = {}
+    to_fetch = []
+    for login in logins:
+        entry = cached.get(login)
+        ttl = BROADCASTER_LOGIN_CACHE_TTL_SECONDS if entry and entry["broadcaster_id"] else BROADCASTER_LOGIN_NEGATIVE_TTL_SECONDS
+        if entry and now - entry["resolved_at"] < ttl:
+            resolved[login] = entry["broadcaster_id"]
+        else:
+            to_fetch.append(login)
+
+    requests_made = 0
+    for i in range(0, len(to_fetch), HELIX_USERS_BATCH_SIZE):
+        batch = to_fetch[i:i + HELIX_USERS_BATCH_SIZE]
+        requests_made += 1
+        try:
+            response = helix_get(TWITCH_USERS_URL, access_token, params={"login": batch}, session=session)
+            response.raise_for_status()
+            users = response.json().get("data", [])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"❌ Erreur lors de la résolution de {len(batch)} login(s) Twitch : {e}")
+            # Repli sur les résolutions en cache, même expirées
+            for login in batch:
+                if cached.get(login) and cached[login]["broadcaster_id"]:
+                    resolved[login] = cached[login]["broadcaster_id"]
+            continue
+        found = {user["login"].lower(): user for user in users if user.get("login")}
+        rows = []
+        for login in batch:
+            user = found.get(login)
+            if user:
+                resolved[login] = user["id"]
+                rows.append((login, user["id"], user.get("display_name")))
+            else:
+                print(f"  ⚠️ Login Twitch introuvable : '{login}'.")
+                rows.append((login, None, None))
+        catalog.set_broadcaster_logins(rows, resolved_at=now)
+
+    if to_fetch:
+        print(f"🔎 {len(to_fetch)} login(s) résolu(s) en {requests_made} requête(s) /helix/users "
+              f"({len(logins) - len(to_fetch)} depuis le cache).")
+
+    ids = [resolved[login] for login in logins if resolved.get(login)]
+    ids.extend(str(b_id) for b_id in extra_ids)
+    unique_ids = list(dict.fromkeys(ids))
+    if len(unique_ids) < len(ids):
+        print(f"ℹ️ {len(ids) - len(unique_ids)} ID(s) de diffuseur en double ignoré(s).")
+    return unique_ids
+
+def discover_clips(access_token, catalog, num_clips_per_source=HELIX_MAX_PAGE_SIZE, days_ago=1,
+                   already_published_clip_ids=None, max_workers=None, incremental=True,
+                   max_candidates=DISCOVERY_MAX_CANDIDATES, max_pages_per_source=DISCOVERY_MAX_PAGES_PER_SOURCE,
+                   snapshot_store=None):
+    """
+    Interroge les sources configurées et enregistre les clips trouvés dans le catalogue.
+
+    Les sources sont interrogées en parallèle (max_workers, par défaut DISCOVERY_MAX_WORKERS)
+    via la session HTTP partagée. Chaque source est parcourue page par page (curseur Helix,
+    num_clips_per_source clips par page) ; chaque page est insérée dans le catalogue et alimente
+    un tas borné des max_candidates meilleurs clips, initialisé avec les candidats déjà connus.
+    Comme Helix renvoie les clips par vues décroissantes, une source cesse d'être paginée dès
+    que sa page ne peut plus battre le K-ième candidat.
+
+    En mode incrémental, chaque source n'est interrogée que depuis son dernier passage
+    (high-water mark conservé dans le catalogue).
+
+    Si snapshot_store est fourni, le compteur de vues de chaque clip éligible reçu y est relevé
+    (horodaté à la date de la collecte) pour le classement par vitesse.
     """
     if already_published_clip_ids is None:
-        already_published_clip_ids = []
+        already_published_clip_ids = ()
+    if max_workers is None:
+        max_workers = DISCOVERY_MAX_WORKERS
+    page_size = max(1, min(num_clips_per_source, HELIX_MAX_PAGE_SIZE))
 
-    print(f"📊 Recherche de clips éligibles ({MIN_VIDEO_DURATION_SECONDS}-{MAX_VIDEO_DURATION_SECONDS}s) pour les dernières {days_ago} jour(s)...")
-    print(f"Clips déjà publiés aujourd'hui (transmis) : {len(already_published_clip_ids)} IDs.")
-            
     end_date = datetime.now(timezone.utc)
     start_date = end_date - timedelta(days=days_ago)
-            
-    # Utilise un set pour une recherche rapide et pour éviter les doublons lors de la collecte
-    seen_clip_ids = set(already_published_clip_ids) 
-    all_potential_clips = []
-
-    # --- Phase de collecte ---
-    # Collecte des clips des broadcasters
-    print("\n--- Collecte des clips des streamers spécifiés ---")
-    for broadcaster_id in BROADCASTER_IDS:
-        # print(f"  - Recherche de clips pour le streamer: {broadcaster_id}") # Moins verbeux
-        params = {
-            "first": num_clips_per_source,
-            "started_at": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "ended_at": end_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "sort": "views",
-            "broadcaster_id": broadcaster_id,
-            "language": CLIP_LANGUAGE
-        }
-        clips = fetch_clips(access_token, params, "broadcaster_id", broadcaster_id)
-        for clip in clips:
-            # Filtrer par langue et durée dès la collecte pour optimiser
-            if (clip["id"] not in seen_clip_ids and 
-                clip.get('language') == CLIP_LANGUAGE and
-                MIN_VIDEO_DURATION_SECONDS <= clip.get('duration', 0.0) <= MAX_VIDEO_DURATION_SECONDS):
-                all_potential_clips.append(clip)
-                seen_clip_ids.add(clip["id"]) # Ajoute à 'seen' pour éviter les doublons globaux
-    print(f"✅ Collecté {len(all_potential_clips)} clips uniques éligibles (streamers).")
-
-    # Collecte des clips des jeux (excluant ceux déjà vus des broadcasters et déjà publiés)
-    print("\n--- Collecte des clips des jeux spécifiés ---")
-    for game_id in GAME_IDS:
-        # print(f"  - Recherche de clips pour le jeu: {game_id}") # Moins verbeux
+    start_iso = _format_helix_date(start_date)
+    end_iso = _format_helix_date(end_date)
+    snapshot_ts = int(end_date.timestamp())
+
+    # Conteneur des clips déjà publiés (PublishedHistory ou ensemble), utilisé tel quel pour les
+    # tests d'appartenance : pas de copie de tout l'historique à chaque exécution
+    published_clip_ids = already_published_clip_ids
+    top_clips = TopKClips(max_candidates)
+    # Les candidats déjà connus fixent d'emblée le seuil du top-K (arrêt anticipé de la pagination)
+    known_clips = catalog.select_eligible_clips(max_candidates, CLIP_LANGUAGE, MIN_VIDEO_DURATION_SECONDS,
+                                                MAX_VIDEO_DURATION_SECONDS, start_iso)
+    for clip in _drop_published(known_clips, catalog, published_clip_ids):
+        top_clips.offer(clip)
+
+    session = get_http_session(pool_size=max_workers)
+
+    # Liste ordonnée des sources : d'abord les streamers, puis les jeux (sans doublons de configuration)
+    broadcaster_ids = resolve_broadcaster_ids(access_token, catalog, session=session)
+    broadcaster_sources = [("broadcaster_id", b_id) for b_id in broadcaster_ids]
+    game_sources = [("game_id", g_id) for g_id in dict.fromkeys(GAME_IDS)]
+    sources = broadcaster_sources + game_sources
+    source_states = catalog.get_source_states() if incremental else {}
+
+    def fetch_source(source):
+        """Pagine une source vers le catalogue ; retourne (nb de pages, succès, incrémental)."""
+        source_type, source_id = source
+        source_key = f"{source_type}:{source_id}"
+        source_state = source_states.get(source_key)
+        window_start, full_window = _discovery_window_start(source_state, start_date, end_date)
         params = {
-            "first": num_clips_per_source,
-            "started_at": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "ended_at": end_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "first": page_size,
+            "started_at": _format_helix_date(window_start),
+            "ended_at": end_iso,
             "sort": "views",
-            "game_id": game_id,
+            source_type: source_id,
             "language": CLIP_LANGUAGE
         }
-        clips = fetch_clips(access_token, params, "game_id", game_id)
-        for clip in clips:
-            # Filtrer par langue et durée dès la collecte pour optimiser
-            if (clip["id"] not in seen_clip_ids and 
-                clip.get('language') == CLIP_LANGUAGE and
-                MIN_VIDEO_DURATION_SECONDS <= clip.get('duration', 0.0) <= MAX_VIDEO_DURATION_SECONDS):
-                all_potential_clips.append(clip)
-                seen_clip_ids.add(clip["id"])
-    print(f"✅ Collecté un total de {len(all_potential_clips)} clips uniques éligibles (streamers + jeux).")
-
-    # Trier tous les clips éligibles par vues (plus populaire en premier)
-    all_potential_clips.sort(key=lambda x: x.get('viewer_count', 0), reverse=True)
+
+        ok = True
+        pages = 0
+        while pages < max_pages_per_source:
+            clips, ok, cursor = _request_clips(access_token, params, source_type, source_id, session=session)
+            pages += 1
+            catalog.upsert_clips(clips)
+            if snapshot_store is not None:
+                snapshot_store.record([clip for clip in clips if _is_eligible_clip(clip, ())], snapshot_ts)
+            for clip in clips:
+                # Filtrer par langue, durée et historique avant d'entrer dans le tas
+                if _is_eligible_clip(clip, published_clip_ids):
+                    top_clips.offer(clip)
+            # Pages triées par vues décroissantes : si le dernier clip de la page ne peut plus
+            # entrer dans le top-K, les pages suivantes non plus.
+            if not ok or not cursor or not clips or top_clips.cannot_beat(clips[-1].get('viewer_count', 0)):
+                break
+            params["after"] = cursor
+
+        # En cas d'échec, la fenêtre de la source n'avance pas
+        if ok:
+            last_full_refresh = end_iso if full_window else source_state["last_full_refresh"]
+            catalog.set_source_state(source_key, end_iso, last_full_refresh)
+        return pages, ok, ok and not full_window
+
+    print(f"\n--- Collecte des clips de {len(broadcaster_sources)} streamers et {len(game_sources)} jeux ({max_workers} requête(s) en parallèle) ---")
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="helix") as executor:
+            fetched = list(executor.map(fetch_source, sources))
+    else:
+        fetched = [fetch_source(source) for source in sources]
+
+    total_pages = sum(pages for pages, _, _ in fetched)
+    failed_sources = sum(1 for _, ok, _ in fetched if not ok)
+    print(f"✅ {total_pages} page(s) Helix lue(s) pour {len(sources)} source(s) ({failed_sources} en échec).")
+    if incremental:
+        incremental_sources = sum(1 for _, _, was_incremental in fetched if was_incremental)
+        print(f"ℹ️ {incremental_sources}/{len(sources)} source(s) interrogée(s) en mode incrémental.")
+
+    retention_limit = _format_helix_date(end_date - timedelta(days=CATALOG_RETENTION_DAYS))
+    pruned = catalog.prune(retention_limit)
+    if pruned:
+        print(f"🧹 {pruned} clip(s) de plus de {CATALOG_RETENTION_DAYS} jours purgé(s) du catalogue.")
+    return start_iso
+
+def get_eligible_short_clips(access_token, num_clips_per_source=HELIX_MAX_PAGE_SIZE, days_ago=1, already_published_clip_ids=None,
+                             max_workers=None, incremental=True, max_candidates=DISCOVERY_MAX_CANDIDATES,
+                             max_pages_per_source=DISCOVERY_MAX_PAGES_PER_SOURCE, catalog=None,
+                             ranking=None, snapshot_store=None, near_dedup=None, prescreen=None, exclude_clip_ids=()):
+    """
+    Récupère les clips populaires des chaînes spécifiées et des jeux,
+    filtre ceux déjà publiés et ceux qui ne respectent pas les contraintes de durée/langue.
+    Retourne une liste de clips éligibles, triés par popularité (vues ou vitesse, selon `ranking`).
+
+    La découverte (discover_clips) alimente le catalogue local ; la sélection est ensuite une
+    requête indexée sur ce catalogue (max_candidates clips non publiés, durée et langue éligibles,
+    créés dans les `days_ago` derniers jours).
+
+    ranking (par défaut CLIP_RANKING_MODE) : "views" trie par vues cumulées, "velocity" reclasse
+    les candidats par vues/heure et accélération à partir des relevés de vues (snapshot_store,
+    chargé depuis data/ si non fourni).
+
+    near_dedup (par défaut DEDUP_NEAR_DUPLICATES) : retire les quasi-doublons (même moment clippé
+    plusieurs fois, ou déjà publié sous un autre ID) d'après les empreintes des miniatures.
+
+    already_published_clip_ids : conteneur des clips publiés (PublishedHistory ou ensemble), utilisé
+    uniquement par tests d'appartenance ; exclude_clip_ids : quelques IDs à écarter en plus (ceux
+    déjà tentés pendant l'exécution).
+
+    prescreen (par défaut PRESCREEN_THUMBNAILS) : examine la miniature des meilleurs candidats
+    avant tout téléchargement ; les images noires/unies sont rejetées, les bandes noires et
+    images sans détail rétrogradées.
+    """
+    if already_published_clip_ids is None:
+        already_published_clip_ids = ()
+    if ranking is None:
+        ranking = CLIP_RANKING_MODE
+    if near_dedup is None:
+        near_dedup = DEDUP_NEAR_DUPLICATES
+    if prescreen is None:
+        prescreen = PRESCREEN_THUMBNAILS
+    if ranking not in RANKING_MODES:
+        print(f"⚠️ Mode de classement inconnu '{ranking}'. Utilisation du classement par vues.")
+        ranking = "views"
+    own_snapshot_store = ranking == "velocity" and snapshot_store is None
+    if own_snapshot_store:
+        snapshot_store = ViewSnapshotStore()
+    own_catalog = catalog is None
+    if own_catalog:
+        catalog = ClipCatalog()
+
+    print(f"📊 Recherche de clips éligibles ({MIN_VIDEO_DURATION_SECONDS}-{MAX_VIDEO_DURATION_SECONDS}s) pour les dernières {days_ago} jour(s)...")
+    print(f"Clips déjà publiés (transmis) : {len(already_published_clip_ids)} IDs.")
+
+    try:
+        created_after = discover_clips(
+            access_token, catalog,
+            num_clips_per_source=num_clips_per_source,
+            days_ago=days_ago,
+            already_published_clip_ids=already_published_clip_ids,
+            max_workers=max_workers,
+            incremental=incremental,
+            max_candidates=max_candidates,
+            max_pages_per_source=max_pages_per_source,
+            snapshot_store=snapshot_store
+        )
+        # Clips retenus, triés par vues (plus populaire en premier). Les clips publiés sont exclus
+        # par le catalogue (published_at) ; l'historique ne sert qu'à rattraper ceux qu'il ignore.
+        all_potential_clips = _drop_published(catalog.select_eligible_clips(
+            max_candidates, CLIP_LANGUAGE, MIN_VIDEO_DURATION_SECONDS, MAX_VIDEO_DURATION_SECONDS,
+            created_after, exclude_clip_ids
+        ), catalog, already_published_clip_ids)
+        if ranking == "velocity":
+            all_potential_clips = rank_by_velocity(all_potential_clips, snapshot_store)
+            if own_snapshot_store:
+                snapshot_store.prune()
+                snapshot_store.save()
+                print(f"📈 Historique des vues : {len(snapshot_store)} relevé(s) conservé(s).")
+        # Pré-filtrage avant la déduplication : une seule lecture de chaque miniature
+        # (verdict et empreinte sont enregistrés ensemble dans le catalogue)
+        if prescreen:
+            all_potential_clips = prescreen_clips(all_potential_clips, catalog, session=get_http_session())
+        if near_dedup:
+            all_potential_clips = filter_near_duplicates(all_potential_clips, catalog, session=get_http_session())
+    finally:
+        if own_catalog:
+            catalog.close()
+    print(f"✅ Collecté un total de {len(all_potential_clips)} clips uniques éligibles (streamers + jeux, top {max_candidates}).")
 
     if not all_potential_clips:
         print(f"⚠️ Aucun clip éligible trouvé après collecte et filtrage (durée entre {MIN_VIDEO_DURATION_SECONDS} et {MAX_VIDEO_DURATION_SECONDS}s, non publié).")
         return [] # Retourne une liste vide
     else:
-        print(f"Found {len(all_potential_clips)} clips éligibles au total, triés par vues.")
+        print(f"Found {len(all_potential_clips)} clips éligibles au total, triés par {'vitesse (vues/heure)' if ranking == 'velocity' else 'vues'}.")
         # Optionnel: afficher le top 5 des candidats pour débogage
         # print("Top 5 candidats:")
         # for i, clip in enumerate(all_potential_clips[:5]):
@@ -252,26 +789,16 @@ def get_eligible_short_clips(access_token, num_clips_per_source=50, days_ago=1,
 
 # Le bloc if __name__ == "__main__": peut être laissé tel quel ou simplifié pour un test rapide
 if __name__ == "__main__":
+    if not check_twitch_credentials():
+        sys.exit(1)
     token = get_twitch_access_token()
     if token:
-        # Simule l'historique de publication pour le test
-        published_clips_log_path = os.path.join("data", "published_shorts_history.json")
-        current_published_ids = []
-        if os.path.exists(published_clips_log_path):
-            try:
-                with open(published_clips_log_path, "r", encoding="utf-8") as f:
-                    history_data = json.load(f)
-                    today_str = datetime.now(timezone.utc).date().isoformat()
-                    if today_str in history_data:
-                        current_published_ids = [item["twitch_clip_id"] for item in history_data[today_str]]
-            except json.JSONDecodeError:
-                print("⚠️ Fichier d'historique des publications corrompu ou vide. Utilisation d'un historique vide.")
-            except Exception as e:
-                print(f"❌ Erreur lors du chargement de l'historique simulé : {e}")
+        # Historique réel des publications pour le test
+        current_published_ids = PublishedHistory()
 
         eligible_clips_list = get_eligible_short_clips(
             access_token=token,
-            num_clips_per_source=50,
+            num_clips_per_source=HELIX_MAX_PAGE_SIZE,
             days_ago=1,
             already_published_clip_ids=current_published_ids
         )
@@ -286,4 +813,7 @@ if __name__ == "__main__":
             print(f"  Durée: {selected_clip.get('duration', 'N/A')}s")
             print(f"  URL: {selected_clip.get('url', 'N/A')}")
         else:
-            print("\n❌ Aucun clip approprié n'a pu être trouvé pour le Short cette fois.")
\ No newline at end of file
+            print("\n❌ Aucun clip approprié n'a pu être trouvé pour le Short cette fois.")
+    else:
+        print("❌ Impossible d'obtenir le jeton d'accès Twitch.")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,95 @@
+# scripts/parallel_render.py
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import prepared_assets
+import process_video
+
+# Budget CPU global du rendu, réparti entre processus de rendu et threads de l'encodeur (0 = tous les cœurs)
+RENDER_CPU_BUDGET = int(os.getenv("RENDER_CPU_BUDGET", "0")) or os.cpu_count() or 1
+# Nombre de rendus simultanés : 0 = automatique (voir split_cpu_budget), 1 = rendu séquentiel
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))
+# En mode automatique, chaque processus de rendu dispose d'au moins ce nombre de threads
+MIN_THREADS_PER_WORKER = 2
+
+
+def split_cpu_budget(jobs, cpu_budget=RENDER_CPU_BUDGET, workers=RENDER_WORKERS):
+    """
+    Répartit le budget CPU pour `jobs` rendus : retourne (processus de rendu, threads de
+    l'encodeur par processus). L'encodage x264 ne passe pas à l'échelle sur tous les cœurs et
+    le décodage et la composition restent en partie séquentiels : plusieurs rendus simultanés
+    avec moins de threads chacun occupent mieux les cœurs qu'un seul rendu.
+    """
+    if workers <= 0:
+        workers = cpu_budget // MIN_THREADS_PER_WORKER
+    workers = max(1, min(workers, jobs, cpu_budget))
+    return workers, max(1, cpu_budget // workers)
+
+
+def _init_worker(scratch_root):
+    """Dossier de travail propre au processus : tous les fichiers temporaires du rendu y sont créés."""
+    scratch_dir = os.path.join(scratch_root, f"worker-{os.getpid()}")
+    os.makedirs(scratch_dir, exist_ok=True)
+    tempfile.tempdir = scratch_dir
+
+
+def _render(clip, input_path, output_path, render_params, threads):
+    start = time.perf_counter()
+    rendered = process_video.trim_video_for_short(input_path=input_path, output_path=output_path, clip_data=clip,
+                                                  threads=threads, **render_params)
+    return rendered, time.perf_counter() - start
+
+
+def render_clips(jobs, render_params, cpu_budget=RENDER_CPU_BUDGET, workers=RENDER_WORKERS):
+    """
+    Rend plusieurs clips avec process_video.trim_video_for_short, en parallèle dans un pool de
+    processus si le budget CPU le permet (sinon dans ce processus, l'un après l'autre).
+
+    Args:
+        jobs (list): (clip, fichier source, fichier de sortie) pour chaque clip.
+        render_params (dict): paramètres de rendu communs (voir render_cache.render_key).
+
+    Returns:
+        dict: {ID du clip: chemin du rendu, ou None en cas d'échec}.
+    """
+    workers, threads = split_cpu_budget(len(jobs), cpu_budget, workers)
+    print(f"⚙️ Rendu de {len(jobs)} clip(s) : {workers} processus × {threads} thread(s) (budget de {cpu_budget} CPU).")
+    results = {}
+    busy = 0.0
+    start = time.perf_counter()
+    if workers == 1:
+        for clip, input_path, output_path in jobs:
+            results[clip['id']], elapsed = _render(clip, input_path, output_path, render_params, threads)
+            busy += elapsed
+    else:
+        # Image de fond préparée une seule fois ici plutôt qu'en même temps par tous les processus
+        # (la séquence de fin dépend de la cadence, du profil et de l'audio de chaque clip)
+        prepared_assets.prepared_background()
+        # Processus démarrés par "spawn" : le processus principal a des threads en cours (préchargement)
+        scratch_root = tempfile.mkdtemp(prefix="render_workers_")
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(scratch_root,)) as pool:
+                futures = {pool.submit(_render, clip, input_path, output_path, render_params, threads): clip['id']
+                           for clip, input_path, output_path in jobs}
+                for future in as_completed(futures):
+                    clip_id = futures[future]
+                    try:
+                        results[clip_id], elapsed = future.result()
+                        busy += elapsed
+                    except Exception as e:
+                        print(f"❌ Erreur dans le processus de rendu du clip '{clip_id}' : {e}")
+                        results[clip_id] = None
+        finally:
+            shutil.rmtree(scratch_root, ignore_errors=True)
+    wall = time.perf_counter() - start
+
+    rendered = sum(1 for path in results.values() if path)
+    if rendered:
+        print(f"⚙️ {rendered}/{len(jobs)} rendu(s) en {wall:.1f}s : {rendered * 3600 / wall:.0f} clips/heure "
+              f"({busy / wall:.1f} rendus simultanés en moyenne).")
+    return results
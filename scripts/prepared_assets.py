@@ -0,0 +1,213 @@
+# scripts/prepared_assets.py
+import hashlib
+import os
+import subprocess
+from fractions import Fraction
+
+from PIL import Image
+
+import encoding_profiles
+from process_video import BACKGROUND_IMAGE_PATH, END_CLIP_DURATION, END_SHORT_VIDEO_PATH, SHORT_HEIGHT, SHORT_WIDTH
+from render_cache import DATA_DIR
+from source_cache import probe_media
+
+# Assets préparés pour le rendu, nommés <type>-<empreinte de l'asset et du profil de sortie>.<ext>
+PREPARED_ASSETS_DIR = os.path.join(DATA_DIR, 'prepared_assets')
+# Les assets préparés non utilisés depuis ce délai sont supprimés (voir render_cache.prune)
+PREPARED_ASSETS_MAX_AGE_SECONDS = 30 * 24 * 3600
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+# Format audio des rendus dont l'audio du clip est réencodé (sinon, celui du clip : voir ffmpeg_render)
+AUDIO_SAMPLE_RATE = 44100
+AUDIO_CHANNELS = 2
+# Échelle de temps commune de la piste vidéo MP4 (rendu et séquence de fin concaténés sans réencodage)
+VIDEO_TRACK_TIMESCALE = 90000
+
+_asset_hashes = {}
+_ffmpeg_version = None
+
+
+def channel_layout(channels):
+    """Disposition des canaux ffmpeg (aformat, anullsrc) pour 1 ou 2 canaux."""
+    return "mono" if channels == 1 else "stereo"
+
+
+def video_encoder_args(profile, frame_rate):
+    """Paramètres d'encodage vidéo du profil (voir encoding_profiles)."""
+    return ["-c:v", "libx264", "-preset", encoding_profiles.ENCODING_PROFILES[profile]["preset"]] \
+        + encoding_profiles.video_args(profile, frame_rate) \
+        + ["-pix_fmt", "yuv420p", "-video_track_timescale", str(VIDEO_TRACK_TIMESCALE)]
+
+
+def audio_encoder_args(sample_rate=AUDIO_SAMPLE_RATE, channels=AUDIO_CHANNELS):
+    return ["-c:a", "aac", "-ar", str(sample_rate), "-ac", str(channels)]
+
+
+def encoder_args(profile, frame_rate, sample_rate=AUDIO_SAMPLE_RATE, channels=AUDIO_CHANNELS):
+    """
+    Paramètres d'encodage de sortie, identiques pour le rendu et la séquence de fin préparée :
+    c'est ce qui permet de les concaténer par copie de flux (voir concat_copy).
+    """
+    return video_encoder_args(profile, frame_rate) + audio_encoder_args(sample_rate, channels)
+
+
+def _asset_hash(path):
+    """Empreinte SHA-256 d'un asset, recalculée seulement si sa taille ou sa date de modification change."""
+    stat = os.stat(path)
+    signature = (path, stat.st_size, stat.st_mtime_ns)
+    if signature not in _asset_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        _asset_hashes[signature] = digest.hexdigest()
+    return _asset_hashes[signature]
+
+
+def _encoder_version():
+    """Première ligne de `ffmpeg -version` : un autre ffmpeg (et son x264) peut produire des flux incompatibles."""
+    global _ffmpeg_version
+    if _ffmpeg_version is None:
+        try:
+            result = subprocess.run([FFMPEG_BINARY, "-version"], capture_output=True, text=True, timeout=30)
+            _ffmpeg_version = (result.stdout.splitlines() or [""])[0]
+        except (OSError, subprocess.TimeoutExpired):
+            _ffmpeg_version = ""
+    return _ffmpeg_version
+
+
+def _prepared_path(kind, asset_path, extension, **profile):
+    digest = hashlib.sha256(_asset_hash(asset_path).encode())
+    for name in sorted(profile):
+        digest.update(f"\0{name}={profile[name]!r}".encode('utf-8'))
+    return os.path.join(PREPARED_ASSETS_DIR, f"{kind}-{digest.hexdigest()[:16]}.{extension}")
+
+
+def _partial_path(path, extension):
+    """
+    Fichier de travail propre au processus : plusieurs processus de rendu peuvent préparer le
+    même asset en même temps (chacun publie ensuite son fichier, identique, par os.replace).
+    """
+    return f"{path}.{os.getpid()}.partial.{extension}"
+
+
+def _publish(partial_path, path):
+    """Remplace atomiquement l'asset par le fichier de travail ; vrai si l'asset est en place."""
+    try:
+        os.replace(partial_path, path)
+        return True
+    except OSError as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        # Un autre processus a publié le même asset entre-temps
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            return True
+        print(f"⚠️ Impossible d'enregistrer l'asset préparé {os.path.basename(path)} : {e}")
+        return False
+
+
+def _reuse(path):
+    """Vrai si l'asset préparé existe déjà (sa date est rafraîchie pour prune)."""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        os.utime(path)
+        return True
+    return False
+
+
+def prepared_background(asset_path=BACKGROUND_IMAGE_PATH, size=(SHORT_WIDTH, SHORT_HEIGHT)):
+    """Image de fond déjà à la taille du Short (PNG peu compressé, rapide à décoder), ou None si l'asset est absent."""
+    if not os.path.exists(asset_path):
+        return None
+    path = _prepared_path("background", asset_path, "png", size=tuple(size))
+    if _reuse(path):
+        return path
+    os.makedirs(PREPARED_ASSETS_DIR, exist_ok=True)
+    partial_path = _partial_path(path, "png")
+    try:
+        with Image.open(asset_path) as image:
+            image.convert("RGB").resize(tuple(size), Image.LANCZOS).save(partial_path, compress_level=1)
+    except OSError as e:
+        print(f"⚠️ Impossible de préparer l'image de fond : {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return None
+    if not _publish(partial_path, path):
+        return None
+    print(f"🧩 Image de fond préparée : {os.path.basename(path)}")
+    return path
+
+
+def prepared_ending(frame_rate, profile=encoding_profiles.DEFAULT_PROFILE, sample_rate=AUDIO_SAMPLE_RATE,
+                    channels=AUDIO_CHANNELS, asset_path=END_SHORT_VIDEO_PATH, size=(SHORT_WIDTH, SHORT_HEIGHT),
+                    max_duration=END_CLIP_DURATION):
+    """
+    Séquence de fin déjà redimensionnée, coupée à max_duration et encodée avec encoder_args(profile)
+    à la cadence `frame_rate` du clip, avec une piste audio AAC au format (sample_rate, channels)
+    du rendu (silencieuse si l'asset n'en a pas).
+    Retourne (chemin, durée), ou None si l'asset est absent ou si la préparation échoue.
+    """
+    if not os.path.exists(asset_path):
+        return None
+    info = probe_media(asset_path)
+    if info is None:
+        return None
+    duration = min(info["duration"] or max_duration, max_duration)
+    frame_rate = Fraction(str(frame_rate)).limit_denominator(100000)
+    path = _prepared_path("ending", asset_path, "mp4", size=tuple(size), frame_rate=str(frame_rate),
+                          duration=round(duration, 3), encoder=encoder_args(profile, frame_rate, sample_rate, channels),
+                          ffmpeg=_encoder_version())
+    if _reuse(path):
+        return path, duration
+
+    os.makedirs(PREPARED_ASSETS_DIR, exist_ok=True)
+    partial_path = _partial_path(path, "mp4")
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+               "-t", f"{duration:.3f}", "-i", asset_path]
+    if info["has_audio"]:
+        command += ["-map", "0:v", "-map", "0:a",
+                    "-af", f"aresample={sample_rate},aformat=sample_fmts=fltp:channel_layouts={channel_layout(channels)}"]
+    else:
+        command += ["-f", "lavfi", "-t", f"{duration:.3f}", "-i", f"anullsrc=r={sample_rate}:cl={channel_layout(channels)}",
+                    "-map", "0:v", "-map", "1:a"]
+    command += ["-vf", f"scale={size[0]}:{size[1]},setsar=1,fps={frame_rate},format=yuv420p"]
+    command += encoder_args(profile, frame_rate, sample_rate, channels) + ["-movflags", "+faststart", partial_path]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    if result.returncode != 0 or not os.path.exists(partial_path):
+        print(f"⚠️ Impossible de préparer la séquence de fin : {result.stderr.strip()[-500:]}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return None
+    if not _publish(partial_path, path):
+        return None
+    print(f"🧩 Séquence de fin préparée à {frame_rate} img/s (profil '{profile}') : {os.path.basename(path)}")
+    return path, duration
+
+
+def concat_copy(parts, output_path):
+    """
+    Concatène des MP4 encodés avec les mêmes paramètres (encoder_args) sans réencodage
+    (démultiplexeur concat de ffmpeg, copie des flux). Retourne True si la sortie a été écrite.
+    """
+    list_path = output_path + ".concat.txt"
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for part in parts:
+            escaped = os.path.abspath(part).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+               "-f", "concat", "-safe", "0", "-i", list_path, "-map", "0", "-c", "copy", "-movflags", "+faststart",
+               output_path]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        return False
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        print(f"⚠️ Échec de la concaténation sans réencodage : {result.stderr.strip()[-500:]}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+    return True
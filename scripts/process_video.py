@@ -1,10 +1,76 @@
+import math
 import os
 import sys
+import tempfile
+import time
 from typing import List, Optional
 
-from moviepy.editor import VideoFileClip, CompositeVideoClip, TextClip, ImageClip, ColorClip, concatenate_videoclips
-from moviepy.video.fx.all import crop, even_size, resize as moviepy_resize
-import numpy as np # Gardé car il pourrait être utile pour d'autres traitements futurs
+from moviepy.config import get_setting
+from moviepy.editor import VideoFileClip, concatenate_videoclips
+from moviepy.video.fx.all import crop
+
+import encoding_profiles
+
+# Résolution cible des Shorts (9:16)
+SHORT_WIDTH, SHORT_HEIGHT = 1080, 1920
+# La vidéo principale est affichée à MAIN_VIDEO_ZOOM fois la largeur du Short (centrée, bords rognés)
+MAIN_VIDEO_ZOOM = 2
+
+# Textes : titre du clip en haut (sur 90% de la largeur, retour à la ligne automatique), nom du streamer en bas
+TITLE_FONT_SIZE = 70
+TITLE_WIDTH_RATIO = 0.9
+TITLE_TOP_RATIO = 0.08 # Haut du titre à 8% de la hauteur
+STREAMER_FONT_SIZE = 40
+STREAMER_TOP_RATIO = 0.85 # Haut du nom du streamer à 85% de la hauteur, moins la taille de la police
+TEXT_COLOR = "white"
+TEXT_STROKE_COLOR = "black"
+TEXT_STROKE_WIDTH = 1.5
+TWITCH_ICON_WIDTH = 80
+# Durée maximale de la séquence de fin ajoutée après le clip
+END_CLIP_DURATION = 1.2
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets'))
+TWITCH_ICON_PATH = os.path.join(ASSETS_DIR, 'twitch_icon.png')
+BACKGROUND_IMAGE_PATH = os.path.join(ASSETS_DIR, 'fond_short.png')
+END_SHORT_VIDEO_PATH = os.path.join(ASSETS_DIR, 'fin_de_short.mp4')
+FONT_REGULAR_PATH = os.path.join(ASSETS_DIR, 'Roboto-Regular.ttf')
+FONT_BOLD_PATH = os.path.join(ASSETS_DIR, 'Roboto-Bold.ttf')
+
+# Moteur de rendu : "ffmpeg" (un seul graphe filter_complex natif, voir ffmpeg_render)
+# ou "moviepy" (composition image par image en Python, comportement historique)
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "ffmpeg")
+
+
+def source_display_width(enable_webcam_crop=False):
+    """
+    Largeur (en pixels) à laquelle l'image source complète est affichée par trim_video_for_short,
+    utilisée par download_clip pour choisir la plus petite définition suffisante.
+    None avec le rognage de webcam : seule une partie de l'image est agrandie, la meilleure
+    définition disponible est alors nécessaire.
+    """
+    if enable_webcam_crop:
+        return None
+    return int(SHORT_WIDTH * MAIN_VIDEO_ZOOM)
+
+
+def main_video_layout(source_width, source_height, display_width=None):
+    """
+    Partie visible de la vidéo principale affichée à `display_width` pixels de large (par défaut
+    source_display_width()) et centrée dans le Short : seule cette région de la source est
+    redimensionnée, au lieu de l'image entière dont les bords sortent du cadre.
+
+    Returns:
+        tuple: (région de la source (x, y, largeur, hauteur), taille après redimensionnement
+               (largeur, hauteur), position (x, y) dans le Short). Les dimensions sont paires et ne
+               dépassent pas celles du Short.
+    """
+    scale = (display_width or source_display_width()) / source_width
+    crop_width = min(source_width, 2 * math.ceil(SHORT_WIDTH / scale / 2))
+    crop_height = min(source_height, 2 * math.ceil(SHORT_HEIGHT / scale / 2))
+    crop_box = ((source_width - crop_width) // 2, (source_height - crop_height) // 2, crop_width, crop_height)
+    size = (min(SHORT_WIDTH, 2 * round(crop_width * scale / 2)), min(SHORT_HEIGHT, 2 * round(crop_height * scale / 2)))
+    position = ((SHORT_WIDTH - size[0]) // 2, (SHORT_HEIGHT - size[1]) // 2)
+    return crop_box, size, position
 
 # ==============================================================================
 # ATTENTION : Vous DEVEZ implémenter cette fonction ou la remplacer par une logique
@@ -28,8 +94,7 @@ def crop_webcam(clip: VideoFileClip) -> Optional[VideoFileClip]:
     Tente de recadrer le clip autour de la zone de la webcam (visage du diffuseur).
     """
     margin_value = 20
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    temp_dir = os.path.abspath(os.path.join(script_dir, '..', 'data')) # Utilisez votre répertoire 'data'
+    temp_dir = tempfile.gettempdir() # Dossier de travail du processus de rendu (voir parallel_render)
     frame_image = os.path.join(temp_dir, 'webcam_search_frame.png')
 
     print("🔎 Recherche de la zone de la webcam (visage du diffuseur)...")
@@ -66,14 +131,33 @@ def crop_webcam(clip: VideoFileClip) -> Optional[VideoFileClip]:
     return crop(clip, x1=x1, y1=y1, x2=x, y2=y)
 
 
-def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_data=None, enable_webcam_crop=False):
+def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_data=None, enable_webcam_crop=False,
+                         render_backend=None, threads=None, encoding_profile=None):
     """
     Traite une vidéo pour le format Short (9:16) :
     - Coupe si elle dépasse la durée maximale.
     - Ajoute un fond personnalisé (ou noir si l'image n'est pas trouvée).
     - Ajoute le titre du clip, le nom du streamer et une icône Twitch.
     - Ajoute une séquence de fin de 1.2s
+
+    render_backend : "ffmpeg" ou "moviepy" (par défaut RENDER_BACKEND). Le rognage de webcam
+    n'existe qu'avec MoviePy ; en cas d'échec du rendu ffmpeg, MoviePy prend le relais.
+    threads : nombre de threads de l'encodeur (par défaut, celui du profil ou le choix de ffmpeg),
+    voir parallel_render.
+    encoding_profile : profil d'encodage ou "auto" (par défaut encoding_profiles.ENCODING_PROFILE).
     """
+    if render_backend is None:
+        render_backend = RENDER_BACKEND
+    if render_backend == "ffmpeg" and not enable_webcam_crop and os.path.exists(input_path):
+        import ffmpeg_render # Import différé : ffmpeg_render importe les constantes de ce module
+        print(f"✂️ Traitement vidéo (ffmpeg) : {input_path}")
+        rendered = ffmpeg_render.render_short(input_path, output_path, max_duration_seconds=max_duration_seconds,
+                                              clip_data=clip_data, threads=threads,
+                                              encoding_profile=encoding_profile)
+        if rendered:
+            return rendered
+        print("↩️ Nouvel essai avec le rendu MoviePy.")
+
     print(f"✂️ Traitement vidéo : {input_path}")
     print(f"Durée maximale souhaitée : {max_duration_seconds} secondes.")
     if clip_data:
@@ -86,6 +170,7 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
 
     clip = None # Initialiser clip à None pour le finally
     end_clip = None # Initialiser end_clip à None pour le finally
+    end_asset = None # Séquence de fin ajoutée (chemin, durée), pour son audio
 
     try:
         clip = VideoFileClip(input_path)
@@ -103,157 +188,88 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
         duration = clip.duration
 
         # --- Définir la résolution cible pour les Shorts (9:16) ---
-        target_width, target_height = 1080, 1920
+        target_width, target_height = SHORT_WIDTH, SHORT_HEIGHT
 
         # --- DÉFINITION DES CHEMINS DES ASSETS (TRÈS TÔT DANS LA FONCTION) ---
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        assets_dir = os.path.abspath(os.path.join(script_dir, '..', 'assets'))
-        twitch_icon_path = os.path.join(assets_dir, 'twitch_icon.png')
-        custom_background_image_path = os.path.join(assets_dir, 'fond_short.png')
-        end_short_video_path = os.path.join(assets_dir, 'fin_de_short.mp4') # Chemin de ta vidéo de fin
-
-        # --- NOUVEAU: Définition des chemins de police ---
-        # Méthode 1: Utiliser une police par défaut fiable sur la plupart des systèmes Linux/macOS
-        # font_path_regular = "DejaVuSans" 
-        # font_path_bold = "DejaVuSans-Bold"
-
-        # Méthode 2: Utiliser un chemin vers une police .ttf que tu places dans ton dossier 'assets'
-        # Assure-toi d'avoir un fichier comme 'ArialBold.ttf' ou 'Roboto-Bold.ttf' dans ton dossier 'assets'
-        font_path_regular = os.path.join(assets_dir, 'Roboto-Regular.ttf') # Exemple
-        font_path_bold = os.path.join(assets_dir, 'Roboto-Bold.ttf')       # Exemple
-
-        # Si les fichiers de police ne sont pas trouvés, on utilise les polices par défaut de MoviePy
-        if not os.path.exists(font_path_regular):
-            print(f"⚠️ Police '{font_path_regular}' non trouvée. Utilisation de la police par défaut de MoviePy pour le texte normal.")
-            font_path_regular = "sans" # Police par défaut de MoviePy
-        if not os.path.exists(font_path_bold):
-            print(f"⚠️ Police '{font_path_bold}' non trouvée. Utilisation de la police par défaut de MoviePy (bold) pour les titres.")
-            font_path_bold = "sans" # MoviePy tentera d'utiliser une version bold si "sans" est spécifié et une est dispo.
-
-        # Tu peux décommenter et utiliser la méthode 1 si tu es sûr de ton environnement.
-        # Sinon, la méthode 2 (fournir des fichiers .ttf) est la plus robuste.
-
-        # --- FIN DE LA DÉFINITION DES CHEMINS ---
-
-        all_video_elements = [] # Liste pour tous les éléments vidéo à composer
+        assets_dir = ASSETS_DIR
+        custom_background_image_path = BACKGROUND_IMAGE_PATH
+        end_short_video_path = END_SHORT_VIDEO_PATH # Chemin de ta vidéo de fin
+
+        # Assets préparés une fois pour toutes (fond à la taille cible, séquence de fin redimensionnée et coupée)
+        import prepared_assets # Import différé : prepared_assets importe les constantes de ce module
+        import text_overlay # Import différé : text_overlay importe les constantes de ce module
+        from frame_compositor import ShortCompositor # Import différé, pour la même raison
+        import ffmpeg_render # Import différé, pour la même raison
+        prepared_background_path = prepared_assets.prepared_background()
+        prepared_ending = prepared_assets.prepared_ending(clip.fps)
 
         # --- Configuration du fond personnalisé ---
-        background_clip = None # Initialisation
+        background_image_path = None # Fond noir par défaut
 
         if not os.path.exists(custom_background_image_path):
             print(f"❌ Erreur : L'image de fond personnalisée '{os.path.basename(custom_background_image_path)}' est introuvable dans '{assets_dir}'.")
             print("Utilisation d'un fond noir par défaut.")
-            background_clip = ColorClip(size=(target_width, target_height), color=(0,0,0)).set_duration(duration)
         else:
             print(f"✅ Création d'un fond personnalisé avec l'image : {os.path.basename(custom_background_image_path)}")
-            try:
-                background_clip = ImageClip(custom_background_image_path)
-                # Redimensionne l'image pour qu'elle corresponde exactement à la résolution cible
-                background_clip = background_clip.resize(newsize=(target_width, target_height))
-                # Définit la durée de l'image de fond pour qu'elle dure toute la vidéo
-                background_clip = background_clip.set_duration(duration)
-            except Exception as e:
-                print(f"❌ Erreur lors du chargement ou du traitement de l'image de fond : {e}")
-                print("Utilisation d'un fond noir par défaut.")
-                background_clip = ColorClip(size=(target_width, target_height), color=(0,0,0)).set_duration(duration)
+            background_image_path = prepared_background_path or custom_background_image_path
         # --- Fin de la configuration du fond personnalisé ---
 
 
-        found_webcam_and_cropped = False
+        # Vidéo principale : clip complet ou webcam rognée, affichée à MAIN_VIDEO_ZOOM fois la largeur du Short
+        main_source_clip = clip
         if enable_webcam_crop:
             cropped_webcam_clip = crop_webcam(clip)
             if cropped_webcam_clip:
-                found_webcam_and_cropped = True
-                main_video_clip = moviepy_resize(cropped_webcam_clip, width=target_width * 2) # Facteur de zoom 2
-                
-                all_video_elements.append(background_clip)
-                all_video_elements.append(main_video_clip.set_position(("center", "center")))
+                main_source_clip = cropped_webcam_clip
             else:
                 print("La détection de webcam était activée mais n'a pas pu recadrer. Utilisation du mode fond personnalisé.")
-
-        if not found_webcam_and_cropped:
-            all_video_elements.append(background_clip.set_position(("center", "center")))
-            main_video_clip = clip.copy()
-            main_video_display_width = int(target_width * 2) # Facteur de zoom 2
-            main_video_clip = moviepy_resize(main_video_clip, width=main_video_display_width)
-            main_video_clip = main_video_clip.fx(even_size)
-
-            all_video_elements.append(main_video_clip.set_position(("center", "center")))
-        
-        video_with_visuals = CompositeVideoClip(all_video_elements, size=(target_width, target_height)).set_duration(duration)
+        (crop_x, crop_y, crop_width, crop_height), (video_width, video_height), (video_x, video_y) = \
+            main_video_layout(main_source_clip.w, main_source_clip.h)
+        print(f"Région visible de la source : {crop_width}x{crop_height} (redimensionnée en {video_width}x{video_height})")
 
         title_text = clip_data.get('title', 'Titre du clip')
         streamer_name = clip_data.get('broadcaster_name', 'Nom du streamer')
 
-        # --- Utilise font_path_bold pour le titre du clip ---
-        text_color = "white"
-        stroke_color = "black"
-        stroke_width = 1.5
-        
-        # Ajustements pour le titre : positionné un peu plus bas que le bord supérieur
-        title_clip = TextClip(title_text, fontsize=70, color=text_color,
-                              font=font_path_bold, stroke_color=stroke_color, stroke_width=stroke_width, # <--- ICI : Utilise font_path_bold
-                              size=(target_width * 0.9, None), # Texte sur 90% de la largeur
-                              method='caption') \
-                     .set_duration(duration) \
-                     .set_position(("center", int(target_height * 0.08))) # 8% de la hauteur du haut
-
-        # Ajustements pour le nom du streamer : positionné un peu plus haut que le bord inférieur
-        # target_height * 0.92 place le HAUT du texte à 92% de la hauteur.
-        # Soustraire 40 (taille approximative de la police) assure que le bas du texte est visible.
-        streamer_clip = TextClip(f"@{streamer_name}", fontsize=40, color=text_color,
-                                 font=font_path_regular, stroke_color=stroke_color, stroke_width=stroke_width) \
-                        .set_duration(duration) \
-                        .set_position(("center", int(target_height * 0.85) - 40)) 
-        
-        # Logique de l'icône Twitch (maintenue pour la complétude, même si tu la désactives)
-        twitch_icon_clip = None
-        if os.path.exists(twitch_icon_path):
-            try:
-                twitch_icon_clip = ImageClip(twitch_icon_path, duration=duration)
-                twitch_icon_clip = moviepy_resize(twitch_icon_clip, width=80)
-                
-                # Positionnement de l'icône à gauche du titre, centré verticalement par rapport au titre
-                icon_x = title_clip.pos[0] - twitch_icon_clip.w - 10 # 10 pixels de marge à gauche du titre
-                icon_y = title_clip.pos[1] + (title_clip.h / 2) - (twitch_icon_clip.h / 2) # Centré verticalement avec le titre
-
-                twitch_icon_clip = twitch_icon_clip.set_position((icon_x, icon_y))
-                print("✅ Icône Twitch ajoutée.")
-            except Exception as e:
-                # Cette erreur se produira si l'image existe mais est corrompue/invalide
-                print(f"⚠️ Erreur lors du chargement ou du traitement de l'icône Twitch : {e}. L'icône ne sera pas ajoutée.")
-                twitch_icon_clip = None
-        else:
-            # Ce message s'affichera si twitch_icon.png n'est pas trouvé
-            print("⚠️ Fichier 'twitch_icon.png' non trouvé dans le dossier 'assets'. L'icône ne sera pas ajoutée.")
-
-        final_elements_main_video = [video_with_visuals, title_clip, streamer_clip]
-        if twitch_icon_clip:
-            final_elements_main_video.append(twitch_icon_clip)
+        # --- Titre, nom du streamer et icône Twitch : rastérisés une seule fois avec Pillow ---
+        # Ce qui est hors de la vidéo est composé directement dans l'image de fond ; seule la partie
+        # qui chevauche la vidéo est superposée à chaque image (voir text_overlay.static_layers).
+        video_box = (video_x, video_y, video_x + video_width, video_y + video_height)
+        try:
+            background_image, text_layer = text_overlay.static_layers(background_image_path, title_text, streamer_name,
+                                                                      video_box)
+        except OSError as e:
+            if background_image_path is None:
+                raise
+            print(f"❌ Erreur lors du chargement ou du traitement de l'image de fond : {e}")
+            print("Utilisation d'un fond noir par défaut.")
+            background_image, text_layer = text_overlay.static_layers(None, title_text, streamer_name, video_box)
 
-        # Crée le clip principal AVEC le fond, le texte et potentiellement l'icône
-        composed_main_video_clip = CompositeVideoClip(final_elements_main_video).set_duration(duration)
+        # Crée le clip principal AVEC le fond, le texte et potentiellement l'icône (tampons préalloués)
+        composed_main_video_clip = ShortCompositor(main_source_clip, background_image, text_layer).clip(duration)
 
 
         # --- AJOUT DE LA SÉQUENCE DE FIN ---
         print(f"⏳ Ajout de la séquence de fin : {os.path.basename(end_short_video_path)}")
         if os.path.exists(end_short_video_path):
             try:
-                end_clip = VideoFileClip(end_short_video_path)
+                end_clip_path = prepared_ending[0] if prepared_ending else end_short_video_path
+                end_clip = VideoFileClip(end_clip_path)
                 
-                # Redimensionne la vidéo de fin à la taille cible (1080x1920)
-                end_clip = end_clip.resize(newsize=(target_width, target_height))
+                # Redimensionne la vidéo de fin à la taille cible (1080x1920), sauf séquence de fin préparée
+                if not prepared_ending:
+                    end_clip = end_clip.resize(newsize=(target_width, target_height))
                 
                 # S'assurer que le clip de fin a la bonne durée (1.2s)
                 # Si ta vidéo est exactement de 1.2s, pas besoin de subclip.
                 # Mais c'est une bonne sécurité au cas où elle serait plus longue.
-                if end_clip.duration > 1.2:
-                    end_clip = end_clip.subclip(0, 1.2)
-                elif end_clip.duration < 1.2:
+                if end_clip.duration > END_CLIP_DURATION:
+                    end_clip = end_clip.subclip(0, END_CLIP_DURATION)
+                elif end_clip.duration < END_CLIP_DURATION:
                     print(f"⚠️ La vidéo de fin ({end_clip.duration:.2f}s) est plus courte que 1.2s. Elle ne sera pas étirée.")
                 
-                # Concaténer le clip principal traité avec le clip de fin
+                # Concaténer le clip principal traité avec le clip de fin (son audio est ajouté par ffmpeg_render.mux_audio)
                 final_video = concatenate_videoclips([composed_main_video_clip, end_clip])
+                end_asset = (end_clip_path, end_clip.duration)
                 print("✅ Séquence de fin ajoutée avec succès.")
 
             except Exception as e:
@@ -266,14 +282,42 @@ def trim_video_for_short(input_path, output_path, max_duration_seconds=60, clip_
 
 
         # L'écriture du fichier final, qui est la partie cruciale !
-        final_video.write_videofile(output_path,
-                                    codec="libx264",
-                                    audio_codec="aac",
-                                    temp_audiofile='temp-audio.m4a',
-                                    remove_temp=True,
-                                    fps=clip.fps, # Utilise le FPS du clip original pour la vidéo principale
-                                    logger=None)
-        print(f"✅ Clip traité et sauvegardé : {output_path}")
+        # Vidéo seule dans un dossier propre à ce rendu (plusieurs rendus peuvent tourner en parallèle),
+        # puis audio ajouté par ffmpeg sans réencoder la vidéo : copié tel quel quand c'est possible
+        with tempfile.TemporaryDirectory(prefix="render_") as scratch_dir:
+            def encode_sample(profile_name):
+                # Mode "auto" : début du Short rendu sans audio avec ce profil, pour mesurer sa vitesse
+                sample = final_video.subclip(0, min(final_video.duration, encoding_profiles.CALIBRATION_SECONDS))
+                sample.write_videofile(os.path.join(scratch_dir, f"calibration_{profile_name}.mp4"),
+                                       codec="libx264",
+                                       audio=False,
+                                       preset=encoding_profiles.ENCODING_PROFILES[profile_name]["preset"],
+                                       ffmpeg_params=encoding_profiles.video_args(profile_name, clip.fps),
+                                       fps=clip.fps,
+                                       threads=threads,
+                                       logger=None)
+                return int(sample.duration * clip.fps)
+
+            profile = encoding_profiles.select_profile(
+                encoding_profile, final_video.duration * clip.fps, encode_sample,
+                calibration_key=(encoding_profiles.ffmpeg_version(get_setting("FFMPEG_BINARY")), "moviepy",
+                                 original_width, original_height, clip.fps, threads))
+            start = time.perf_counter()
+            video_only_path = os.path.join(scratch_dir, "video.mp4")
+            final_video.write_videofile(video_only_path,
+                                        codec="libx264",
+                                        audio=False,
+                                        fps=clip.fps, # Utilise le FPS du clip original pour la vidéo principale
+                                        preset=encoding_profiles.ENCODING_PROFILES[profile]["preset"],
+                                        ffmpeg_params=encoding_profiles.video_args(profile, clip.fps),
+                                        threads=threads,
+                                        logger=None)
+            if not ffmpeg_render.mux_audio(video_only_path, output_path, input_path, duration, end_asset):
+                return None
+            elapsed = time.perf_counter() - start
+        frames = int(final_video.duration * clip.fps)
+        print(f"✅ Clip traité et sauvegardé : {output_path} (profil '{profile}', "
+              f"{frames} images en {elapsed:.1f}s, {frames / max(elapsed, 1e-6):.1f} img/s)")
         return output_path
             
     except Exception as e:
@@ -0,0 +1,197 @@
+# scripts/published_history.py
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+# Journal des publications : une ligne JSON par Short publié, uniquement en ajout
+PUBLISHED_HISTORY_LOG_FILE = os.path.join(DATA_DIR, 'published_shorts_history.jsonl')
+# Ancien format (un seul document JSON { "YYYY-MM-DD": [...] }), migré au premier chargement
+LEGACY_PUBLISHED_HISTORY_FILE = os.path.join(DATA_DIR, 'published_shorts_history.json')
+
+# Durée de conservation des publications. Doit rester bien supérieure à la fenêtre de
+# découverte et à la rétention du catalogue : un clip plus ancien ne peut plus être proposé.
+HISTORY_RETENTION_DAYS = 180
+# Le journal est réécrit (compacté) quand il contient plus de lignes inutiles que ce seuil
+# (entrées expirées, doublons, lignes corrompues).
+HISTORY_COMPACTION_MIN_STALE_RECORDS = 500
+
+
+class PublishedHistory:
+    """
+    Historique de toutes les publications (clip Twitch -> Short YouTube).
+
+    - Stockage : journal JSON Lines en ajout seul ; chaque publication ajoute une ligne
+      (écriture unique + fsync), sans réécrire le fichier.
+    - Index : dictionnaire en mémoire {twitch_clip_id: entrée}, reconstruit au chargement ;
+      la vérification « déjà publié ? » est un simple test d'appartenance sur l'historique
+      lui-même (`clip_id in history`), sans copie de l'ensemble des IDs. Un second index
+      {date: IDs publiés ce jour-là} répond aux questions par jour sans parcourir l'historique.
+    - Reprise après crash : une dernière ligne incomplète (écriture interrompue) est ignorée
+      et tronquée au chargement.
+    - Compaction : le journal est réécrit atomiquement (fichier temporaire + os.replace) sans
+      les entrées de plus de HISTORY_RETENTION_DAYS jours, quand les lignes inutiles s'accumulent.
+    """
+
+    def __init__(self, path=PUBLISHED_HISTORY_LOG_FILE, legacy_path=LEGACY_PUBLISHED_HISTORY_FILE,
+                 retention_days=HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._index = {}
+        self._by_day = {}
+        self._log_records = 0
+        if os.path.exists(self.path):
+            self._load()
+        elif legacy_path and os.path.exists(legacy_path):
+            self._migrate_legacy()
+
+    # --- Chargement ---
+
+    def _load(self):
+        valid_length = 0
+        try:
+            with open(self.path, 'rb') as f:
+                for raw_line in f:
+                    if not raw_line.endswith(b'\n'):
+                        # Écriture interrompue : la ligne partielle sera tronquée
+                        break
+                    valid_length += len(raw_line)
+                    self._log_records += 1
+                    try:
+                        self._index_entry(json.loads(raw_line))
+                    except (ValueError, KeyError, TypeError):
+                        print("⚠️ Ligne corrompue ignorée dans l'historique des publications.")
+            if valid_length < os.path.getsize(self.path):
+                print("⚠️ Dernière ligne de l'historique des publications incomplète (écriture interrompue). Elle est ignorée.")
+                with open(self.path, 'r+b') as f:
+                    f.truncate(valid_length)
+        except OSError as e:
+            print(f"❌ Erreur inattendue lors du chargement de l'historique : {e}")
+
+    def _migrate_legacy(self):
+        """Convertit l'ancien historique JSON en journal, puis le renomme en .bak."""
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ancien historique des publications illisible ({e}). Démarrage avec un historique vide.")
+            return
+        for day, items in sorted(legacy.items()):
+            for item in items:
+                if item.get("twitch_clip_id"):
+                    self._index_entry({
+                        "twitch_clip_id": item["twitch_clip_id"],
+                        "youtube_short_id": item.get("youtube_short_id"),
+                        "date": day,
+                        "timestamp": item.get("timestamp")
+                    })
+        self.compact(force=True)
+        try:
+            os.replace(self.legacy_path, self.legacy_path + '.bak')
+        except OSError as e:
+            print(f"⚠️ Impossible de renommer l'ancien historique : {e}")
+        print(f"ℹ️ Ancien historique migré : {len(self._index)} publication(s).")
+
+    def _index_entry(self, entry):
+        """Ajoute une entrée aux index (la première occurrence d'un ID fait foi)."""
+        clip_id = entry["twitch_clip_id"]
+        if clip_id in self._index:
+            return False
+        self._index[clip_id] = entry
+        self._by_day.setdefault(entry.get("date"), set()).add(clip_id)
+        return True
+
+    def _unindex_entry(self, clip_id):
+        entry = self._index.pop(clip_id)
+        day_ids = self._by_day.get(entry.get("date"))
+        if day_ids is not None:
+            day_ids.discard(clip_id)
+            if not day_ids:
+                del self._by_day[entry.get("date")]
+
+    # --- Consultation ---
+
+    def __contains__(self, clip_id):
+        return clip_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, clip_id):
+        """Entrée de l'historique du clip ({"twitch_clip_id", "youtube_short_id", "date", "timestamp"}) ou None."""
+        return self._index.get(clip_id)
+
+    def published_ids(self):
+        """Vue en lecture seule des IDs Twitch déjà publiés (toutes dates confondues), sans copie."""
+        return self._index.keys()
+
+    def ids_published_on(self, day=None):
+        """IDs des clips publiés à la date `day` (aujourd'hui par défaut)."""
+        return list(self._by_day.get((day or date.today()).isoformat(), ()))
+
+    def count_published_on(self, day=None):
+        """Nombre de clips publiés à la date `day` (aujourd'hui par défaut)."""
+        return len(self._by_day.get((day or date.today()).isoformat(), ()))
+
+    # --- Écriture ---
+
+    def add(self, clip_id, youtube_id):
+        """Ajoute une publication au journal ; retourne False si le clip y figurait déjà."""
+        with self._lock:
+            if clip_id in self._index:
+                return False
+            entry = {
+                "twitch_clip_id": clip_id,
+                "youtube_short_id": youtube_id,
+                "date": date.today().isoformat(),
+                "timestamp": datetime.now().isoformat()
+            }
+            line = json.dumps(entry, ensure_ascii=False) + "\n"
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Une seule écriture de la ligne complète, forcée sur disque avant de mettre l'index à jour
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._index_entry(entry)
+            self._log_records += 1
+            return True
+
+    def _is_expired(self, entry, cutoff):
+        try:
+            return date.fromisoformat(entry.get("date") or "") < cutoff
+        except ValueError:
+            return False
+
+    def compact(self, force=False):
+        """
+        Réécrit le journal sans les entrées expirées (retention_days) ni lignes inutiles.
+        Sans force, ne fait rien tant que moins de HISTORY_COMPACTION_MIN_STALE_RECORDS lignes
+        sont récupérables. Retourne le nombre d'entrées expirées supprimées.
+        """
+        with self._lock:
+            cutoff = date.today() - timedelta(days=self.retention_days)
+            expired = [clip_id for clip_id, entry in self._index.items() if self._is_expired(entry, cutoff)]
+            stale_records = self._log_records - len(self._index) + len(expired)
+            if not force and stale_records < HISTORY_COMPACTION_MIN_STALE_RECORDS:
+                return 0
+            for clip_id in expired:
+                self._unindex_entry(clip_id)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for entry in self._index.values():
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._log_records = len(self._index)
+            except OSError as e:
+                print(f"❌ Erreur lors de la compaction de l'historique des publications : {e}")
+            if expired:
+                print(f"🧹 {len(expired)} publication(s) de plus de {self.retention_days} jours retirée(s) de l'historique.")
+            return len(expired)
@@ -0,0 +1,102 @@
+# scripts/rate_limiter.py
+import random
+import threading
+import time
+
+
+class TokenBucketRateLimiter:
+    """
+    Ordonnanceur "token bucket" partagé par tous les threads qui appellent l'API Helix.
+
+    - Chaque requête consomme un jeton avant d'être envoyée (acquire()).
+    - Le seau se remplit en continu à raison de `capacity` jetons par `refill_period` secondes.
+    - Les en-têtes Twitch (Ratelimit-Limit / Ratelimit-Remaining / Ratelimit-Reset) recalent
+      le seau sur le budget réel du serveur, en gardant une marge de sécurité.
+    - Sur un 429, plus aucune requête ne part avant la remise à zéro annoncée par Twitch
+      (ou un backoff exponentiel si l'en-tête est absent).
+    """
+
+    def __init__(self, capacity=800, refill_period=60.0, safety_margin=10,
+                 backoff_base_seconds=1.0, backoff_max_seconds=60.0):
+        self.capacity = capacity
+        self.refill_period = refill_period
+        self.safety_margin = safety_margin
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def _refill_rate(self):
+        return self.capacity / self.refill_period
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(float(self.capacity), self._tokens + elapsed * self._refill_rate)
+            self._last_refill = now
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'un jeton soit disponible, puis le consomme."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self._refill_rate
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Recale le seau sur les en-têtes Ratelimit-* renvoyés par Twitch."""
+        limit = _int_header(headers, "Ratelimit-Limit")
+        remaining = _int_header(headers, "Ratelimit-Remaining")
+        reset = _int_header(headers, "Ratelimit-Reset")
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.capacity = limit
+            if remaining is None:
+                return
+            usable = remaining - self.safety_margin
+            # Le serveur fait foi : ne jamais croire avoir plus de jetons qu'il n'en annonce.
+            # Les réponses concurrentes arrivent dans le désordre, min() reste conservateur.
+            self._tokens = min(self._tokens, float(max(usable, 0)))
+            if usable <= 0 and reset is not None:
+                self._block_until_reset(now, reset)
+
+    def on_throttled(self, headers, attempt):
+        """
+        Appelé sur une réponse 429 : vide le seau et suspend les envois jusqu'au reset.
+        Retourne le délai d'attente appliqué (en secondes).
+        """
+        reset = _int_header(headers, "Ratelimit-Reset")
+        backoff = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        backoff += random.uniform(0, self.backoff_base_seconds)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = 0.0
+            self._last_refill = now
+            if reset is not None:
+                self._block_until_reset(now, reset)
+            self._blocked_until = max(self._blocked_until, now + backoff)
+            return self._blocked_until - now
+
+    def _block_until_reset(self, now, reset_epoch):
+        wait = max(0.0, reset_epoch - time.time())
+        self._blocked_until = max(self._blocked_until, now + min(wait, self.backoff_max_seconds))
+
+
+def _int_header(headers, name):
+    value = headers.get(name) if headers is not None else None
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,118 @@
+# scripts/render_cache.py
+import hashlib
+import os
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.abspath(os.path.join(SCRIPTS_DIR, '..', 'assets'))
+DATA_DIR = os.path.abspath(os.path.join(SCRIPTS_DIR, '..', 'data'))
+# Shorts rendus, nommés <clip_id>-<clé>.mp4
+RENDER_CACHE_DIR = os.path.join(DATA_DIR, 'render_cache')
+# Clips bruts téléchargés, un fichier par clip (<clip_id>.mp4), gérés par source_cache (LRU borné)
+RAW_CLIPS_DIR = os.path.join(DATA_DIR, 'raw_clips')
+
+# Fichiers dont dépend le rendu : une modification invalide tous les rendus en cache
+RENDER_TEMPLATE_FILES = tuple(os.path.join(SCRIPTS_DIR, name) for name in ('process_video.py', 'ffmpeg_render.py', 'prepared_assets.py', 'encoding_profiles.py',
+                                                                               'text_overlay.py', 'frame_compositor.py'))
+# Les fichiers de ces dossiers (fonds, polices, séquence de fin...) font aussi partie de la clé
+RENDER_ASSET_DIRS = (ASSETS_DIR,)
+
+# Les rendus non réclamés depuis ce délai sont supprimés (voir prune)
+RENDER_CACHE_MAX_AGE_SECONDS = 3 * 24 * 3600
+
+_template_hash = None
+
+
+def _hash_file(digest, path):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+
+def render_template_hash():
+    """Empreinte SHA-256 du code de rendu et de tous les assets (calculée une fois par processus)."""
+    global _template_hash
+    if _template_hash is None:
+        digest = hashlib.sha256()
+        paths = list(RENDER_TEMPLATE_FILES)
+        for assets_dir in RENDER_ASSET_DIRS:
+            if os.path.isdir(assets_dir):
+                paths.extend(os.path.join(assets_dir, name) for name in sorted(os.listdir(assets_dir)))
+        for path in paths:
+            if os.path.isfile(path):
+                digest.update(os.path.relpath(path, os.path.dirname(SCRIPTS_DIR)).encode('utf-8'))
+                _hash_file(digest, path)
+        _template_hash = digest.hexdigest()
+    return _template_hash
+
+
+def render_key(clip, **render_params):
+    """
+    Clé de rendu d'un clip : ID du clip, champs affichés (titre, streamer), paramètres
+    de rendu (durée maximale, rognage webcam...) et empreinte du template et des assets.
+    """
+    digest = hashlib.sha256()
+    digest.update(render_template_hash().encode())
+    for field in ("id", "title", "broadcaster_name"):
+        digest.update(b"\0" + str(clip.get(field, "")).encode('utf-8'))
+    for name in sorted(render_params):
+        digest.update(f"\0{name}={render_params[name]!r}".encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def raw_clip_path(clip_id):
+    return os.path.join(RAW_CLIPS_DIR, f"{clip_id}.mp4")
+
+
+class RenderCache:
+    """Cache des Shorts rendus, adressé par (clip, clé de rendu)."""
+
+    def __init__(self, cache_dir=RENDER_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, clip_id, key):
+        return os.path.join(self.cache_dir, f"{clip_id}-{key}.mp4")
+
+    def temp_path_for(self, clip_id, key):
+        """Chemin de travail du rendu ; publié dans le cache par store() une fois terminé."""
+        return os.path.join(self.cache_dir, f"{clip_id}-{key}.partial.mp4")
+
+    def lookup(self, clip_id, key):
+        """Retourne le chemin du rendu en cache s'il existe et n'est pas vide, sinon None."""
+        path = self.path_for(clip_id, key)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            os.utime(path)
+            return path
+        return None
+
+    def store(self, rendered_path, clip_id, key):
+        """Publie atomiquement un rendu terminé dans le cache ; retourne son chemin."""
+        path = self.path_for(clip_id, key)
+        os.replace(rendered_path, path)
+        return path
+
+    def discard(self, clip_id):
+        """Supprime tous les rendus d'un clip (après upload)."""
+        prefix = f"{clip_id}-"
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(self.cache_dir, name))
+
+
+def prune(directories=(RENDER_CACHE_DIR,), max_age_seconds=RENDER_CACHE_MAX_AGE_SECONDS):
+    """Supprime les fichiers non utilisés depuis max_age_seconds ; retourne le nombre de fichiers supprimés."""
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                print(f"⚠️ Impossible de supprimer {path} : {e}")
+    return removed
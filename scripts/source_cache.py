@@ -0,0 +1,256 @@
+# scripts/source_cache.py
+import json
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from render_cache import RAW_CLIPS_DIR
+
+# Taille maximale du cache des clips sources téléchargés ; les moins récemment utilisés sont évincés
+SOURCE_CACHE_MAX_BYTES = int(os.getenv("SOURCE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+
+def probe_video(path):
+    """
+    Vérifie avec ffprobe qu'un fichier contient un flux vidéo lisible.
+    Retourne (valide, durée en secondes ou None). Sans ffprobe, le fichier est considéré valide.
+    """
+    command = [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "stream=codec_type:format=duration", "-of", "json", path]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+    except FileNotFoundError:
+        return True, None
+    except subprocess.TimeoutExpired:
+        return False, None
+    if result.returncode != 0:
+        return False, None
+    try:
+        info = json.loads(result.stdout or "{}")
+    except ValueError:
+        return False, None
+    if not info.get("streams"):
+        return False, None
+    try:
+        return True, float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        return True, None
+
+
+def probe_media(path):
+    """
+    Lit avec ffprobe les caractéristiques d'une vidéo. Retourne un dict {"width", "height",
+    "fps" (float), "frame_rate" (fraction ffmpeg, ex. "30000/1001"), "duration", "has_audio",
+    "audio" ({"codec", "profile", "sample_rate", "channels"} de la première piste audio, ou None)},
+    ou None si le fichier est illisible ou si ffprobe est absent.
+    """
+    command = [FFPROBE_BINARY, "-v", "error", "-show_entries",
+               "stream=codec_type,codec_name,profile,sample_rate,channels,width,height,avg_frame_rate,r_frame_rate"
+               ":format=duration", "-of", "json", path]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+        info = json.loads(result.stdout or "{}")
+    except (FileNotFoundError, subprocess.TimeoutExpired, ValueError):
+        return None
+    streams = info.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    if result.returncode != 0 or video is None:
+        return None
+
+    frame_rate, fps = None, None
+    for key in ("avg_frame_rate", "r_frame_rate"):
+        num, _, den = str(video.get(key, "0/0")).partition("/")
+        try:
+            if float(num) > 0 and float(den or 1) > 0:
+                frame_rate, fps = video[key], float(num) / float(den or 1)
+                break
+        except ValueError:
+            continue
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+    if audio is not None:
+        try:
+            sample_rate = int(audio.get("sample_rate"))
+        except (TypeError, ValueError):
+            sample_rate = None
+        audio = {"codec": audio.get("codec_name"), "profile": audio.get("profile"),
+                 "sample_rate": sample_rate, "channels": audio.get("channels")}
+    return {
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": fps or 30.0,
+        "frame_rate": frame_rate or "30",
+        "duration": duration,
+        "has_audio": audio is not None,
+        "audio": audio
+    }
+
+
+class SourceClipCache:
+    """
+    Cache des clips sources téléchargés, adressé par ID de clip (data/raw_clips/<clip_id>.mp4).
+
+    - Index JSON {clip_id: {"size", "duration", "last_used"[, "reduced_width"]}} écrit atomiquement.
+      reduced_width : largeur du clip s'il a été téléchargé dans une définition inférieure à la
+      meilleure disponible (voir download_clip.select_rendition).
+    - Intégrité : un fichier n'est servi que si sa taille correspond à celle enregistrée lors de
+      l'ajout ; à l'ajout (ou pour un fichier présent mais inconnu de l'index), il est validé par ffprobe.
+    - Taille bornée (max_bytes) : les clips les moins récemment utilisés sont évincés après chaque ajout.
+    - Épinglage : un clip servi avec pin=True (préchargé mais pas encore pris par la boucle
+      principale, ou en cours de rendu) n'est jamais évincé avant unpin(clip_id).
+
+    Partagé par la boucle principale et le thread de préchargement (protégé par un verrou).
+    """
+
+    def __init__(self, cache_dir=RAW_CLIPS_DIR, max_bytes=SOURCE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._pinned = set()
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Index du cache des clips sources illisible ({e}). Les fichiers seront revalidés.")
+
+    def path_for(self, clip_id):
+        return os.path.join(self.cache_dir, f"{clip_id}.mp4")
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"⚠️ Impossible d'enregistrer l'index du cache des clips sources : {e}")
+
+    def lookup(self, clip_id, min_width=0, pin=False):
+        """
+        Retourne le chemin du clip en cache s'il est intègre (et le marque comme utilisé), sinon None.
+        Un clip en définition réduite plus étroit que min_width n'est pas servi (il sera retéléchargé).
+        Avec pin, le clip servi est épinglé jusqu'à unpin(clip_id).
+        """
+        path = self.path_for(clip_id)
+        with self._lock:
+            entry = self._entries.get(clip_id)
+            if entry is not None and entry.get("reduced_width", math.inf) < min_width:
+                return None
+            if not os.path.exists(path):
+                if entry is not None:
+                    del self._entries[clip_id]
+                    self._save_index()
+                return None
+            size = os.path.getsize(path)
+            if entry is None or entry.get("size") != size:
+                # Fichier inconnu de l'index ou modifié depuis son ajout : revalidation complète
+                valid, duration = probe_video(path) if size > 0 else (False, None)
+                if not valid:
+                    print(f"⚠️ Clip source en cache invalide, supprimé : {path}")
+                    self._remove(clip_id, path)
+                    self._save_index()
+                    return None
+                entry = {"size": size, "duration": duration}
+            entry["last_used"] = time.time()
+            self._entries[clip_id] = entry
+            if pin:
+                self._pinned.add(clip_id)
+            self._save_index()
+        return path
+
+    def add(self, clip_id, path, reduced_width=None, pin=False):
+        """
+        Valide et enregistre un clip téléchargé (déplacé dans le cache s'il est ailleurs).
+        Retourne son chemin dans le cache, ou None s'il est invalide. Avec pin, le clip est
+        épinglé jusqu'à unpin(clip_id).
+        """
+        cached_path = self.path_for(clip_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        valid, duration = probe_video(path) if size > 0 else (False, None)
+        if not valid:
+            print(f"❌ Clip téléchargé invalide (ffprobe) : {path}")
+            if os.path.exists(path):
+                os.remove(path)
+            return None
+        if os.path.abspath(path) != os.path.abspath(cached_path):
+            os.replace(path, cached_path)
+        with self._lock:
+            self._entries[clip_id] = {"size": size, "duration": duration, "last_used": time.time()}
+            if reduced_width:
+                self._entries[clip_id]["reduced_width"] = reduced_width
+            if pin:
+                self._pinned.add(clip_id)
+            self._evict(keep=clip_id)
+            self._save_index()
+        return cached_path
+
+    def unpin(self, clip_id):
+        """Le clip n'est plus utilisé : il redevient évinçable."""
+        with self._lock:
+            self._pinned.discard(clip_id)
+
+    def discard(self, clip_id):
+        with self._lock:
+            self._pinned.discard(clip_id)
+            self._remove(clip_id, self.path_for(clip_id))
+            self._save_index()
+
+    def _remove(self, clip_id, path):
+        self._entries.pop(clip_id, None)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _evict(self, keep=None):
+        """
+        Évince les clips les moins récemment utilisés jusqu'à respecter max_bytes (sous verrou),
+        sauf `keep` et les clips épinglés (le cache peut alors dépasser temporairement max_bytes).
+        """
+        total = sum(entry.get("size", 0) for entry in self._entries.values())
+        evicted = 0
+        for clip_id, entry in sorted(self._entries.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if clip_id == keep or clip_id in self._pinned:
+                continue
+            self._remove(clip_id, self.path_for(clip_id))
+            total -= entry.get("size", 0)
+            evicted += 1
+        if evicted:
+            print(f"🧹 Cache des clips sources : {evicted} clip(s) évincé(s) ({total / 1e6:.0f} Mo conservés).")
+
+    def copy_to(self, clip_id, output_path):
+        """Place le clip en cache à output_path (lien physique si possible, sinon copie)."""
+        cached_path = self.path_for(clip_id)
+        if os.path.abspath(cached_path) == os.path.abspath(output_path):
+            return output_path
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(cached_path, output_path)
+        except OSError:
+            shutil.copyfile(cached_path, output_path)
+        return output_path
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_source_cache():
+    """Cache des clips sources partagé par le processus, créé à la première utilisation."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SourceClipCache()
+        return _default_cache
@@ -0,0 +1,137 @@
+# scripts/text_overlay.py
+import os
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+from process_video import (
+    FONT_BOLD_PATH, FONT_REGULAR_PATH, SHORT_HEIGHT, SHORT_WIDTH, STREAMER_FONT_SIZE, STREAMER_TOP_RATIO,
+    TEXT_COLOR, TEXT_STROKE_COLOR, TEXT_STROKE_WIDTH, TITLE_FONT_SIZE, TITLE_TOP_RATIO, TITLE_WIDTH_RATIO,
+    TWITCH_ICON_PATH, TWITCH_ICON_WIDTH
+)
+
+# Police utilisée si une police des assets est absente (cherchée dans les dossiers de polices du système)
+FALLBACK_FONT = "DejaVuSans.ttf"
+# Marge entre l'icône Twitch et le titre
+TWITCH_ICON_MARGIN = 10
+
+
+@lru_cache(maxsize=None)
+def load_font(font_path, size):
+    """Police Pillow, chargée une seule fois par (fichier, taille)."""
+    for path in (font_path, FALLBACK_FONT):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            print(f"⚠️ Police '{path}' introuvable ou illisible.")
+    raise OSError(f"Aucune police utilisable ({font_path}, {FALLBACK_FONT})")
+
+
+@lru_cache(maxsize=1024)
+def wrap_text(text, font_path, size, max_width):
+    """Découpe le texte en lignes d'au plus max_width pixels, mot à mot (mise en page mise en cache)."""
+    font = load_font(font_path, size)
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return tuple(lines)
+
+
+@lru_cache(maxsize=None)
+def _twitch_icon(path, width):
+    if not os.path.exists(path):
+        print("⚠️ Fichier 'twitch_icon.png' non trouvé dans le dossier 'assets'. L'icône ne sera pas ajoutée.")
+        return None
+    try:
+        with Image.open(path) as image:
+            icon = image.convert("RGBA")
+        return icon.resize((width, max(1, round(icon.height * width / icon.width))), Image.LANCZOS)
+    except OSError as e:
+        print(f"⚠️ Erreur lors du chargement de l'icône Twitch : {e}. L'icône ne sera pas ajoutée.")
+        return None
+
+
+@lru_cache(maxsize=None)
+def _load_background(path, size):
+    with Image.open(path) as image:
+        background = image.convert("RGBA")
+    if background.size != size:
+        background = background.resize(size, Image.LANCZOS)
+    return background
+
+
+def _draw_lines(draw, lines, font, top, canvas_width):
+    """Lignes centrées horizontalement à partir de `top` ; retourne (largeur de la plus longue, hauteur du bloc)."""
+    ascent, descent = font.getmetrics()
+    stroke_width = max(1, round(TEXT_STROKE_WIDTH))
+    widest = 0
+    for i, line in enumerate(lines):
+        width = font.getlength(line)
+        widest = max(widest, width)
+        draw.text(((canvas_width - width) / 2, top + i * (ascent + descent)), line, font=font, fill=TEXT_COLOR,
+                  stroke_width=stroke_width, stroke_fill=TEXT_STROKE_COLOR)
+    return widest, len(lines) * (ascent + descent)
+
+
+@lru_cache(maxsize=16)
+def render_overlay(title, streamer_name, size=(SHORT_WIDTH, SHORT_HEIGHT)):
+    """
+    Calque RGBA transparent de la taille du Short avec le titre (retour à la ligne automatique
+    sur TITLE_WIDTH_RATIO de la largeur), le nom du streamer et l'icône Twitch si elle existe.
+    Le calque est mis en cache : il ne doit pas être modifié par l'appelant.
+    """
+    width, height = size
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+
+    title_top = int(height * TITLE_TOP_RATIO)
+    title_lines = wrap_text(title, FONT_BOLD_PATH, TITLE_FONT_SIZE, width * TITLE_WIDTH_RATIO)
+    title_width, title_height = _draw_lines(draw, title_lines, load_font(FONT_BOLD_PATH, TITLE_FONT_SIZE),
+                                            title_top, width)
+    _draw_lines(draw, [f"@{streamer_name}"], load_font(FONT_REGULAR_PATH, STREAMER_FONT_SIZE),
+                int(height * STREAMER_TOP_RATIO) - STREAMER_FONT_SIZE, width)
+
+    # Icône Twitch à gauche du titre, centrée verticalement sur celui-ci
+    icon = _twitch_icon(TWITCH_ICON_PATH, TWITCH_ICON_WIDTH)
+    if icon is not None:
+        icon_x = int((width - title_width) / 2) - icon.width - TWITCH_ICON_MARGIN
+        icon_y = int(title_top + (title_height - icon.height) / 2)
+        overlay.alpha_composite(icon, (max(icon_x, 0), max(icon_y, 0)))
+    return overlay
+
+
+def static_layers(background_path, title, streamer_name, video_box, size=(SHORT_WIDTH, SHORT_HEIGHT)):
+    """
+    Compose une seule fois le calque de texte (render_overlay) pour tout le clip :
+    - le fond (image background_path, ou noir si None) avec le calque déjà appliqué : tout ce qui
+      n'est pas recouvert par la vidéo est ainsi composé une fois au lieu d'une fois par image ;
+    - la partie du calque qui chevauche la vidéo (video_box = (x0, y0, x1, y1) dans le Short),
+      seule à composer au-dessus de chaque image.
+
+    Returns:
+        tuple: (fond RGB, (calque RGBA, (x, y)) ou None si le texte ne chevauche pas la vidéo).
+    """
+    overlay = render_overlay(title, streamer_name, tuple(size))
+    if background_path:
+        base = _load_background(background_path, tuple(size))
+    else:
+        base = Image.new("RGBA", tuple(size), (0, 0, 0, 255))
+    background = Image.alpha_composite(base, overlay).convert("RGB")
+
+    x0, y0 = max(int(video_box[0]), 0), max(int(video_box[1]), 0)
+    x1, y1 = min(int(video_box[2]), size[0]), min(int(video_box[3]), size[1])
+    if x0 >= x1 or y0 >= y1:
+        return background, None
+    region = overlay.crop((x0, y0, x1, y1))
+    bbox = region.getbbox()
+    if bbox is None:
+        return background, None
+    return background, (region.crop(bbox), (x0 + bbox[0], y0 + bbox[1]))
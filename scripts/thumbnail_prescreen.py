@@ -0,0 +1,134 @@
+# scripts/thumbnail_prescreen.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from clip_dedup import DEDUP_THUMBNAIL_WORKERS, fetch_thumbnail_image, image_pixels, phash_pixels
+
+# Active le pré-filtrage des candidats sur leur miniature ("0" pour désactiver)
+PRESCREEN_THUMBNAILS = os.getenv("PRESCREEN_THUMBNAILS", "1") != "0"
+# Seuls les meilleurs candidats sont examinés (une miniature de quelques Ko chacun)
+PRESCREEN_MAX_CANDIDATES = 100
+
+# Taille d'analyse des miniatures (niveaux de gris, 16:9)
+PRESCREEN_SIZE = (160, 90)
+# Image noire : luminance moyenne (0-255) inférieure à ce seuil
+PRESCREEN_BLACK_MAX_LUMA = 20.0
+# Image unie (écran de chargement, fond uni...) : écart-type de la luminance inférieur à ce seuil
+PRESCREEN_BLANK_MAX_STD = 6.0
+# Bandes noires : une ligne/colonne de bord est « noire » si sa moyenne et son écart-type sont sous ces seuils
+PRESCREEN_BORDER_MAX_LUMA = 16.0
+PRESCREEN_BORDER_MAX_STD = 4.0
+# Part maximale de l'image occupée par des bandes noires avant rétrogradation
+PRESCREEN_LETTERBOX_MAX_FRACTION = 0.25
+# Détail minimal (gradient absolu moyen) avant rétrogradation
+PRESCREEN_MIN_DETAIL = 2.0
+
+# Verdicts : les candidats rejetés sont retirés, les candidats rétrogradés passent après les autres
+REJECT_VERDICTS = ("black", "blank")
+DEMOTE_VERDICTS = ("letterbox", "low_detail")
+VERDICT_LABELS = {
+    "black": "image noire",
+    "blank": "image unie",
+    "letterbox": "bandes noires",
+    "low_detail": "très peu de détails"
+}
+
+
+def thumbnail_metrics(images):
+    """
+    Mesures de qualité d'un lot de miniatures en niveaux de gris (tableau (N, H, W)), calculées
+    en une passe vectorisée : luminance moyenne, écart-type, part de bandes noires, détail.
+    """
+    images = np.asarray(images, dtype=np.float32)
+    n, height, width = images.shape
+    mean_luma = images.mean(axis=(1, 2))
+    contrast = images.std(axis=(1, 2))
+
+    # Lignes et colonnes sombres et uniformes, comptées depuis chaque bord tant qu'elles se suivent
+    dark_rows = (images.mean(axis=2) < PRESCREEN_BORDER_MAX_LUMA) & (images.std(axis=2) < PRESCREEN_BORDER_MAX_STD)
+    dark_cols = (images.mean(axis=1) < PRESCREEN_BORDER_MAX_LUMA) & (images.std(axis=1) < PRESCREEN_BORDER_MAX_STD)
+    top = np.cumprod(dark_rows, axis=1).sum(axis=1)
+    bottom = np.cumprod(dark_rows[:, ::-1], axis=1).sum(axis=1)
+    left = np.cumprod(dark_cols, axis=1).sum(axis=1)
+    right = np.cumprod(dark_cols[:, ::-1], axis=1).sum(axis=1)
+    content_area = np.clip(height - top - bottom, 0, None) * np.clip(width - left - right, 0, None)
+    letterbox = 1.0 - content_area / float(height * width)
+
+    detail = (np.abs(np.diff(images, axis=1)).mean(axis=(1, 2)) + np.abs(np.diff(images, axis=2)).mean(axis=(1, 2))) / 2
+    return {"mean_luma": mean_luma, "contrast": contrast, "letterbox": letterbox, "detail": detail}
+
+
+def thumbnail_verdicts(metrics):
+    """Verdict de chaque miniature à partir de thumbnail_metrics ("ok" ou une clé de VERDICT_LABELS)."""
+    conditions = [
+        metrics["mean_luma"] < PRESCREEN_BLACK_MAX_LUMA,
+        metrics["contrast"] < PRESCREEN_BLANK_MAX_STD,
+        metrics["letterbox"] > PRESCREEN_LETTERBOX_MAX_FRACTION,
+        metrics["detail"] < PRESCREEN_MIN_DETAIL
+    ]
+    return np.select(conditions, ["black", "blank", "letterbox", "low_detail"], default="ok").tolist()
+
+
+def _analysis_pixels(image):
+    return np.asarray(image.convert("L").resize(PRESCREEN_SIZE, Image.BILINEAR), dtype=np.float32)
+
+
+def check_thumbnails(clips, catalog, session=None, max_workers=DEDUP_THUMBNAIL_WORKERS):
+    """
+    Retourne {clip_id: verdict} des miniatures. Les verdicts déjà connus sont lus dans le catalogue.
+    Chaque miniature manquante n'est téléchargée qu'une fois : son verdict et son pHash
+    (utilisé par clip_dedup) sont calculés et enregistrés ensemble.
+    """
+    verdicts = {clip_id: row["verdict"] for clip_id, row in catalog.get_thumbnail_checks([clip["id"] for clip in clips]).items()}
+    missing = [clip for clip in clips if clip["id"] not in verdicts]
+    if not missing:
+        return verdicts
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail") as executor:
+        images = list(executor.map(lambda clip: fetch_thumbnail_image(clip, session), missing))
+    fetched = [(clip, image) for clip, image in zip(missing, images) if image is not None]
+    if not fetched:
+        return verdicts
+
+    metrics = thumbnail_metrics(np.stack([_analysis_pixels(image) for _, image in fetched]))
+    new_verdicts = thumbnail_verdicts(metrics)
+    hashes = phash_pixels(np.stack([image_pixels(image) for _, image in fetched]))
+    rows = []
+    for i, (clip, _) in enumerate(fetched):
+        verdicts[clip["id"]] = new_verdicts[i]
+        rows.append((clip["id"], new_verdicts[i]) + tuple(float(metrics[name][i]) for name in ("mean_luma", "contrast", "letterbox", "detail")))
+    catalog.set_thumbnail_checks(rows)
+    catalog.set_clip_hashes({clip["id"]: value for (clip, _), value in zip(fetched, hashes)}, "thumbnail")
+    return verdicts
+
+
+def prescreen_clips(clips, catalog, session=None, max_candidates=PRESCREEN_MAX_CANDIDATES):
+    """
+    Examine la miniature des `max_candidates` premiers clips (déjà triés par priorité) avant tout
+    téléchargement vidéo : les images noires ou unies sont retirées, les miniatures à bandes noires
+    ou sans détail sont rétrogradées après les autres candidats examinés (ordre conservé).
+    Les clips au-delà de max_candidates, et ceux dont la miniature est illisible, restent en place.
+    """
+    head, tail = clips[:max_candidates], clips[max_candidates:]
+    if not head:
+        return clips
+    verdicts = check_thumbnails(head, catalog, session=session)
+
+    kept, demoted = [], []
+    counts = {}
+    for clip in head:
+        verdict = verdicts.get(clip["id"], "ok")
+        if verdict in REJECT_VERDICTS or verdict in DEMOTE_VERDICTS:
+            counts[verdict] = counts.get(verdict, 0) + 1
+        if verdict in REJECT_VERDICTS:
+            continue
+        (demoted if verdict in DEMOTE_VERDICTS else kept).append(clip)
+
+    if counts:
+        rejected = sum(counts.get(verdict, 0) for verdict in REJECT_VERDICTS)
+        details = ", ".join(f"{VERDICT_LABELS[verdict]} : {count}" for verdict, count in counts.items())
+        print(f"🖼️ Pré-filtrage des miniatures : {rejected} clip(s) rejeté(s), {len(demoted)} rétrogradé(s) ({details}).")
+    return kept + demoted + tail
@@ -0,0 +1,219 @@
+# scripts/view_velocity.py
+import os
+import threading
+import time
+
+import numpy as np
+
+from clip_record import ClipBatch
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+# Historique des compteurs de vues, stocké en colonnes (3 tableaux NumPy compressés)
+VIEW_SNAPSHOTS_FILE = os.path.join(DATA_DIR, 'view_snapshots.npz')
+
+# Durée de conservation des relevés de vues
+SNAPSHOT_RETENTION_SECONDS = 14 * 24 * 3600
+# Âge minimal (en heures) utilisé pour le calcul des vues/heure (évite qu'un clip de 2 minutes
+# avec 10 vues ne passe devant tout le monde)
+VELOCITY_MIN_AGE_HOURS = 1.0
+# Écart minimal entre deux relevés pour mesurer une vitesse récente
+VELOCITY_MIN_SNAPSHOT_GAP_SECONDS = 15 * 60
+# Poids de l'accélération (vues/heure gagnées récemment) dans le score final
+VELOCITY_ACCELERATION_WEIGHT = 0.5
+
+
+class ViewSnapshotStore:
+    """
+    Relevés horodatés des compteurs de vues, stockés en colonnes :
+    - clip_keys : identifiants des clips (un seul exemplaire par clip),
+    - snap_clip : index du clip (uint32), snap_ts : timestamp (uint32), snap_views : vues (uint32).
+
+    Un relevé coûte 12 octets ; plusieurs jours d'historique tiennent en quelques Mo.
+    record() est thread-safe (appelé depuis les threads de découverte) et ne fait qu'accumuler ;
+    les relevés sont intégrés aux colonnes en un seul bloc lors de flush().
+    """
+
+    def __init__(self, path=VIEW_SNAPSHOTS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending_ids = []
+        self._pending_ts = []
+        self._pending_views = []
+        self.clip_keys = np.empty(0, dtype=str)
+        self.snap_clip = np.empty(0, dtype=np.uint32)
+        self.snap_ts = np.empty(0, dtype=np.uint32)
+        self.snap_views = np.empty(0, dtype=np.uint32)
+        self._key_index = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                self.clip_keys = data["clip_keys"]
+                self.snap_clip = data["snap_clip"].astype(np.uint32)
+                self.snap_ts = data["snap_ts"].astype(np.uint32)
+                self.snap_views = data["snap_views"].astype(np.uint32)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Historique des vues illisible ({e}). Un nouvel historique sera créé.")
+            return
+        self._key_index = {key: i for i, key in enumerate(self.clip_keys.tolist())}
+
+    def record(self, clips, timestamp=None):
+        """Enregistre le compteur de vues actuel de chaque clip."""
+        ts = int(timestamp if timestamp is not None else time.time())
+        with self._lock:
+            for clip in clips:
+                self._pending_ids.append(clip["id"])
+                self._pending_ts.append(ts)
+                self._pending_views.append(clip.get("viewer_count", 0) or 0)
+
+    def flush(self):
+        """Intègre les relevés en attente aux colonnes (un relevé par clip et par timestamp)."""
+        with self._lock:
+            if not self._pending_ids:
+                return
+            ids, ts, views = self._pending_ids, self._pending_ts, self._pending_views
+            self._pending_ids, self._pending_ts, self._pending_views = [], [], []
+
+            new_keys = [clip_id for clip_id in dict.fromkeys(ids) if clip_id not in self._key_index]
+            for clip_id in new_keys:
+                self._key_index[clip_id] = len(self._key_index)
+            if new_keys:
+                self.clip_keys = np.concatenate([self.clip_keys, np.array(new_keys)])
+
+            clip_idx = np.fromiter((self._key_index[clip_id] for clip_id in ids), dtype=np.uint32, count=len(ids))
+            snap_clip = np.concatenate([self.snap_clip, clip_idx])
+            snap_ts = np.concatenate([self.snap_ts, np.asarray(ts, dtype=np.uint32)])
+            snap_views = np.concatenate([self.snap_views, np.asarray(views, dtype=np.uint32)])
+
+            # Un même clip peut être vu par plusieurs sources pendant la même exécution :
+            # on garde un seul relevé par (clip, timestamp), avec le compteur le plus élevé.
+            order = np.lexsort((snap_views, snap_ts, snap_clip))
+            snap_clip, snap_ts, snap_views = snap_clip[order], snap_ts[order], snap_views[order]
+            last_of_group = np.ones(len(snap_clip), dtype=bool)
+            last_of_group[:-1] = (snap_clip[1:] != snap_clip[:-1]) | (snap_ts[1:] != snap_ts[:-1])
+            self.snap_clip = snap_clip[last_of_group]
+            self.snap_ts = snap_ts[last_of_group]
+            self.snap_views = snap_views[last_of_group]
+
+    def prune(self, max_age_seconds=SNAPSHOT_RETENTION_SECONDS, now=None):
+        """Supprime les relevés trop anciens et les clips qui n'ont plus aucun relevé."""
+        self.flush()
+        now = int(now if now is not None else time.time())
+        with self._lock:
+            keep = self.snap_ts.astype(np.int64) >= now - max_age_seconds
+            snap_clip = self.snap_clip[keep]
+            used, remapped = np.unique(snap_clip, return_inverse=True)
+            self.clip_keys = self.clip_keys[used] if len(used) else np.empty(0, dtype=str)
+            self.snap_clip = remapped.astype(np.uint32)
+            self.snap_ts = self.snap_ts[keep]
+            self.snap_views = self.snap_views[keep]
+            self._key_index = {key: i for i, key in enumerate(self.clip_keys.tolist())}
+
+    def save(self):
+        """Sauvegarde atomique de l'historique (npz compressé)."""
+        self.flush()
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + '.tmp.npz'
+                np.savez_compressed(tmp_path, clip_keys=self.clip_keys, snap_clip=self.snap_clip,
+                                    snap_ts=self.snap_ts, snap_views=self.snap_views)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Impossible de sauvegarder l'historique des vues : {e}")
+
+    def __len__(self):
+        return len(self.snap_ts)
+
+    def previous_snapshots(self, clip_ids, before_ts):
+        """
+        Pour chaque clip demandé, retourne le relevé le plus récent antérieur ou égal à before_ts
+        (un scalaire ou un tableau aligné sur clip_ids).
+        Retourne (ts, views) en tableaux float64 ; NaN pour les clips sans relevé assez ancien.
+        """
+        self.flush()
+        n = len(clip_ids)
+        prev_ts = np.full(n, np.nan)
+        prev_views = np.full(n, np.nan)
+        if not len(self.snap_ts) or not n:
+            return prev_ts, prev_views
+
+        # Clé combinée (clip << 32 | ts) : une seule recherche dichotomique par clip demandé,
+        # avec un seuil propre à chaque clip.
+        keys = (self.snap_clip.astype(np.int64) << 32) | self.snap_ts.astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+
+        query_idx = np.fromiter((self._key_index.get(clip_id, -1) for clip_id in clip_ids), dtype=np.int64, count=n)
+        thresholds = np.clip(np.broadcast_to(np.asarray(before_ts, dtype=np.float64), (n,)), 0, 2 ** 32 - 1).astype(np.int64)
+        pos = np.searchsorted(keys, (np.maximum(query_idx, 0) << 32) | thresholds, side='right') - 1
+        pos_clipped = np.maximum(pos, 0)
+        found = (query_idx >= 0) & (pos >= 0) & ((keys[pos_clipped] >> 32) == query_idx)
+        source = order[pos_clipped[found]]
+        prev_ts[found] = self.snap_ts[source]
+        prev_views[found] = self.snap_views[source]
+        return prev_ts, prev_views
+
+
+def compute_velocity_scores(clips, store, now=None):
+    """
+    Calcule en une passe vectorisée, pour tous les candidats :
+    - vues/heure entre created_at et le dernier relevé du clip (âge plancher VELOCITY_MIN_AGE_HOURS),
+    - accélération : vitesse entre le relevé précédent (au moins VELOCITY_MIN_SNAPSHOT_GAP_SECONDS
+      plus tôt) et le dernier relevé, moins la vitesse moyenne jusqu'au relevé précédent
+      (0 sans historique).
+    Le dernier relevé sert de date d'observation : un candidat que la découverte incrémentale
+    n'a pas réinterrogé n'est pas pénalisé par un compteur de vues ancien.
+    Retourne (score, vues_par_heure, acceleration, mesure) en tableaux NumPy alignés sur `clips` ;
+    mesure est vrai pour les clips qui ont au moins deux relevés assez espacés.
+    """
+    now = int(now if now is not None else time.time())
+    batch = clips if isinstance(clips, ClipBatch) else ClipBatch(clips)
+    n = len(batch)
+    clip_ids = batch.ids.tolist()
+    views = batch.views.astype(np.float64)
+    created = batch.created_ts.astype(np.float64)
+
+    obs_ts, obs_views = store.previous_snapshots(clip_ids, now)
+    observed = ~np.isnan(obs_ts)
+    obs_ts = np.where(observed, obs_ts, now)
+    views = np.where(observed, np.fmax(obs_views, views), views)
+    created = np.where(created > 0, created, obs_ts)
+
+    age_hours = np.maximum((obs_ts - created) / 3600.0, VELOCITY_MIN_AGE_HOURS)
+    views_per_hour = views / age_hours
+
+    prev_ts, prev_views = store.previous_snapshots(clip_ids, obs_ts - VELOCITY_MIN_SNAPSHOT_GAP_SECONDS)
+    has_history = ~np.isnan(prev_ts)
+    acceleration = np.zeros(n)
+    if has_history.any():
+        gap_hours = (obs_ts[has_history] - prev_ts[has_history]) / 3600.0
+        recent_rate = (views[has_history] - prev_views[has_history]) / gap_hours
+        prev_age_hours = np.maximum((prev_ts[has_history] - created[has_history]) / 3600.0, VELOCITY_MIN_AGE_HOURS)
+        previous_rate = prev_views[has_history] / prev_age_hours
+        acceleration[has_history] = recent_rate - previous_rate
+
+    score = views_per_hour + VELOCITY_ACCELERATION_WEIGHT * acceleration
+    return score, views_per_hour, acceleration, has_history
+
+
+def rank_by_velocity(clips, store, now=None):
+    """
+    Trie les clips par vitesse, en partant du classement par vues : tant qu'un clip n'a pas deux
+    relevés (vitesse mesurée), il garde sa place dans le classement par vues. Les places des clips
+    mesurés sont redistribuées entre eux par score de vitesse décroissant (à score égal : vues,
+    puis id). Sans historique (premier démarrage), le classement est donc celui par vues : le score
+    vues/âge seul favoriserait les clips très récents et encore peu vus.
+    """
+    if not clips:
+        return []
+    batch = ClipBatch(clips)
+    score, _, _, measured = compute_velocity_scores(batch, store, now=now)
+    order = batch.order_by_views()
+    measured_slots = measured[order]
+    by_velocity = np.lexsort((batch.ids, -batch.views, -score))
+    order[measured_slots] = by_velocity[measured[by_velocity]]
+    return batch.select(order)
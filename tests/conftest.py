@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Les modules de scripts/ s'importent entre eux par leur nom (comme depuis main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
@@ -0,0 +1,171 @@
+# tests/test_clip_catalog.py
+import sqlite3
+
+import pytest
+
+import get_top_clips
+from clip_catalog import ClipCatalog
+
+
+def make_clip(clip_id, views, created_at="2026-10-16T12:00:00Z", duration=30.0, language="fr", **fields):
+    clip = {"id": clip_id, "url": f"https://clips.twitch.tv/{clip_id}", "title": clip_id, "viewer_count": views,
+            "broadcaster_id": "b1", "broadcaster_name": "Streamer", "created_at": created_at,
+            "duration": duration, "language": language}
+    clip.update(fields)
+    return clip
+
+
+@pytest.fixture
+def catalog():
+    catalog = ClipCatalog(":memory:")
+    yield catalog
+    catalog.close()
+
+
+def select(catalog, exclude_ids=()):
+    return [clip["id"] for clip in catalog.select_eligible_clips(10, "fr", 15, 180, "2026-10-16T00:00:00Z", exclude_ids)]
+
+
+def test_selection_filters_and_orders_by_views(catalog):
+    catalog.upsert_clips([
+        make_clip("a", 100), make_clip("b", 300), make_clip("c", 200),
+        make_clip("short", 999, duration=5), make_clip("en", 999, language="en"),
+        make_clip("old", 999, created_at="2026-10-10T00:00:00Z"),
+    ])
+    assert select(catalog) == ["b", "c", "a"]
+
+
+def test_upsert_keeps_highest_view_count(catalog):
+    catalog.upsert_clips([make_clip("a", 500)])
+    catalog.upsert_clips([make_clip("a", 100, title="nouveau titre")])
+    clip = catalog.get_clip("a")
+    assert clip["viewer_count"] == 500
+    assert clip["title"] == "nouveau titre"
+
+
+def test_published_clips_are_excluded_by_column(catalog):
+    catalog.upsert_clips([make_clip("a", 100), make_clip("b", 200)])
+    catalog.mark_published("b", "yt_b")
+    assert select(catalog) == ["a"]
+    assert select(catalog, exclude_ids={"a"}) == []
+
+
+def test_drop_published_backfills_catalog_from_history(catalog):
+    catalog.upsert_clips([make_clip("a", 100), make_clip("b", 200)])
+    history = {"b"}
+    assert [clip["id"] for clip in get_top_clips._drop_published(catalog.select_eligible_clips(
+        10, "fr", 15, 180, "2026-10-16T00:00:00Z"), catalog, history)] == ["a"]
+    # Marqué publié dans le catalogue : l'historique n'est plus nécessaire
+    assert select(catalog) == ["a"]
+
+
+def test_prune_keeps_published_clips(catalog):
+    catalog.upsert_clips([make_clip("old", 1, created_at="2026-01-01T00:00:00Z"),
+                          make_clip("old_published", 1, created_at="2026-01-01T00:00:00Z"),
+                          make_clip("recent", 1)])
+    catalog.mark_published("old_published", "yt")
+    assert catalog.prune("2026-06-01T00:00:00Z") == 1
+    assert catalog.count_clips() == 2
+
+
+def test_prune_deletes_dependent_rows_of_pruned_clips(catalog):
+    catalog.upsert_clips([make_clip("old", 1, created_at="2026-01-01T00:00:00Z"), make_clip("recent", 1)])
+    for clip_id in ("old", "recent"):
+        catalog.start_attempt(clip_id)
+        catalog.set_clip_hashes({clip_id: 42}, "thumbnail")
+        catalog.set_thumbnail_checks([(clip_id, "ok", 100.0, 50.0, 0.0, 10.0)])
+    catalog.prune("2026-06-01T00:00:00Z")
+    assert catalog.get_pipeline_state("old") is None
+    assert catalog.get_pipeline_state("recent") is not None
+    assert catalog.get_clip_hashes(["old", "recent"], "thumbnail") == {"recent": 42}
+    assert list(catalog.get_thumbnail_checks(["old", "recent"])) == ["recent"]
+
+
+def test_clip_hashes_roundtrip_unsigned_64_bits(catalog):
+    catalog.set_clip_hashes({"a": (1 << 64) - 1, "b": 42}, "thumbnail")
+    catalog.set_clip_hashes({"a": [1 << 63, 7]}, "frame")
+    assert catalog.get_clip_hashes(["a", "b", "c"], "thumbnail") == {"a": (1 << 64) - 1, "b": 42}
+    assert catalog.get_clip_hashes(["a"], "frame") == {"a": [1 << 63, 7]}
+
+
+def test_source_state_upsert(catalog):
+    catalog.set_source_state("game_id:1", "2026-10-16T00:00:00Z", "2026-10-15T00:00:00Z")
+    catalog.set_source_state("game_id:1", "2026-10-17T00:00:00Z", "2026-10-15T00:00:00Z")
+    assert catalog.get_source_states() == {
+        "game_id:1": {"high_water_mark": "2026-10-17T00:00:00Z", "last_full_refresh": "2026-10-15T00:00:00Z"}}
+
+
+def pipeline_updated_at(catalog, clip_id, value=None):
+    """Lit (ou force, pour simuler une exécution ancienne) la date de dernière progression du clip."""
+    if value is not None:
+        catalog._conn.execute("UPDATE clip_pipeline SET updated_at = ? WHERE clip_id = ?", (value, clip_id))
+    return catalog.get_pipeline_state(clip_id)["updated_at"]
+
+
+def test_attempts_are_counted_per_run(catalog):
+    assert catalog.start_attempt("a")["attempts"] == 1
+    state = catalog.start_attempt("a")
+    assert (state["stage"], state["attempts"]) == ("discovered", 2)
+
+
+def test_updated_at_only_moves_when_stage_advances(catalog):
+    catalog.start_attempt("a")
+    catalog.set_pipeline_stage("a", "downloaded", raw_path="a.mp4")
+    pipeline_updated_at(catalog, "a", "2026-01-01T00:00:00Z")
+    catalog.set_pipeline_stage("a", "downloaded", raw_path="a.mp4")
+    catalog.record_pipeline_error("a", "échec de l'upload YouTube")
+    state = catalog.get_pipeline_state("a")
+    assert state["updated_at"] == "2026-01-01T00:00:00Z"
+    assert state["last_error"] == "échec de l'upload YouTube"
+    catalog.set_pipeline_stage("a", "rendered", render_path="r.mp4")
+    assert pipeline_updated_at(catalog, "a") > "2026-01-01T00:00:00Z"
+
+
+def test_resumable_clips_skip_stale_terminal_and_exhausted_clips(catalog):
+    catalog.upsert_clips([make_clip(clip_id, 1) for clip_id in ("rendered", "downloaded", "stale", "dup", "tired")])
+    for clip_id in ("rendered", "downloaded", "stale", "dup", "tired"):
+        catalog.start_attempt(clip_id)
+        catalog.set_pipeline_stage(clip_id, "downloaded")
+    catalog.set_pipeline_stage("rendered", "rendered")
+    pipeline_updated_at(catalog, "stale", "2026-01-01T00:00:00Z")
+    catalog.set_pipeline_stage("dup", "skipped", last_error="quasi-doublon")
+    for _ in range(2):
+        catalog.start_attempt("tired")
+    resumable = [clip["id"] for clip in catalog.resumable_clips("2026-06-01T00:00:00Z", max_attempts=3)]
+    assert resumable == ["rendered", "downloaded"]
+
+
+def test_terminal_clips_are_not_selected_again(catalog):
+    catalog.upsert_clips([make_clip("a", 100), make_clip("b", 200), make_clip("c", 300)])
+    catalog.set_pipeline_stage("b", "skipped")
+    catalog.set_pipeline_stage("c", "failed")
+    assert select(catalog) == ["a"]
+
+
+def test_unknown_stage_or_field_is_rejected(catalog):
+    with pytest.raises(ValueError):
+        catalog.set_pipeline_stage("a", "published")
+    with pytest.raises(ValueError):
+        catalog.set_pipeline_stage("a", "downloaded", size=3)
+
+
+def test_adds_pipeline_columns_to_an_old_catalog(tmp_path):
+    path = str(tmp_path / "catalog.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE clip_pipeline (clip_id TEXT PRIMARY KEY, stage TEXT NOT NULL, raw_path TEXT, "
+                 "render_path TEXT, render_key TEXT, youtube_id TEXT, updated_at TEXT NOT NULL)")
+    conn.execute("INSERT INTO clip_pipeline (clip_id, stage, updated_at) VALUES ('a', 'downloaded', '2026-01-01T00:00:00Z')")
+    conn.commit()
+    conn.close()
+    catalog = ClipCatalog(path)
+    try:
+        assert catalog.start_attempt("a")["attempts"] == 1
+    finally:
+        catalog.close()
+
+
+def test_context_manager_closes_connection(tmp_path):
+    with ClipCatalog(str(tmp_path / "catalog.sqlite3")) as catalog:
+        catalog.upsert_clips([make_clip("a", 10)])
+    with pytest.raises(sqlite3.ProgrammingError):
+        catalog.get_pipeline_state("a")
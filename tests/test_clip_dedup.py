@@ -0,0 +1,107 @@
+# tests/test_clip_dedup.py
+import io
+import random
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import clip_dedup
+from clip_catalog import ClipCatalog
+from clip_dedup import MultiIndexHash, NearDuplicateIndex, hamming_distance, image_pixels, is_same_moment, phash_pixels
+
+
+def thumbnail(seed, quality):
+    """Miniature 480x272 (formes aléatoires) réencodée en JPEG à la qualité donnée."""
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", (480, 272), tuple(int(c) for c in rng.integers(0, 255, 3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.integers(0, 440), rng.integers(0, 232)
+        w, h = rng.integers(20, 200, 2)
+        draw.rectangle((x, y, x + w, y + h), fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def test_phash_is_stable_under_reencoding_and_differs_between_images():
+    pixels = [image_pixels(thumbnail(seed, quality)) for seed, quality in ((0, 95), (0, 40), (1, 95))]
+    original, reencoded, other = phash_pixels(np.stack(pixels))
+    assert hamming_distance(original, reencoded) <= clip_dedup.DEDUP_MAX_HAMMING_DISTANCE
+    assert hamming_distance(original, other) > 16
+
+
+def test_multi_index_search_matches_linear_scan():
+    rng = random.Random(1)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    values += [value ^ (1 << rng.randrange(64)) for value in values[:50]]  # Voisins à 1 bit
+    values += [value ^ sum(1 << bit for bit in rng.sample(range(64), 6)) for value in values[:50]]  # À 6 bits
+    index = MultiIndexHash(6)
+    for i, value in enumerate(values):
+        index.add(value, i)
+    assert len(index) == len(values)
+    for query in values[:60]:
+        expected = sorted(i for i, value in enumerate(values) if hamming_distance(query, value) <= 6)
+        assert sorted(item for _, item in index.search(query, 6)) == expected
+    with pytest.raises(ValueError):
+        index.search(values[0], 7)
+
+
+def test_multi_index_examines_only_hashes_sharing_a_chunk():
+    rng = random.Random(2)
+    index = MultiIndexHash(6)
+    for i in range(5000):
+        index.add(rng.getrandbits(64), i)
+    query = rng.getrandbits(64)
+    index.add(query ^ 0b101, "voisin")
+    index.examined = 0
+    assert [item for _, item in index.search(query)] == ["voisin"]
+    # Tranches de 9-10 bits : ~5000 x 7 / 512 empreintes partagent une tranche par hasard, loin des 5001 d'un parcours linéaire
+    assert index.examined < 200
+
+
+def clip(clip_id, created_at="2026-10-16T12:00:00Z", broadcaster_id="b1", video_id=None, vod_offset=None):
+    return {"id": clip_id, "broadcaster_id": broadcaster_id, "created_at": created_at,
+            "video_id": video_id, "vod_offset": vod_offset}
+
+
+@pytest.mark.parametrize("other, expected", [
+    (clip("b", "2026-10-16T12:05:00Z"), True),
+    (clip("b", "2026-10-16T14:00:00Z"), False),  # Même streamer, même journée : moment différent
+    (clip("b", "2026-10-16T12:01:00Z", broadcaster_id="b2"), False),
+    (clip("b", created_at=None), False),
+])
+def test_same_moment_by_creation_date(other, expected):
+    assert is_same_moment(clip("a"), other) is expected
+
+
+def test_same_moment_prefers_vod_offset():
+    a = clip("a", video_id="v1", vod_offset=3600)
+    assert is_same_moment(a, clip("b", "2026-10-16T18:00:00Z", video_id="v1", vod_offset=3630))
+    assert not is_same_moment(a, clip("b", "2026-10-16T12:01:00Z", video_id="v1", vod_offset=4000))
+    assert not is_same_moment(a, clip("b", video_id="v2", vod_offset=3600))
+
+
+def test_index_ignores_the_clip_itself_and_other_moments():
+    index = NearDuplicateIndex(max_distance=6)
+    index.add(clip("a"), 0b1111)
+    index.add(clip("later", "2026-10-16T20:00:00Z"), 0b1111)
+    assert index.matches(clip("a"), 0b1111) == []
+    assert [other["id"] for other in index.matches(clip("b", "2026-10-16T12:03:00Z"), 0b1011)] == ["a"]
+
+
+def test_filter_near_duplicates_keeps_best_ranked_and_skips_published(monkeypatch):
+    catalog = ClipCatalog(":memory:")
+    try:
+        catalog.upsert_clips([dict(clip("published"), language="fr", duration=30)])
+        catalog.mark_published("published", "yt")
+        catalog.set_clip_hashes({"published": 0xFF00}, "thumbnail")
+        hashes = {"best": 0x1234, "copy": 0x1235, "republished": 0xFF01, "other": 0xABCDEF}
+        monkeypatch.setattr(clip_dedup, "fetch_thumbnail_hash", lambda c, session=None: hashes[c["id"]])
+        clips = [clip(clip_id, "2026-10-16T12:02:00Z") for clip_id in ("best", "copy", "republished")]
+        clips.append(clip("other", "2026-10-16T18:00:00Z"))
+        kept = clip_dedup.filter_near_duplicates(clips, catalog)
+        assert [c["id"] for c in kept] == ["best", "other"]
+    finally:
+        catalog.close()
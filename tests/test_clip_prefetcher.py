@@ -0,0 +1,90 @@
+# tests/test_clip_prefetcher.py
+import threading
+
+import pytest
+
+import clip_prefetcher
+import download_clip
+
+
+class UnpinRecorder:
+    def __init__(self):
+        self.unpinned = []
+
+    def unpin(self, clip_id):
+        self.unpinned.append(clip_id)
+
+
+unpinned_cache = UnpinRecorder()
+
+
+@pytest.fixture
+def fake_download(tmp_path, monkeypatch):
+    """Téléchargements simulés : écrit un petit fichier, ou bloque jusqu'à l'annulation pour les clips 'slow'."""
+    calls = []
+
+    def download_twitch_clip(url, output_path, cancel_event=None, **kwargs):
+        calls.append(kwargs.get("clip_id"))
+        if "slow" in url:
+            cancel_event.wait(5)
+            return None
+        with open(output_path, "wb") as f:
+            f.write(b"x" * 10)
+        return output_path
+
+    monkeypatch.setattr(clip_prefetcher, "raw_clip_path", lambda clip_id: str(tmp_path / f"{clip_id}.mp4"))
+    monkeypatch.setattr(download_clip, "download_twitch_clip", download_twitch_clip)
+    monkeypatch.setattr(clip_prefetcher, "get_source_cache", lambda: unpinned_cache)
+    return calls
+
+
+def make_clips(*ids):
+    return [{"id": clip_id, "url": f"https://clips.twitch.tv/{clip_id}"} for clip_id in ids]
+
+
+def test_prefetches_ahead_and_hands_files_to_claim(fake_download, tmp_path):
+    clips = make_clips("a", "b", "c")
+    with clip_prefetcher.ClipPrefetcher(clips, should_prefetch=lambda clip: True, depth=2) as prefetcher:
+        assert prefetcher.claim(clips[0]) == str(tmp_path / "a.mp4")
+        assert prefetcher.claim(clips[1]) == str(tmp_path / "b.mp4")
+    assert prefetcher.stats["used"] == 2
+    assert fake_download[:2] == ["a", "b"]
+
+
+def test_should_prefetch_false_leaves_download_to_main_loop(fake_download):
+    clips = make_clips("a", "b")
+    with clip_prefetcher.ClipPrefetcher(clips, should_prefetch=lambda clip: clip["id"] != "a") as prefetcher:
+        assert prefetcher.claim(clips[0]) is None
+        assert prefetcher.claim(clips[1]) is not None
+    assert "a" not in fake_download
+
+
+def test_exception_in_block_stops_thread_and_removes_partial_download(fake_download, tmp_path):
+    clips = make_clips("slow")
+    (tmp_path / "slow.mp4.part").write_bytes(b"partial")
+    with pytest.raises(RuntimeError):
+        with clip_prefetcher.ClipPrefetcher(clips, should_prefetch=lambda clip: True) as prefetcher:
+            while not fake_download:
+                threading.Event().wait(0.01)
+            raise RuntimeError("échec du rendu")
+    assert not prefetcher._thread.is_alive()
+    assert prefetcher.stats["cancelled"] == 1
+    assert not (tmp_path / "slow.mp4.part").exists()
+
+
+def test_depth_zero_starts_no_thread(fake_download):
+    with clip_prefetcher.ClipPrefetcher(make_clips("a"), should_prefetch=lambda clip: True, depth=0) as prefetcher:
+        assert prefetcher.claim({"id": "a"}) is None
+    assert prefetcher._thread is None
+    assert fake_download == []
+
+
+def test_cancel_unpins_prefetched_clips_never_claimed(fake_download):
+    unpinned_cache.unpinned.clear()
+    clips = make_clips("a", "b", "c")
+    with clip_prefetcher.ClipPrefetcher(clips, should_prefetch=lambda clip: True, depth=2) as prefetcher:
+        prefetcher.claim(clips[0])
+        while prefetcher.stats["prefetched"] < 3:
+            threading.Event().wait(0.01)
+    # "a" est pris par la boucle principale (qui le libère après son rendu) ; "b" et "c" redeviennent évinçables
+    assert sorted(unpinned_cache.unpinned) == ["b", "c"]
@@ -0,0 +1,166 @@
+# tests/test_discovery.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import get_top_clips
+from clip_catalog import ClipCatalog
+from clip_record import ClipRecord
+from get_top_clips import TopKClips
+
+
+def helix_clip(clip_id, views, created_at=None, duration=30.0, language="fr"):
+    created_at = created_at or get_top_clips._format_helix_date(datetime.now(timezone.utc) - timedelta(hours=1))
+    return ClipRecord.from_helix({"id": clip_id, "url": f"https://clips.twitch.tv/{clip_id}", "title": clip_id,
+                                  "view_count": views, "broadcaster_id": "b1", "broadcaster_name": "Streamer",
+                                  "created_at": created_at, "duration": duration, "language": language})
+
+
+def ids(clips):
+    return [clip["id"] for clip in clips]
+
+
+# --- Top-K ---
+
+def test_top_k_keeps_best_clips_in_view_order():
+    top = TopKClips(3)
+    for clip_id, views in [("a", 10), ("b", 50), ("c", 30), ("d", 40), ("e", 5)]:
+        top.offer({"id": clip_id, "viewer_count": views})
+    assert ids(top.sorted_clips()) == ["b", "d", "c"]
+    assert len(top) == 3
+
+
+def test_top_k_keeps_highest_view_count_of_duplicates():
+    top = TopKClips(2)
+    assert top.offer({"id": "a", "viewer_count": 10})
+    assert top.offer({"id": "a", "viewer_count": 25})
+    assert not top.offer({"id": "a", "viewer_count": 20})
+    top.offer({"id": "b", "viewer_count": 15})
+    top.offer({"id": "c", "viewer_count": 12})
+    assert [(clip["id"], clip["viewer_count"]) for clip in top.sorted_clips()] == [("a", 25), ("b", 15)]
+
+
+def test_top_k_result_does_not_depend_on_arrival_order():
+    clips = [{"id": f"c{i}", "viewer_count": (i * 37) % 11} for i in range(30)]
+    first, second = TopKClips(5), TopKClips(5)
+    for clip in clips:
+        first.offer(clip)
+    for clip in reversed(clips):
+        second.offer(clip)
+    assert ids(first.sorted_clips()) == ids(second.sorted_clips())
+
+
+def test_cannot_beat_only_when_full():
+    top = TopKClips(2)
+    top.offer({"id": "a", "viewer_count": 10})
+    assert not top.cannot_beat(0)
+    top.offer({"id": "b", "viewer_count": 20})
+    assert top.cannot_beat(9)
+    assert not top.cannot_beat(10)
+
+
+@pytest.fixture
+def catalog():
+    catalog = ClipCatalog(":memory:")
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def helix_pages(monkeypatch):
+    """Source unique (un jeu) dont les pages Helix sont servies depuis `pages` ; les requêtes sont relevées."""
+    pages = []
+    requests_made = []
+
+    def request_clips(access_token, params, source_type, source_id, session=None):
+        requests_made.append(dict(params))
+        page = int(params.get("after", 0))
+        cursor = str(page + 1) if page + 1 < len(pages) else None
+        return pages[page], True, cursor
+
+    monkeypatch.setattr(get_top_clips, "_request_clips", request_clips)
+    monkeypatch.setattr(get_top_clips, "resolve_broadcaster_ids", lambda *args, **kwargs: [])
+    monkeypatch.setattr(get_top_clips, "GAME_IDS", ["g1"])
+    return pages, requests_made
+
+
+def test_pagination_stops_when_page_cannot_beat_top_k(catalog, helix_pages):
+    pages, requests_made = helix_pages
+    pages += [[helix_clip("a", 100), helix_clip("b", 90)],
+              [helix_clip("c", 80), helix_clip("d", 70)],
+              [helix_clip("e", 60), helix_clip("f", 50)]]
+    get_top_clips.discover_clips("token", catalog, max_workers=1, max_candidates=2)
+    # Après la 2e page, le dernier clip (70 vues) ne peut plus battre le 2e candidat (90 vues)
+    assert len(requests_made) == 2
+
+
+def test_known_candidates_set_the_threshold_from_the_first_page(catalog, helix_pages):
+    pages, requests_made = helix_pages
+    catalog.upsert_clips([helix_clip("known1", 1000), helix_clip("known2", 900)])
+    pages += [[helix_clip("a", 100), helix_clip("b", 90)], [helix_clip("c", 80)]]
+    get_top_clips.discover_clips("token", catalog, max_workers=1, max_candidates=2)
+    assert len(requests_made) == 1
+
+
+def test_ineligible_and_published_clips_do_not_fill_the_top_k(catalog, helix_pages):
+    pages, requests_made = helix_pages
+    pages += [[helix_clip("long", 500, duration=600.0), helix_clip("en", 400, language="en"),
+               helix_clip("published", 300)],
+              [helix_clip("a", 100), helix_clip("b", 90)]]
+    get_top_clips.discover_clips("token", catalog, max_workers=1, max_candidates=2,
+                                 already_published_clip_ids={"published"})
+    assert len(requests_made) == 2
+
+
+# --- Fenêtres incrémentales ---
+
+END = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+START = END - timedelta(days=1)
+
+
+def state(high_water_mark, last_full_refresh):
+    return {"high_water_mark": get_top_clips._format_helix_date(high_water_mark),
+            "last_full_refresh": get_top_clips._format_helix_date(last_full_refresh)}
+
+
+def test_unknown_or_corrupt_source_gets_full_window():
+    assert get_top_clips._discovery_window_start(None, START, END) == (START, True)
+    assert get_top_clips._discovery_window_start({"high_water_mark": "hier"}, START, END) == (START, True)
+
+
+def test_recent_source_resumes_from_high_water_mark_with_overlap():
+    source_state = state(END - timedelta(hours=1), END - timedelta(hours=2))
+    window_start, full_window = get_top_clips._discovery_window_start(source_state, START, END)
+    assert not full_window
+    assert window_start == END - timedelta(hours=1, seconds=get_top_clips.DISCOVERY_OVERLAP_SECONDS)
+
+
+@pytest.mark.parametrize("high_water_mark, last_full_refresh", [
+    (END - timedelta(hours=1), END - timedelta(seconds=get_top_clips.DISCOVERY_FULL_REFRESH_SECONDS + 1)),
+    (START - timedelta(hours=1), END - timedelta(hours=1)),  # Dernier passage hors de la fenêtre
+    (END + timedelta(hours=1), END - timedelta(hours=1)),    # Horloge incohérente
+])
+def test_stale_source_gets_full_window(high_water_mark, last_full_refresh):
+    assert get_top_clips._discovery_window_start(state(high_water_mark, last_full_refresh), START, END) == (START, True)
+
+
+def test_second_run_only_asks_for_new_clips(catalog, helix_pages):
+    pages, requests_made = helix_pages
+    pages += [[helix_clip("a", 100)]]
+    get_top_clips.discover_clips("token", catalog, max_workers=1)
+    first_start = get_top_clips._parse_helix_date(requests_made[0]["started_at"])
+    high_water_mark = catalog.get_source_states()["game_id:g1"]["high_water_mark"]
+
+    get_top_clips.discover_clips("token", catalog, max_workers=1)
+    second_start = get_top_clips._parse_helix_date(requests_made[1]["started_at"])
+    assert second_start > first_start
+    assert second_start == get_top_clips._parse_helix_date(high_water_mark) \
+        - timedelta(seconds=get_top_clips.DISCOVERY_OVERLAP_SECONDS)
+
+
+def test_failed_source_keeps_its_window(catalog, monkeypatch):
+    monkeypatch.setattr(get_top_clips, "_request_clips", lambda *args, **kwargs: ([], False, None))
+    monkeypatch.setattr(get_top_clips, "resolve_broadcaster_ids", lambda *args, **kwargs: [])
+    monkeypatch.setattr(get_top_clips, "GAME_IDS", ["g1"])
+    get_top_clips.discover_clips("token", catalog, max_workers=1)
+    assert catalog.get_source_states() == {}
@@ -0,0 +1,52 @@
+# tests/test_download_clip.py
+import pytest
+
+import download_clip
+from download_clip import select_rendition
+
+
+def fmt(height, fps=60, format_id=None, **fields):
+    entry = {"format_id": format_id or f"{height}p{fps}", "height": height, "fps": fps, "ext": "mp4",
+             "vcodec": "avc1", "acodec": "mp4a"}
+    entry.update(fields)
+    return entry
+
+
+TWITCH_FORMATS = [fmt(360, 30), fmt(480, 30), fmt(720, 60), fmt(1080, 60), fmt(1080, 30, format_id="1080p30")]
+
+
+def test_smallest_sufficient_rendition_at_best_frame_rate():
+    chosen, best = select_rendition(TWITCH_FORMATS, display_width=1280)
+    assert chosen["format_id"] == "720p60"
+    assert best["format_id"] == "1080p60"
+
+
+def test_upscale_allowance_accepts_narrower_rendition():
+    chosen, _ = select_rendition(TWITCH_FORMATS, display_width=1280, max_upscale=1.5)
+    # 854 px × 1,5 suffisent, mais 480p30 n'a pas la cadence de la meilleure définition
+    assert chosen["format_id"] == "720p60"
+    chosen, _ = select_rendition([fmt(480), fmt(720), fmt(1080)], display_width=1280, max_upscale=1.5)
+    assert chosen["format_id"] == "480p60"
+
+
+def test_best_rendition_without_display_width_or_when_none_suffices():
+    assert select_rendition(TWITCH_FORMATS, display_width=None)[0]["format_id"] == "1080p60"
+    assert select_rendition(TWITCH_FORMATS, display_width=4000)[0]["format_id"] == "1080p60"
+
+
+@pytest.mark.parametrize("unusable", [
+    fmt(1080, format_id="portrait-1080p60"),
+    fmt(1080, ext="webm"),
+    fmt(1080, vcodec="none"),
+    fmt(1080, acodec="none"),
+    fmt(None),
+    fmt(1920, width=1080),  # Vertical
+])
+def test_unusable_formats_are_ignored(unusable):
+    assert select_rendition([unusable], display_width=1280) == (None, None)
+
+
+def test_width_is_derived_from_height_and_aspect_ratio():
+    chosen, _ = select_rendition([fmt(720, aspect_ratio=4 / 3), fmt(1080, aspect_ratio=4 / 3)], display_width=1000)
+    assert chosen["height"] == 1080
+    assert download_clip._format_width(fmt(720)) == pytest.approx(1280)
@@ -0,0 +1,126 @@
+# tests/test_encoding_profiles.py
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import encoding_profiles
+
+
+@pytest.fixture(autouse=True)
+def fresh_calibrations(monkeypatch):
+    """Chaque test repart d'un module sans calibration chargée (comme un processus de rendu neuf)."""
+    monkeypatch.setattr(encoding_profiles, "_calibrations", None)
+
+
+def sampler(fps_by_profile, clock=None, sample_frames=60):
+    """encode_sample simulé : horloge avancée de sample_frames / fps par calibration."""
+    calls = []
+
+    def encode_sample(profile):
+        calls.append(profile)
+        fps = fps_by_profile[profile]
+        if not fps:
+            return 0
+        clock.advance(sample_frames / fps)
+        return sample_frames
+
+    return encode_sample, calls
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(encoding_profiles, "time", SimpleNamespace(perf_counter=clock))
+    return clock
+
+
+def test_video_args_keyframe_interval_follows_frame_rate():
+    args = encoding_profiles.video_args("fast", "30000/1001")
+    assert args == ["-crf", "23", "-maxrate", "8000k", "-bufsize", "16000k", "-g", "60"]
+    assert encoding_profiles.video_args("draft", 60)[-1] == "120"
+
+
+def test_default_profile_keeps_x264_defaults():
+    # Réglages du rendu d'origine : preset medium, crf 23, ni plafond de débit ni intervalle d'images clés
+    assert encoding_profiles.ENCODING_PROFILES[encoding_profiles.DEFAULT_PROFILE]["preset"] == "medium"
+    assert encoding_profiles.video_args(encoding_profiles.DEFAULT_PROFILE, 60) == ["-crf", "23"]
+
+
+def test_profiles_have_no_per_profile_threads():
+    assert all("threads" not in profile for profile in encoding_profiles.ENCODING_PROFILES.values())
+
+
+def test_named_profile_is_used_without_calibration(tmp_path):
+    encode_sample, calls = sampler({})
+    assert encoding_profiles.select_profile("fast", 1000, encode_sample, calibration_file=str(tmp_path / "c.json")) == "fast"
+    assert encoding_profiles.select_profile("nope", 1000, encode_sample, calibration_file=str(tmp_path / "c.json")) \
+        == encoding_profiles.DEFAULT_PROFILE
+    assert calls == []
+
+
+def test_auto_picks_best_profile_within_deadline(clock, tmp_path):
+    fps = {"draft": 600, "fast": 300, "balanced": 100, "quality": 30}
+    encode_sample, calls = sampler(fps, clock)
+    # 3000 images : balanced (30s) tient dans 80% de l'échéance de 60s, quality (100s) non
+    chosen = encoding_profiles.select_profile("auto", 3000, encode_sample, calibration_key="k", deadline=60,
+                                              calibration_file=str(tmp_path / "c.json"))
+    assert chosen == "balanced"
+    assert calls == ["draft", "fast", "balanced", "quality"]
+
+
+def test_auto_falls_back_to_fastest_profile(clock, tmp_path):
+    encode_sample, _ = sampler({"draft": 10, "fast": 5, "balanced": 2, "quality": 1}, clock)
+    assert encoding_profiles.select_profile("auto", 100000, encode_sample, deadline=10,
+                                            calibration_file=str(tmp_path / "c.json")) == "draft"
+
+
+def test_auto_stops_on_failed_calibration(clock, tmp_path):
+    encode_sample, calls = sampler({"draft": 600, "fast": 0, "balanced": 100, "quality": 30}, clock)
+    assert encoding_profiles.select_profile("auto", 100, encode_sample, deadline=60,
+                                            calibration_file=str(tmp_path / "c.json")) == "draft"
+    assert calls == ["draft", "fast"]
+
+
+def test_calibrations_are_persisted_and_reused_by_other_processes(clock, tmp_path, monkeypatch):
+    path = str(tmp_path / "c.json")
+    encode_sample, calls = sampler({"draft": 600, "fast": 0, "balanced": 100, "quality": 30}, clock)
+    encoding_profiles.select_profile("auto", 100, encode_sample, calibration_key=("v1", 2), deadline=60,
+                                     calibration_file=path)
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    # La calibration en échec n'est pas enregistrée
+    assert len(saved) == 1
+
+    # Nouveau processus : module sans calibration en mémoire, mesures relues depuis le fichier
+    monkeypatch.setattr(encoding_profiles, "_calibrations", None)
+    encode_sample, calls = sampler({"draft": 600, "fast": 300, "balanced": 100, "quality": 30}, clock)
+    encoding_profiles.select_profile("auto", 100, encode_sample, calibration_key=("v1", 2), deadline=60,
+                                     calibration_file=path)
+    assert "draft" not in calls
+
+    # Autre version d'ffmpeg (ou autre nombre de threads) : nouvelle calibration
+    encode_sample, calls = sampler({"draft": 600, "fast": 300, "balanced": 100, "quality": 30}, clock)
+    encoding_profiles.select_profile("auto", 100, encode_sample, calibration_key=("v2", 2), deadline=60,
+                                     calibration_file=path)
+    assert calls[0] == "draft"
+
+
+def test_unreadable_calibration_file_is_ignored(clock, tmp_path):
+    path = tmp_path / "c.json"
+    path.write_text("{pas du json", encoding="utf-8")
+    encode_sample, calls = sampler({"draft": 600, "fast": 300, "balanced": 100, "quality": 30}, clock)
+    encoding_profiles.select_profile("auto", 100, encode_sample, deadline=60, calibration_file=str(path))
+    assert calls[0] == "draft"
+    assert len(json.loads(path.read_text(encoding="utf-8"))) == len(calls)
@@ -0,0 +1,33 @@
+# tests/test_parallel_render.py
+import pytest
+
+import parallel_render
+from parallel_render import split_cpu_budget
+
+
+@pytest.mark.parametrize("jobs, cpu_budget, workers, expected", [
+    (4, 8, 0, (4, 2)),    # Automatique : au moins MIN_THREADS_PER_WORKER threads par processus
+    (2, 8, 0, (2, 4)),    # Pas plus de processus que de rendus
+    (1, 8, 0, (1, 8)),
+    (4, 2, 0, (1, 2)),
+    (4, 1, 0, (1, 1)),
+    (4, 8, 1, (1, 8)),    # Rendu séquentiel imposé
+    (4, 8, 3, (3, 2)),
+    (16, 4, 16, (4, 1)),  # Jamais plus de processus que de CPU
+])
+def test_split_cpu_budget(jobs, cpu_budget, workers, expected):
+    assert split_cpu_budget(jobs, cpu_budget, workers) == expected
+
+
+def test_sequential_render_passes_threads_to_each_clip(monkeypatch):
+    calls = []
+
+    def trim_video_for_short(input_path, output_path, clip_data, threads, **render_params):
+        calls.append((clip_data["id"], threads, render_params))
+        return output_path if clip_data["id"] != "broken" else None
+
+    monkeypatch.setattr(parallel_render.process_video, "trim_video_for_short", trim_video_for_short)
+    jobs = [({"id": "a"}, "a.mp4", "a_out.mp4"), ({"id": "broken"}, "b.mp4", "b_out.mp4")]
+    results = parallel_render.render_clips(jobs, {"max_duration_seconds": 60}, cpu_budget=4, workers=1)
+    assert results == {"a": "a_out.mp4", "broken": None}
+    assert calls == [("a", 4, {"max_duration_seconds": 60}), ("broken", 4, {"max_duration_seconds": 60})]
@@ -0,0 +1,57 @@
+# tests/test_prepared_assets.py
+import multiprocessing
+import os
+
+import numpy as np
+from PIL import Image
+
+import prepared_assets
+
+WORKERS = 4
+
+
+def _prepare_background(assets_dir, asset_path, start, results):
+    """Processus de rendu simulé : prépare le fond dès que tous les processus sont prêts."""
+    prepared_assets.PREPARED_ASSETS_DIR = assets_dir
+    start.wait()
+    results.put(prepared_assets.prepared_background(asset_path, size=(540, 960)))
+
+
+def test_background_prepared_by_several_processes_at_once(tmp_path):
+    asset_path = str(tmp_path / "background.png")
+    rng = np.random.default_rng(0)
+    Image.fromarray(rng.integers(0, 255, size=(1600, 1600, 3), dtype=np.uint8)).save(asset_path)
+    assets_dir = str(tmp_path / "prepared")
+
+    context = multiprocessing.get_context("spawn")
+    start = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=_prepare_background, args=(assets_dir, asset_path, start, results))
+                 for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    start.set()
+    paths = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(timeout=60)
+
+    assert len(set(paths)) == 1 and paths[0] is not None
+    with Image.open(paths[0]) as image:
+        assert image.size == (540, 960)
+    # Aucun fichier de travail laissé derrière
+    assert os.listdir(assets_dir) == [os.path.basename(paths[0])]
+
+
+def test_publish_keeps_asset_published_by_another_process(tmp_path):
+    path = tmp_path / "ending-abc.mp4"
+    path.write_bytes(b"published")
+    # Fichier de travail déjà déplacé (ou jamais écrit) : l'asset publié par l'autre processus est gardé
+    assert prepared_assets._publish(str(tmp_path / "missing.partial.mp4"), str(path))
+    assert not prepared_assets._publish(str(tmp_path / "missing.partial.mp4"), str(tmp_path / "other.mp4"))
+
+
+def test_partial_paths_are_unique_per_process(tmp_path):
+    path = str(tmp_path / "background-abc.png")
+    partial_path = prepared_assets._partial_path(path, "png")
+    assert partial_path != path + ".partial.png"
+    assert str(os.getpid()) in partial_path and partial_path.endswith(".partial.png")
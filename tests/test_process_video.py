@@ -0,0 +1,27 @@
+# tests/test_process_video.py
+import pytest
+
+from process_video import SHORT_HEIGHT, SHORT_WIDTH, main_video_layout, source_display_width
+
+
+@pytest.mark.parametrize("width, height", [(1920, 1080), (1280, 720), (852, 480), (1440, 1080)])
+def test_visible_region_fills_short_width_with_even_dimensions(width, height):
+    (x, y, crop_width, crop_height), size, position = main_video_layout(width, height)
+    assert 0 <= x and x + crop_width <= width and 0 <= y and y + crop_height <= height
+    assert all(value % 2 == 0 for value in (crop_width, crop_height) + size)
+    assert size[0] == SHORT_WIDTH and size[1] <= SHORT_HEIGHT
+    assert position == ((SHORT_WIDTH - size[0]) // 2, (SHORT_HEIGHT - size[1]) // 2)
+
+
+def test_visible_region_is_centered_crop_of_zoomed_source():
+    (x, y, crop_width, crop_height), size, _ = main_video_layout(1920, 1080)
+    # Zoom x2 : la source fait 2160 px de large à l'écran, seuls 1080 px (960 px source) sont visibles
+    assert (x, crop_width) == (480, 960)
+    assert (y, crop_height) == (0, 1080)
+    assert size == (1080, 1216)
+
+
+def test_display_width_follows_zoom_unless_webcam_crop():
+    assert main_video_layout(1280, 720, display_width=1080)[0] == (0, 0, 1280, 720)
+    assert source_display_width(enable_webcam_crop=True) is None
+    assert source_display_width() > SHORT_WIDTH
@@ -0,0 +1,77 @@
+# tests/test_published_history.py
+import json
+import os
+from datetime import date, timedelta
+
+from published_history import PublishedHistory
+
+
+def test_add_is_persisted_and_deduplicated(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    history = PublishedHistory(path=path, legacy_path=None)
+    assert history.add("clip_a", "yt_a")
+    assert not history.add("clip_a", "yt_b")
+
+    reloaded = PublishedHistory(path=path, legacy_path=None)
+    assert "clip_a" in reloaded
+    assert len(reloaded) == 1
+    assert reloaded.get("clip_a")["youtube_short_id"] == "yt_a"
+
+
+def test_published_ids_is_a_live_read_only_view(tmp_path):
+    history = PublishedHistory(path=str(tmp_path / "history.jsonl"), legacy_path=None)
+    ids = history.published_ids()
+    history.add("clip_a", "yt_a")
+    assert "clip_a" in ids
+    assert not hasattr(ids, "add")
+
+
+def test_per_day_index(tmp_path):
+    path = tmp_path / "history.jsonl"
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    path.write_text(json.dumps({"twitch_clip_id": "old", "date": yesterday}) + "\n", encoding="utf-8")
+    history = PublishedHistory(path=str(path), legacy_path=None)
+    history.add("clip_a", "yt_a")
+    history.add("clip_b", "yt_b")
+    assert history.count_published_on() == 2
+    assert sorted(history.ids_published_on()) == ["clip_a", "clip_b"]
+    assert history.ids_published_on(date.today() - timedelta(days=1)) == ["old"]
+
+
+def test_truncates_incomplete_last_line_and_skips_corrupt_lines(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_bytes(b'{"twitch_clip_id": "a", "date": "2026-01-01"}\n'
+                     b'pas du json\n'
+                     b'{"twitch_clip_id": "b", "da')
+    history = PublishedHistory(path=str(path), legacy_path=None)
+    assert "a" in history and "b" not in history
+    assert path.read_bytes().endswith(b"pas du json\n")
+    history.add("c", "yt_c")
+    assert "c" in PublishedHistory(path=str(path), legacy_path=None)
+
+
+def test_migrates_legacy_json(tmp_path):
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps({
+        "2026-10-01": [{"twitch_clip_id": "a", "youtube_short_id": "yt_a"}],
+        "2026-10-02": [{"twitch_clip_id": "b", "youtube_short_id": "yt_b"}, {"youtube_short_id": "sans id"}],
+    }), encoding="utf-8")
+    path = tmp_path / "history.jsonl"
+    history = PublishedHistory(path=str(path), legacy_path=str(legacy), retention_days=10000)
+    assert len(history) == 2
+    assert history.ids_published_on(date(2026, 10, 2)) == ["b"]
+    assert not legacy.exists() and os.path.exists(str(legacy) + ".bak")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_compaction_drops_expired_entries_and_their_day(tmp_path):
+    path = tmp_path / "history.jsonl"
+    old_day = (date.today() - timedelta(days=400)).isoformat()
+    path.write_text(json.dumps({"twitch_clip_id": "old", "date": old_day}) + "\n", encoding="utf-8")
+    history = PublishedHistory(path=str(path), legacy_path=None, retention_days=180)
+    history.add("new", "yt_new")
+    assert history.compact() == 0  # Pas assez de lignes inutiles sans force
+    assert history.compact(force=True) == 1
+    assert "old" not in history
+    assert history.count_published_on(date.fromisoformat(old_day)) == 0
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
@@ -0,0 +1,89 @@
+# tests/test_rate_limiter.py
+import time
+
+import pytest
+import requests
+
+import get_top_clips
+from rate_limiter import TokenBucketRateLimiter
+
+
+def test_acquire_consumes_tokens_then_waits_for_refill():
+    limiter = TokenBucketRateLimiter(capacity=2, refill_period=0.2)
+    start = time.monotonic()
+    limiter.acquire()
+    limiter.acquire()
+    assert time.monotonic() - start < 0.05
+    limiter.acquire()  # Seau vide : attend ~0.1s qu'un jeton se remplisse
+    assert time.monotonic() - start >= 0.08
+
+
+def test_headers_never_raise_token_count():
+    limiter = TokenBucketRateLimiter(capacity=800, refill_period=60, safety_margin=10)
+    limiter.update_from_headers({"Ratelimit-Limit": "800", "Ratelimit-Remaining": "50"})
+    assert limiter._tokens == pytest.approx(40, abs=1)
+    limiter.update_from_headers({"Ratelimit-Remaining": "700"})
+    assert limiter._tokens == pytest.approx(40, abs=1)
+
+
+def test_headers_update_capacity_and_ignore_garbage():
+    limiter = TokenBucketRateLimiter(capacity=800)
+    limiter.update_from_headers({"Ratelimit-Limit": "1200", "Ratelimit-Remaining": "abc"})
+    assert limiter.capacity == 1200
+
+
+def test_throttled_blocks_until_backoff():
+    limiter = TokenBucketRateLimiter(capacity=10, backoff_base_seconds=0.05, backoff_max_seconds=1)
+    delay = limiter.on_throttled({}, attempt=1)
+    assert 0.1 <= delay <= 0.16
+    assert limiter._tokens == 0
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class FakeSession:
+    """Session qui lève ou renvoie les éléments de `outcomes` dans l'ordre, en notant les appels."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def fast_limiter(monkeypatch):
+    limiter = TokenBucketRateLimiter(capacity=100, refill_period=1, backoff_base_seconds=0.001,
+                                     backoff_max_seconds=0.01)
+    monkeypatch.setattr(get_top_clips, "HELIX_RATE_LIMITER", limiter)
+    return limiter
+
+
+def test_helix_get_passes_timeout_and_retries_on_timeout(fast_limiter):
+    session = FakeSession([requests.exceptions.ReadTimeout("lecture bloquée"), FakeResponse(200)])
+    response = get_top_clips.helix_get("https://helix.test/clips", "token", session=session)
+    assert response.status_code == 200
+    assert len(session.calls) == 2
+    assert all(call["timeout"] == get_top_clips.HTTP_TIMEOUT for call in session.calls)
+
+
+def test_helix_get_retries_server_errors_then_returns_last_response(fast_limiter):
+    session = FakeSession([FakeResponse(503)] * 3)
+    response = get_top_clips.helix_get("https://helix.test/clips", "token", session=session, max_retries=2)
+    assert response.status_code == 503
+    assert len(session.calls) == 3
+
+
+def test_helix_get_raises_after_max_network_retries(fast_limiter):
+    session = FakeSession([requests.exceptions.ConnectTimeout("pas de connexion")] * 2)
+    with pytest.raises(requests.exceptions.Timeout):
+        get_top_clips.helix_get("https://helix.test/clips", "token", session=session, max_retries=1)
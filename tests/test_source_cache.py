@@ -0,0 +1,96 @@
+# tests/test_source_cache.py
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import source_cache
+from source_cache import SourceClipCache
+
+
+@pytest.fixture(autouse=True)
+def fake_probe(monkeypatch):
+    """ffprobe simulé (un fichier commençant par b"bad" est invalide) et horloge qui avance à chaque appel."""
+    monkeypatch.setattr(source_cache, "probe_video",
+                        lambda path: (False, None) if open(path, "rb").read(3) == b"bad" else (True, 10.0))
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(source_cache, "time", SimpleNamespace(time=lambda: next(ticks)))
+
+
+def download(tmp_path, name, size, content=b"x"):
+    path = tmp_path / f"{name}.download"
+    path.write_bytes(content * size)
+    return str(path)
+
+
+def test_add_moves_file_into_cache_and_lookup_serves_it(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"), max_bytes=1000)
+    cached = cache.add("a", download(tmp_path, "a", 100))
+    assert cached == cache.path_for("a")
+    assert cache.lookup("a") == cached
+    assert cache.lookup("unknown") is None
+
+
+def test_least_recently_used_clips_are_evicted(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.add("a", download(tmp_path, "a", 100))
+    cache.add("b", download(tmp_path, "b", 100))
+    cache.lookup("a")  # "a" devient plus récent que "b"
+    cache.add("c", download(tmp_path, "c", 100))
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") and cache.lookup("c")
+
+
+def test_clip_larger_than_budget_is_kept_while_others_are_evicted(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"), max_bytes=150)
+    cache.add("a", download(tmp_path, "a", 100))
+    assert cache.add("big", download(tmp_path, "big", 500))
+    assert cache.lookup("a") is None
+    assert cache.lookup("big")
+
+
+def test_invalid_download_is_rejected_and_deleted(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"))
+    path = download(tmp_path, "a", 10, content=b"bad")
+    assert cache.add("a", path) is None
+    assert not (tmp_path / "a.download").exists()
+
+
+def test_modified_file_is_revalidated(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"))
+    cached = cache.add("a", download(tmp_path, "a", 100))
+    with open(cached, "wb") as f:
+        f.write(b"bad, truncated")
+    assert cache.lookup("a") is None
+    assert not (tmp_path / "cache" / "a.mp4").exists()
+
+
+def test_index_survives_restart_and_reduced_rendition_is_not_served_wider(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"))
+    cache.add("a", download(tmp_path, "a", 100), reduced_width=720)
+    reloaded = SourceClipCache(str(tmp_path / "cache"))
+    assert reloaded.lookup("a", min_width=720)
+    assert reloaded.lookup("a", min_width=1080) is None
+
+
+def test_discard_removes_file_and_entry(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"))
+    cache.add("a", download(tmp_path, "a", 100))
+    cache.discard("a")
+    assert cache.lookup("a") is None
+    assert not (tmp_path / "cache" / "a.mp4").exists()
+
+
+def test_pinned_clips_are_not_evicted_until_unpinned(tmp_path):
+    cache = SourceClipCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.add("prefetched", download(tmp_path, "prefetched", 100), pin=True)
+    cache.add("a", download(tmp_path, "a", 100))
+    assert cache.lookup("a", pin=True)
+    # "prefetched" est le moins récemment utilisé, mais épinglé : "a" aussi, rien n'est évincé
+    cache.add("b", download(tmp_path, "b", 100))
+    assert cache.lookup("prefetched") and cache.lookup("a") and cache.lookup("b")
+
+    cache.unpin("prefetched")
+    cache.unpin("a")
+    cache.add("c", download(tmp_path, "c", 100))
+    assert cache.lookup("prefetched") is None
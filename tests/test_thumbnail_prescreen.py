@@ -0,0 +1,99 @@
+# tests/test_thumbnail_prescreen.py
+import numpy as np
+import pytest
+from PIL import Image
+
+import thumbnail_prescreen
+from clip_catalog import ClipCatalog
+
+HEIGHT, WIDTH = 90, 160
+
+
+def textured(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(40, 220, size=(HEIGHT, WIDTH)).astype(np.float32)
+
+
+def letterboxed():
+    image = textured()
+    bar = int(HEIGHT * 0.2)
+    image[:bar] = 0
+    image[-bar:] = 0
+    return image
+
+
+def gradient():
+    # Dégradé horizontal : contrasté mais presque sans détail (1,6 niveau par pixel)
+    return np.tile(np.linspace(0, 255, WIDTH, dtype=np.float32), (HEIGHT, 1))
+
+
+SAMPLES = {
+    "ok": textured(),
+    "black": np.full((HEIGHT, WIDTH), 5, dtype=np.float32),
+    "blank": np.full((HEIGHT, WIDTH), 128, dtype=np.float32),
+    "letterbox": letterboxed(),
+    "low_detail": gradient(),
+}
+
+
+@pytest.mark.parametrize("expected", list(SAMPLES))
+def test_verdict_of_each_kind_of_thumbnail(expected):
+    metrics = thumbnail_prescreen.thumbnail_metrics(SAMPLES[expected][None])
+    assert thumbnail_prescreen.thumbnail_verdicts(metrics) == [expected]
+
+
+def test_metrics_are_computed_per_image_in_one_batch():
+    metrics = thumbnail_prescreen.thumbnail_metrics(np.stack(list(SAMPLES.values())))
+    assert thumbnail_prescreen.thumbnail_verdicts(metrics) == list(SAMPLES)
+    assert metrics["letterbox"][3] == pytest.approx(0.4, abs=0.03)
+    assert metrics["letterbox"][0] == 0
+
+
+@pytest.fixture
+def catalog():
+    catalog = ClipCatalog(":memory:")
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def thumbnails(monkeypatch):
+    """Miniatures servies depuis SAMPLES selon l'ID du clip (« <verdict>-<n> ») ; les téléchargements sont relevés."""
+    fetched = []
+
+    def fetch_thumbnail_image(clip, session=None):
+        fetched.append(clip["id"])
+        kind = clip["id"].split("-")[0]
+        if kind == "missing":
+            return None
+        return Image.fromarray(SAMPLES[kind].astype(np.uint8)).resize((480, 272)).convert("RGB")
+
+    monkeypatch.setattr(thumbnail_prescreen, "fetch_thumbnail_image", fetch_thumbnail_image)
+    return fetched
+
+
+def clips(*ids):
+    return [{"id": clip_id} for clip_id in ids]
+
+
+def test_prescreen_rejects_demotes_and_keeps_order(catalog, thumbnails):
+    candidates = clips("letterbox-1", "ok-1", "black-1", "low_detail-1", "missing-1", "blank-1", "ok-2")
+    result = thumbnail_prescreen.prescreen_clips(candidates, catalog)
+    assert [clip["id"] for clip in result] == ["ok-1", "missing-1", "ok-2", "letterbox-1", "low_detail-1"]
+
+
+def test_clips_beyond_max_candidates_are_not_examined(catalog, thumbnails):
+    candidates = clips("ok-1", "black-1", "black-2")
+    result = thumbnail_prescreen.prescreen_clips(candidates, catalog, max_candidates=2)
+    assert [clip["id"] for clip in result] == ["ok-1", "black-2"]
+    assert "black-2" not in thumbnails
+
+
+def test_verdicts_are_cached_in_catalog(catalog, thumbnails):
+    candidates = clips("ok-1", "black-1", "missing-1")
+    thumbnail_prescreen.check_thumbnails(candidates, catalog)
+    thumbnails.clear()
+    verdicts = thumbnail_prescreen.check_thumbnails(candidates, catalog)
+    assert verdicts == {"ok-1": "ok", "black-1": "black"}
+    # Seule la miniature illisible est redemandée
+    assert thumbnails == ["missing-1"]
@@ -0,0 +1,94 @@
+# tests/test_twitch_token.py
+import json
+import os
+import time
+
+import pytest
+import requests
+
+import get_top_clips
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}")
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.posts = 0
+
+    def post(self, url, data=None, timeout=None):
+        self.posts += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def token_env(tmp_path, monkeypatch):
+    """Identifiants et cache du jeton isolés ; retourne une fonction qui installe les réponses de l'endpoint OAuth."""
+    monkeypatch.setattr(get_top_clips, "CLIENT_ID", "client")
+    monkeypatch.setattr(get_top_clips, "CLIENT_SECRET", "secret")
+    monkeypatch.setattr(get_top_clips, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(get_top_clips, "TWITCH_TOKEN_CACHE_FILE", str(tmp_path / "twitch_app_token.json"))
+
+    def install(*responses):
+        session = FakeSession(responses)
+        monkeypatch.setattr(get_top_clips, "get_http_session", lambda *args, **kwargs: session)
+        return session
+
+    return install
+
+
+def write_cache(expires_in, client_id="client", token="cached"):
+    now = time.time()
+    with open(get_top_clips.TWITCH_TOKEN_CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"client_id": client_id, "access_token": token, "expires_at": now + expires_in}, f)
+
+
+def test_new_token_is_cached_privately(token_env):
+    session = token_env(FakeResponse({"access_token": "fresh", "expires_in": 5000000}))
+    assert get_top_clips.get_twitch_access_token() == "fresh"
+    assert get_top_clips.get_twitch_access_token() == "fresh"
+    assert session.posts == 1
+    assert os.stat(get_top_clips.TWITCH_TOKEN_CACHE_FILE).st_mode & 0o777 == 0o600
+
+
+def test_token_close_to_expiry_is_renewed(token_env):
+    write_cache(get_top_clips.TWITCH_TOKEN_REFRESH_MARGIN_SECONDS - 60)
+    session = token_env(FakeResponse({"access_token": "fresh", "expires_in": 5000000}))
+    assert get_top_clips.get_twitch_access_token() == "fresh"
+    assert session.posts == 1
+
+
+def test_still_valid_cached_token_is_used_when_renewal_fails(token_env):
+    write_cache(600)
+    token_env(requests.exceptions.ConnectionError("hors ligne"))
+    assert get_top_clips.get_twitch_access_token() == "cached"
+
+
+def test_token_of_another_client_is_ignored(token_env):
+    write_cache(5000000, client_id="other")
+    token_env(requests.exceptions.ConnectionError("hors ligne"))
+    assert get_top_clips.get_twitch_access_token() is None
+
+
+def test_force_refresh_and_invalidation(token_env):
+    write_cache(5000000)
+    session = token_env(FakeResponse({"access_token": "fresh", "expires_in": 5000000}))
+    assert get_top_clips.get_twitch_access_token(force_refresh=True) == "fresh"
+    get_top_clips.invalidate_cached_twitch_token()
+    assert not os.path.exists(get_top_clips.TWITCH_TOKEN_CACHE_FILE)
+    get_top_clips.invalidate_cached_twitch_token()  # Déjà supprimé : sans erreur
+    assert session.posts == 1
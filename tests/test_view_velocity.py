@@ -0,0 +1,69 @@
+# tests/test_view_velocity.py
+import numpy as np
+import pytest
+
+from view_velocity import ViewSnapshotStore, compute_velocity_scores, rank_by_velocity
+
+NOW = 1_760_000_000
+HOUR = 3600
+
+
+def iso(ts):
+    return np.datetime_as_string(np.datetime64(ts, 's')) + "Z"
+
+
+def clip(clip_id, views, age_hours):
+    return {"id": clip_id, "viewer_count": views, "created_at": iso(NOW - int(age_hours * HOUR)),
+            "duration": 30.0, "language": "fr"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ViewSnapshotStore(path=str(tmp_path / "snapshots.npz"))
+
+
+def test_flush_keeps_one_reading_per_clip_and_timestamp(store):
+    store.record([clip("a", 10, 1)], NOW)
+    store.record([clip("a", 15, 1), clip("b", 3, 1)], NOW)
+    store.record([clip("a", 20, 1)], NOW + 60)
+    store.flush()
+    assert len(store) == 3
+    ts, views = store.previous_snapshots(["a", "b", "c"], NOW)
+    assert views[0] == 15 and views[1] == 3 and np.isnan(views[2])
+
+
+def test_save_load_and_prune(store):
+    store.record([clip("old", 1, 1)], NOW - 30 * 24 * HOUR)
+    store.record([clip("a", 5, 1)], NOW)
+    store.prune(now=NOW)
+    store.save()
+    reloaded = ViewSnapshotStore(path=store.path)
+    assert len(reloaded) == 1
+    assert reloaded.clip_keys.tolist() == ["a"]
+
+
+def test_velocity_and_acceleration(store):
+    store.record([clip("a", 1000, 10)], NOW - 2 * HOUR)
+    store.record([clip("a", 3000, 10)], NOW)
+    score, per_hour, acceleration, measured = compute_velocity_scores([clip("a", 3000, 10)], store, now=NOW)
+    assert per_hour[0] == pytest.approx(300)
+    # 1000 vues/h sur les 2 dernières heures contre 125 vues/h auparavant
+    assert acceleration[0] == pytest.approx(875)
+    assert score[0] == pytest.approx(300 + 0.5 * 875)
+    assert measured.tolist() == [True]
+
+
+def test_cold_start_keeps_view_order(store):
+    # Un clip très récent et peu vu aurait le meilleur score vues/âge : sans relevés, il reste à sa place
+    clips = [clip("new", 50, 0.1), clip("popular", 5000, 20), clip("mid", 800, 3)]
+    store.record(clips, NOW)
+    assert [c["id"] for c in rank_by_velocity(clips, store, now=NOW)] == ["popular", "mid", "new"]
+
+
+def test_measured_clips_are_reordered_within_their_slots(store):
+    clips = [clip("popular", 5000, 20), clip("rising", 800, 3), clip("unmeasured", 900, 1), clip("flat", 700, 20)]
+    store.record([clip("popular", 4990, 20), clip("rising", 100, 3), clip("flat", 700, 20)], NOW - HOUR)
+    store.record([clip("popular", 5000, 20), clip("rising", 800, 3), clip("flat", 700, 20)], NOW)
+    ranked = [c["id"] for c in rank_by_velocity(clips, store, now=NOW)]
+    # "unmeasured" garde la 2e place du classement par vues ; les autres places vont aux clips mesurés par vitesse
+    assert ranked == ["rising", "unmeasured", "popular", "flat"]